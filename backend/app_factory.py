@@ -0,0 +1,399 @@
+"""
+Application factory for the GuardBox backend.
+
+create_app(config) builds one Flask app from pluggable components (storage,
+crypto, auth) plus the optional fast-path components, and registers the
+routes in routes.py. Only the components enabled in the config are created;
+see config.py for every setting. server_complete.py and the older server_*.py
+entry points are thin wrappers around this factory, so there is one code path
+to harden, tune and benchmark.
+
+    app = create_app({"crypto_executor": "thread", "keypair_pool_size": 0})
+"""
+
+import hashlib
+import json
+import secrets
+import threading
+import time
+from datetime import datetime
+from functools import partial
+
+from flask import Flask
+from flask_cors import CORS
+
+import kem
+from auth import JWTAuth
+from config import load_config
+from crypto_service import CryptoService
+from email_signing import VerificationCache, canonical_email
+from key_manager import KeyManager
+from key_registry import PublicKeyRegistry, SharedPublicKeyRegistry
+from keypair_pool import KeypairPool
+from keystore import Keystore
+from merkle import MailboxTrees
+from password_policy import PasswordPolicy
+from rate_limit import SharedTokenBucketLimiter, TokenBucketLimiter
+from secret_key_cache import SecretKeyCache
+from self_test import SelfTestMonitor
+from session import SessionCache, SharedSessionCache
+from storage import create_storage, email_participants
+from user_directory import UserDirectory
+
+TEST_USERS = ("testuser1@guardbox.com", "testuser2@guardbox.com")
+# Shared storage: how often new mail from any worker reaches email_listeners,
+# and how often expired sessions, keys and rate-limit buckets are deleted
+EMAIL_POLL_SECONDS = 0.5
+PRUNE_SECONDS = 60
+
+
+def mailbox_leaf(email):
+    """Merkle leaf data for an email: content hash, signature and flags"""
+    signature = email.get('signature')
+    return json.dumps({
+        "id": email['id'],
+        "content": hashlib.sha256(canonical_email(email).encode()).hexdigest(),
+        "signature": signature['value'] if signature else None,
+        "flags": [email['is_read'], email['is_starred'], email['is_important'], email['is_deleted']]
+    }, separators=(",", ":")).encode()
+
+
+def load_signature_keys(keystore):
+    """Server signature keypair from the keystore, created on first start"""
+    if keystore is None:
+        return secrets.token_hex(32), secrets.token_hex(32)
+    public_key = keystore.get("server/signature/public")
+    private_key = keystore.get("server/signature/private")
+    if public_key is None or private_key is None:
+        public_key, private_key = secrets.token_hex(32).encode(), secrets.token_hex(32).encode()
+        keystore.put_many({
+            "server/signature/public": public_key,
+            "server/signature/private": private_key
+        })
+    return public_key.decode(), private_key.decode()
+
+
+class GuardBox:
+    """The components of one app instance; disabled optional components are None."""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.kyber_modes = tuple(config["kyber_modes"])
+        self.default_kyber_mode = config["default_kyber_mode"]
+
+        # Kyber and HMAC work runs on warm workers; start them before any
+        # other thread exists so forked workers inherit a clean state
+        self.crypto = CryptoService(self.default_kyber_mode, config["crypto_workers"],
+                                    self.kyber_modes, config["crypto_executor"]).warm_up()
+
+        # Server and user key material survives restarts in the keystore
+        self.keystore = None
+        if config["keystore_path"]:
+            self.keystore = Keystore(config["keystore_path"], config["keystore_passphrase"])
+            threshold = config["keystore_compact_threshold"]
+            if threshold is not None and self.keystore.dead_records > threshold:
+                self.keystore.compact()
+
+        self.storage = create_storage(config)
+
+        print("🔐 Loading Post-Quantum Cryptography keypairs...")
+        # One versioned server keypair per mode; clients present the key id
+        # they encapsulated against
+        rotation = config["key_rotation_seconds"]
+        self.key_managers = {}
+        for mode in self.kyber_modes:
+            manager = KeyManager(partial(self.crypto.keygen, mode=mode), rotation or 24 * 3600,
+                                 config["key_grace_seconds"], keystore=self.keystore, name=f"kem{mode}")
+            self.key_managers[mode] = manager.start() if rotation else manager
+        self.key_manager = self.key_managers[self.default_kyber_mode]
+        self.signature_pk, self.signature_sk = load_signature_keys(self.keystore)
+
+        # Sessions established by one KEM handshake. Sessions, registered
+        # keys and rate limits live in shared storage when there is one, so
+        # every worker behind the port sees the same state.
+        shared = self.storage.shared
+        self.session_cache = None
+        if config["session_capacity"]:
+            if shared:
+                self.session_cache = SharedSessionCache(self.storage, config["session_capacity"],
+                                                        config["session_idle_timeout"], config["session_max_age"])
+            else:
+                self.session_cache = SessionCache(config["session_capacity"], config["session_idle_timeout"],
+                                                  config["session_max_age"])
+
+        if shared:
+            self.key_registry = SharedPublicKeyRegistry(self.storage, self.crypto.check_public_key,
+                                                        config["key_registry_capacity"])
+        else:
+            self.key_registry = PublicKeyRegistry(self.crypto.check_public_key, config["key_registry_capacity"])
+
+        # Kyber keypairs generated ahead of time so sign-up bursts skip inline keygen
+        self.keypair_pool = None
+        if config["keypair_pool_size"]:
+            self.keypair_pool = KeypairPool(self.crypto.keygen, size=config["keypair_pool_size"]).start()
+
+        self.password_policy = PasswordPolicy(config["password_cost"], config["password_target_ms"])
+        self.auth = JWTAuth(config["jwt_secret"], config["jwt_expiry_hours"])
+
+        if shared:
+            self.ip_limiter = SharedTokenBucketLimiter(self.storage, "ip", config["ip_rate"], config["ip_burst"])
+            self.account_limiter = SharedTokenBucketLimiter(self.storage, "account", config["account_rate"],
+                                                            config["account_burst"])
+        else:
+            self.ip_limiter = TokenBucketLimiter(config["ip_rate"], config["ip_burst"])
+            self.account_limiter = TokenBucketLimiter(config["account_rate"], config["account_burst"])
+        self.ip_limiter.enabled = self.account_limiter.enabled = bool(config["rate_limits"])
+
+        # Per worker even with shared storage: it only caches what
+        # load_user_secret_key reads from the store, and user keys never change
+        self.secret_key_cache = SecretKeyCache(self.load_user_secret_key, config["secret_key_cache_capacity"],
+                                               config["secret_key_cache_ttl"])
+        # Emails are signed at send time; reads use a cache keyed by
+        # (email id, sender key version)
+        self.email_verification = VerificationCache(self.crypto.verify,
+                                                    config["email_verification_cache_capacity"])
+        # One incremental Merkle tree per mailbox. With shared storage the
+        # trees are replayed from the store so every worker has the same roots.
+        self.mailbox_trees = MailboxTrees(mailbox_leaf)
+        self._trees_version = 0
+        self._trees_lock = threading.Lock()
+        # Called with every newly stored email (e.g. push to connected
+        # clients). With shared storage they are fed by polling the store, so
+        # mail sent through any worker reaches them.
+        self.email_listeners = []
+
+        if config["seed_test_users"]:
+            self._seed_test_users()
+        # Prefix index over usernames for recipient autocomplete
+        self.user_directory = UserDirectory([])
+        self._users_cursor = 0
+        self._sync_users()
+
+        # Keys and users written by sibling workers sharing the keystore and storage
+        self._sync_stop = threading.Event()
+        self._sync_thread = None
+        if config["shared_sync_seconds"]:
+            self._sync_thread = threading.Thread(target=self._sync_loop, name="shared-state-sync", daemon=True)
+            self._sync_thread.start()
+        self._poll_thread = None
+        if shared:
+            _, self._emails_cursor = self.storage.emails_added_since(None)
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="shared-storage-poll", daemon=True)
+            self._poll_thread.start()
+
+        # Background crypto self-test; /readyz serves its cached result
+        self.self_test = None
+        if config["self_test_interval"]:
+            checks = {f"kyber{mode}": partial(self._kyber_self_test, mode) for mode in self.kyber_modes}
+            checks["hmac"] = self._hmac_self_test
+            self.self_test = SelfTestMonitor(checks, config["self_test_interval"]).start()
+
+    # Startup
+
+    def _seed_test_users(self):
+        # Another worker sharing the storage may have seeded them already
+        if self.storage.get_user("admin"):
+            return
+        self.storage.add_user("admin", {
+            "password_hash": self.password_policy.hash("admin123"),
+            "kyber_keys": None,
+            "signature_keys": None,
+            "created_at": datetime.now()
+        })
+        for username in TEST_USERS:
+            name = username.split("@")[0]
+            self.storage.add_user(username, {
+                "password_hash": self.password_policy.hash("password123"),
+                "kyber_keys": {
+                    "public": f"{name}_kyber_pk_placeholder",
+                    "private": f"{name}_kyber_sk_placeholder"
+                },
+                "signature_keys": {
+                    "public": f"{name}_sig_pk_placeholder",
+                    "private": f"{name}_sig_sk_placeholder"
+                },
+                "created_at": datetime.now()
+            })
+
+    def _kyber_self_test(self, mode):
+        public_key, secret_key = self.crypto.keygen(mode)
+        ciphertext, shared_secret = self.crypto.encapsulate(public_key, mode)
+        return self.crypto.decapsulate(secret_key, ciphertext, mode) == shared_secret
+
+    def _hmac_self_test(self):
+        signature = self.crypto.sign("self-test-key", "self-test-message")
+        return self.crypto.verify("self-test-key", "self-test-message", signature)
+
+    def _sync_users(self):
+        if self.storage.shared:
+            usernames, self._users_cursor = self.storage.usernames_since(self._users_cursor)
+        else:
+            usernames = self.storage.usernames()
+        for username in usernames:
+            self.user_directory.add(username)
+
+    def _sync_loop(self):
+        while not self._sync_stop.wait(self.config["shared_sync_seconds"]):
+            try:
+                self.reload_shared_keys()
+                self._sync_users()
+            except Exception as e:
+                print(f"⚠️ Shared state sync failed: {e}")
+
+    def _poll_loop(self):
+        next_prune = time.monotonic() + PRUNE_SECONDS
+        while not self._sync_stop.wait(EMAIL_POLL_SECONDS):
+            try:
+                if self.email_listeners:
+                    emails, self._emails_cursor = self.storage.emails_added_since(self._emails_cursor)
+                    for email in emails:
+                        self._notify(email)
+                else:
+                    _, self._emails_cursor = self.storage.emails_added_since(None)
+                if time.monotonic() >= next_prune:
+                    self.storage.prune_expiring(time.time())
+                    next_prune = time.monotonic() + PRUNE_SECONDS
+            except Exception as e:
+                print(f"⚠️ Shared storage poll failed: {e}")
+
+    def reload_shared_keys(self):
+        """Pick up keys sibling workers rotated since the last sync; False unless the keystore is shared"""
+        if self.keystore is None or not self.config["shared_sync_seconds"]:
+            return False
+        self.keystore.reload()
+        for manager in self.key_managers.values():
+            manager.reload()
+        return True
+
+    def shutdown(self):
+        """Stop background threads and worker processes (tests, reloads)."""
+        self._sync_stop.set()
+        if self._sync_thread:
+            self._sync_thread.join(5)
+        if self._poll_thread:
+            self._poll_thread.join(5)
+        if self.self_test:
+            self.self_test.stop()
+        if self.keypair_pool:
+            self.keypair_pool.stop()
+        for manager in self.key_managers.values():
+            manager.stop()
+        self.crypto.shutdown()
+
+    # Shared helpers
+
+    def create_user(self, username, password_hash, kyber_keypair):
+        """Store a new user with fresh signature keys; None if the name is taken"""
+        user_kyber_pk, user_kyber_sk = kyber_keypair
+        user_signature_pk, user_signature_sk = secrets.token_hex(32), secrets.token_hex(32)
+        record = {
+            "password_hash": password_hash,
+            "kyber_keys": {
+                "public": user_kyber_pk.hex(),
+                "private": user_kyber_sk.hex()
+            },
+            "signature_keys": {
+                "public": user_signature_pk,
+                "private": user_signature_sk
+            },
+            "created_at": datetime.now()
+        }
+        if not self.storage.add_user(username, record):
+            return None
+        self.user_directory.add(username)
+        if self.keystore is not None:
+            self.keystore.put_many({
+                f"user/{username}/kyber/public": user_kyber_pk,
+                f"user/{username}/kyber/private": user_kyber_sk,
+                f"user/{username}/signature/public": user_signature_pk.encode(),
+                f"user/{username}/signature/private": user_signature_sk.encode()
+            })
+        return record
+
+    def take_keypair(self):
+        return self.keypair_pool.take() if self.keypair_pool else self.crypto.keygen()
+
+    def sign(self, message):
+        return self.crypto.sign(self.signature_sk, message)
+
+    def user_kyber_keys(self, username):
+        """(public, private) Kyber keys of a user as bytes, or None if they have none usable"""
+        user = self.storage.get_user(username)
+        keys = user and user.get('kyber_keys')
+        if not keys:
+            return None
+        try:
+            public_key = bytes.fromhex(keys['public'])
+            self.crypto.check_public_key(public_key)
+            return public_key, bytes.fromhex(keys['private'])
+        except ValueError:
+            return None
+
+    def load_user_secret_key(self, username):
+        keys = self.user_kyber_keys(username)
+        if not keys:
+            return None
+        return keys[1], kem.mode_for_public_key(keys[0])
+
+    def sender_signature_keys(self, email):
+        user = self.storage.get_user(email['from'])
+        return user.get('signature_keys') if user else None
+
+    def signature_status(self, email):
+        return self.email_verification.status(email, self.sender_signature_keys(email))
+
+    def store_email(self, email):
+        """Store a new email and add its leaf to every participant's mailbox tree"""
+        if self.storage.shared:
+            # Trees are replayed from the store and listeners fed by polling it
+            self.storage.add_email(email)
+            return
+        # The storage's own per-email lock (re-entrant): a store or update
+        # and its tree write are one step
+        with self.storage.email_lock(email['id']):
+            self.storage.add_email(email)
+            for mailbox in email_participants(email):
+                self.mailbox_trees.add(mailbox, email['id'], email)
+        self._notify(email)
+
+    def _notify(self, email):
+        for listener in self.email_listeners:
+            listener(email)
+
+    def update_email(self, email_id, **fields):
+        """
+        Update an email's flags and rehash its leaf in every mailbox holding
+        it, O(log n) each. Storage and tree writes happen under the email's
+        storage lock, so racing updates reach the trees in the order they
+        were stored.
+        """
+        if self.storage.shared:
+            return self.storage.update_email(email_id, **fields)
+        with self.storage.email_lock(email_id):
+            email = self.storage.update_email(email_id, **fields)
+            if email is not None:
+                for mailbox in email_participants(email):
+                    self.mailbox_trees.update(mailbox, email_id, email)
+        return email
+
+    def mailbox_snapshot(self, mailbox, offset, limit):
+        """Merkle root and proofs of a mailbox, first replaying changes other workers stored"""
+        if self.storage.shared:
+            with self._trees_lock:
+                # Replayed in insert order, so leaf positions match on every worker
+                emails, self._trees_version = self.storage.emails_changed_since(self._trees_version)
+                for email in emails:
+                    for address in email_participants(email):
+                        self.mailbox_trees.add(address, email['id'], email)
+        return self.mailbox_trees.snapshot(mailbox, offset, limit)
+
+
+def create_app(config=None) -> Flask:
+    """Flask app with the components enabled in `config` (overrides of config.DEFAULT_CONFIG)."""
+    import routes
+
+    app = Flask(__name__)
+    CORS(app)
+    app.extensions["guardbox"] = GuardBox(load_config(config))
+    app.register_blueprint(routes.bp)
+    return app
@@ -0,0 +1,721 @@
+"""
+Asyncio serving mode for the GuardBox server.
+
+GuardBoxASGI serves a create_app() app as an ASGI application:
+
+- /healthz, /readyz, /login, /register and /get_emails are native async
+  handlers. Storage calls go through AsyncStorage, bcrypt runs on a password
+  executor and Kyber keygen on the crypto workers, so the event loop never
+  waits on them.
+- /events is a Server-Sent Events stream pushing new mail to the connected
+  user. An idle stream costs one coroutine and one queue, so one process
+  holds thousands of them. With shared storage the events come from the
+  store, so mail sent through another worker is pushed too.
+- Every other route is served by the Flask app through a WSGI bridge on a
+  thread pool, so both modes expose the same routes. Request bodies reach
+  Flask as a stream pulled from the connection on demand, so /sign_stream
+  and /verify_stream stay constant-memory for any body size.
+- Native responses carry the same CORS headers flask_cors adds to the Flask
+  routes (the app's CORS_* settings).
+
+Run it under uvicorn when installed, or the built-in asyncio HTTP/1.1 server:
+
+    python asgi.py --port 5000
+    uvicorn --factory asgi:create_asgi_app --port 5000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+import jwt
+from flask_cors.core import get_cors_headers, get_cors_options
+from werkzeug.datastructures import Headers
+
+import routes
+from rate_limit import charge
+from app_factory import create_app
+from session import SESSION_HEADER
+from storage import email_participants
+
+KEEP_ALIVE_TIMEOUT = 75        # seconds an idle keep-alive connection is held
+EVENT_KEEPALIVE_INTERVAL = 15  # comment line sent on idle event streams
+EVENT_QUEUE_SIZE = 100         # events buffered per stream before dropping
+MAX_REQUEST_BODY = 64 * 1024 * 1024
+BODY_CHUNK = 64 * 1024         # largest request body piece handed to the app
+WSGI_THREADS = 32
+BACKLOG = 4096
+
+
+class AsyncStorage:
+    """
+    Awaitable view of a storage component. Backends doing blocking I/O
+    (blocking = True) run on the executor; in-memory calls run inline.
+    """
+
+    def __init__(self, storage, executor):
+        self._storage = storage
+        self._executor = executor
+
+    def __getattr__(self, name):
+        method = getattr(self._storage, name)
+
+        async def call(*args, **kwargs):
+            if not getattr(self._storage, "blocking", False):
+                return method(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+        return call
+
+
+class Request:
+    """The parts of an ASGI HTTP request the native handlers use."""
+
+    def __init__(self, scope, body: bytes):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                        for name, value in scope.get("headers", [])}
+        self.client = (scope.get("client") or ("", 0))[0]
+        self.body = body
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"null")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def bearer_token(self) -> str:
+        return self.headers.get("authorization", "").replace("Bearer ", "")
+
+
+def json_headers(body: bytes, extra=()):
+    return [(b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()), *extra]
+
+
+async def read_body(receive) -> bytes:
+    """Whole request body; ValueError if it exceeds MAX_REQUEST_BODY"""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("Client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_REQUEST_BODY:
+            raise ValueError("Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+class BodyStream(io.RawIOBase):
+    """
+    wsgi.input for a WSGI thread: pulls request body pieces from the ASGI
+    `receive` on the event loop only as the app reads them, so at most one
+    piece is held in memory.
+    """
+
+    def __init__(self, receive, loop, limit: int = MAX_REQUEST_BODY):
+        self._receive = receive
+        self._loop = loop
+        self._limit = limit
+        self._piece = memoryview(b"")
+        self._more = True
+        self._size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._piece and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                raise ConnectionError("Client disconnected")
+            self._piece = memoryview(message.get("body", b""))
+            self._more = message.get("more_body", False)
+            self._size += len(self._piece)
+            if self._size > self._limit:
+                raise ValueError("Request body too large")
+        count = min(len(buffer), len(self._piece))
+        buffer[:count] = self._piece[:count]
+        self._piece = self._piece[count:]
+        return count
+
+
+def _with_headers(send, extra):
+    """`send` adding `extra` headers to the response start, unless the app set them already"""
+    if not extra:
+        return send
+
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            names = {name.lower() for name, _ in message.get("headers", [])}
+            headers = [*message.get("headers", []), *(h for h in extra if h[0] not in names)]
+            message = {**message, "headers": headers}
+        await send(message)
+    return wrapped
+
+
+class GuardBoxASGI:
+    """ASGI application over the components of one create_app() app."""
+
+    def __init__(self, flask_app, wsgi_threads: int = WSGI_THREADS, password_threads=None):
+        self.flask_app = flask_app
+        self.services = flask_app.extensions["guardbox"]
+        # Flask handlers (the routes without a native handler)
+        self.wsgi_executor = ThreadPoolExecutor(wsgi_threads, thread_name_prefix="wsgi")
+        # bcrypt releases the GIL, so one thread per core saturates the CPU
+        self.password_executor = ThreadPoolExecutor(password_threads or os.cpu_count() or 4,
+                                                    thread_name_prefix="bcrypt")
+        self.storage = AsyncStorage(self.services.storage, self.wsgi_executor)
+        # The settings CORS(app) in create_app() was built from
+        self.cors_options = get_cors_options(flask_app)
+
+        # Open event streams per user, touched only on the event loop
+        self.subscribers = {}
+        self._loop = None
+        self.services.email_listeners.append(self._publish)
+
+        self.routes = {
+            ("GET", "/healthz"): self.healthz,
+            ("GET", "/readyz"): self.readyz,
+            ("POST", "/login"): self.login,
+            ("POST", "/register"): self.register,
+            ("GET", "/get_emails"): self.get_emails,
+            ("GET", "/events"): self.events,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            # Flask reads (and flask_cors decorates) the rest itself
+            return await self.wsgi(scope, receive, send)
+
+        send = _with_headers(send, self.cors_headers(scope))
+        try:
+            body = await read_body(receive)
+        except ValueError as e:
+            return await self.respond(send, 413, {"error": str(e)})
+        except ConnectionError:
+            return
+        request = Request(scope, body)
+        try:
+            await handler(request, receive, send)
+        except Exception as e:
+            await self.respond(send, 500, {"error": str(e)})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._loop = asyncio.get_running_loop()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self):
+        """Stop the executors and the app's components."""
+        self.wsgi_executor.shutdown(wait=False, cancel_futures=True)
+        self.password_executor.shutdown(wait=False, cancel_futures=True)
+        self.services.shutdown()
+
+    # Helpers
+
+    def cors_headers(self, scope):
+        """The CORS headers flask_cors would add to the response to this request"""
+        request_headers = Headers([(name.decode("latin-1"), value.decode("latin-1"))
+                                   for name, value in scope.get("headers", [])])
+        headers = get_cors_headers(self.cors_options, request_headers, scope["method"])
+        return [(name.lower().encode("latin-1"), str(value).encode("latin-1"))
+                for name, value in headers.items(multi=True)]
+
+    async def respond(self, send, status, data, headers=()):
+        body = json.dumps(data).encode()
+        await send({"type": "http.response.start", "status": status, "headers": json_headers(body, headers)})
+        await send({"type": "http.response.body", "body": body})
+
+    async def run(self, executor, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(function, *args))
+
+    async def rate_limited(self, request, send, cost, account=None):
+        """Charge the same token buckets as the Flask routes; True if a 429 was sent"""
+        account_key = f"account:{account}" if isinstance(account, str) and account else None
+        args = (self.services.ip_limiter, f"ip:{request.client}", cost, self.services.account_limiter, account_key)
+        if self.services.storage.blocking:
+            # Shared buckets are SQLite writes that may wait on another worker's lock
+            retry_after = await self.run(self.wsgi_executor, charge, *args)
+        else:
+            retry_after = charge(*args)
+        if not retry_after:
+            return False
+        await self.respond(send, 429, {"error": "Rate limit exceeded", "retry_after": math.ceil(retry_after)},
+                           [(b"retry-after", str(max(1, math.ceil(retry_after))).encode())])
+        return True
+
+    def authenticate(self, token):
+        """(user_email, None) or (None, (status, error body))"""
+        if not token:
+            return None, (401, {"error": "No token provided"})
+        try:
+            return self.services.auth.decode(token), None
+        except jwt.InvalidTokenError:
+            return None, (401, {"error": "Invalid token"})
+
+    async def take_keypair(self):
+        if self.services.keypair_pool:
+            # Ready keypairs are handed out at once; an empty pool generates inline
+            return await self.run(self.wsgi_executor, self.services.keypair_pool.take)
+        return await asyncio.wrap_future(self.services.crypto.submit_keygen())
+
+    # Native routes
+
+    async def healthz(self, request, receive, send):
+        await self.respond(send, 200, {"status": "ok", "pid": os.getpid()})
+
+    async def readyz(self, request, receive, send):
+        self_test = self.services.self_test
+        if self_test is None:
+            return await self.respond(send, 200, {"ready": True, "checks": {}, "self_test": "disabled"})
+        status = self_test.status()
+        await self.respond(send, 200 if status["ready"] else 503, status)
+
+    async def login(self, request, receive, send):
+        data = request.json()
+        email = data.get('email') or data.get('username')
+        if await self.rate_limited(request, send, routes.LOGIN_COST, email):
+            return
+        password = data.get('password')
+        if not email or not password:
+            return await self.respond(send, 400, {"error": "Email and password required"})
+
+        user = await self.storage.get_user(email)
+        if user is None:
+            return await self.respond(send, 404, {"error": "User not found"})
+
+        svc = self.services
+        is_valid, upgraded_hash = await self.run(self.password_executor, svc.password_policy.verify_and_upgrade,
+                                                 password, user['password_hash'])
+        if not is_valid:
+            return await self.respond(send, 401, {"error": "Invalid password"})
+        if upgraded_hash:
+            await self.storage.update_user(email, password_hash=upgraded_hash)
+
+        await self.respond(send, 200, {
+            "message": "Login successful",
+            "token": svc.auth.issue(email),
+            "user_kyber_pk": user['kyber_keys']['public'],
+            "user_signature_pk": user['signature_keys']['public']
+        })
+
+    async def register(self, request, receive, send):
+        data = request.json()
+        username = data.get('username')
+        if await self.rate_limited(request, send, routes.REGISTER_COST, username or data.get('email')):
+            return
+        password = data.get('password')
+        if not username or not password:
+            return await self.respond(send, 400, {"error": "Username and password required"})
+        if await self.storage.get_user(username):
+            return await self.respond(send, 400, {"error": "User already exists"})
+
+        svc = self.services
+        password_hash, keypair = await asyncio.gather(
+            self.run(self.password_executor, svc.password_policy.hash, password),
+            self.take_keypair()
+        )
+        # Storage and keystore writes
+        user = await self.run(self.wsgi_executor, svc.create_user, username, password_hash, keypair)
+        if user is None:
+            return await self.respond(send, 400, {"error": "User already exists"})
+
+        await self.respond(send, 200, {
+            "message": "User registered successfully",
+            "user_kyber_pk": user['kyber_keys']['public'],
+            "user_signature_pk": user['signature_keys']['public']
+        })
+
+    async def get_emails(self, request, receive, send):
+        if SESSION_HEADER.lower() in request.headers:
+            # Session-sealed requests are unsealed by the Flask route
+            return await self.wsgi(request.scope, None, send, request.body)
+        user_email, error = self.authenticate(request.bearer_token())
+        if error:
+            return await self.respond(send, *error)
+
+        folder = request.query.get('folder', 'inbox')
+        emails = await self.storage.mailbox(user_email)
+        # Signature checks may reach the crypto workers on a cache miss
+        listing = await self.run(self.wsgi_executor, routes.folder_listing,
+                                 self.services, emails, user_email, folder)
+        await self.respond(send, 200, {"emails": listing, "folder": folder, "count": len(listing)})
+
+    async def events(self, request, receive, send):
+        """Server-Sent Events: one "email" event per new message for the user"""
+        # EventSource cannot set headers, so the token may come in the query
+        user_email, error = self.authenticate(request.bearer_token() or request.query.get('token', ''))
+        if error:
+            return await self.respond(send, *error)
+
+        queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self.subscribers.setdefault(user_email, set()).add(queue)
+        disconnected = asyncio.ensure_future(receive())
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache")
+            ]})
+            await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+            while True:
+                event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({event, disconnected}, timeout=EVENT_KEEPALIVE_INTERVAL,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    event.cancel()
+                    break
+                if event in done:
+                    chunk = f"event: email\ndata: {json.dumps(event.result())}\n\n".encode()
+                else:
+                    event.cancel()
+                    chunk = b": keepalive\n\n"
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            disconnected.cancel()
+            queues = self.subscribers.get(user_email)
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_email]
+
+    def _publish(self, email):
+        """Email listener; may run on any thread"""
+        if self._loop is None:
+            return
+        event = {
+            "email_id": email['id'],
+            "from": email['from'],
+            "subject": email['subject'],
+            "timestamp": email['timestamp']
+        }
+        recipients = [address for address in email_participants(email) if address != email['from']]
+        self._loop.call_soon_threadsafe(self._deliver, recipients, event)
+
+    def _deliver(self, recipients, event):
+        for address in recipients:
+            for queue in self.subscribers.get(address, ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # A stalled client misses events; it refetches on reconnect
+                    pass
+
+    # WSGI bridge
+
+    async def wsgi(self, scope, receive, send, body=None):
+        """
+        Serve a request with the Flask app on the WSGI thread pool. The body
+        is streamed from `receive` unless it was already read into `body`.
+        """
+        if body is not None:
+            stream, length = io.BytesIO(body), len(body)
+        else:
+            stream = io.BufferedReader(BodyStream(receive, asyncio.get_running_loop()), BODY_CHUNK)
+            length = None
+        environ = wsgi_environ(scope, stream, length)
+        status, headers, body = await self.run(self.wsgi_executor, self._call_wsgi, environ)
+        headers = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                   for name, value in headers if name.lower() != "content-length"]
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _call_wsgi(self, environ):
+        response = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = headers
+            return chunks.append
+
+        result = self.flask_app.wsgi_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return response["status"], response["headers"], b"".join(chunks)
+
+
+def wsgi_environ(scope, stream, length=None) -> dict:
+    """
+    PEP 3333 environ for an ASGI HTTP scope reading its body from `stream`.
+    `length` overrides the Content-Length header; without either (a chunked
+    body) the stream ends itself, which wsgi.input_terminated tells Flask.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": stream,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            if length is None:
+                length = int(value)
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    if length is None:
+        environ["wsgi.input_terminated"] = True
+    else:
+        environ["CONTENT_LENGTH"] = str(length)
+    return environ
+
+
+def create_asgi_app(config=None) -> GuardBoxASGI:
+    return GuardBoxASGI(create_app(config))
+
+
+# Built-in HTTP/1.1 server, used when uvicorn is not installed
+
+async def _request_body(reader, length: int, chunked: bool):
+    """Request body pieces of at most BODY_CHUNK bytes, read as the app asks for them"""
+    if not chunked:
+        while length:
+            piece = await reader.read(min(length, BODY_CHUNK))
+            if not piece:
+                raise asyncio.IncompleteReadError(b"", length)
+            length -= len(piece)
+            yield piece
+        return
+    # Transfer-Encoding: chunked (RFC 9112 7.1): size line, data, CRLF; size 0 ends it
+    while True:
+        size_field = (await reader.readline()).split(b";", 1)[0].strip()
+        if not size_field or size_field.strip(b"0123456789abcdefABCDEF"):
+            raise ValueError("Malformed chunk size")
+        size = int(size_field, 16)
+        if size == 0:
+            # Trailer fields are ignored
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        while size:
+            piece = await reader.read(min(size, BODY_CHUNK))
+            if not piece:
+                raise asyncio.IncompleteReadError(b"", size)
+            size -= len(piece)
+            yield piece
+        await reader.readexactly(2)
+
+
+async def _handle_connection(app, reader, writer):
+    """Serve keep-alive HTTP/1.1 requests on one connection until it closes"""
+    peer = writer.get_extra_info("peername") or ("", 0)
+    sock = writer.get_extra_info("sockname") or ("", 0)
+    try:
+        while True:
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            fields = dict(headers)
+            lengths = [value for name, value in headers if name == b"content-length"]
+            if len(lengths) > 1 or (lengths and not lengths[0].isdigit()):
+                # Negative or malformed lengths would read the body to EOF
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                break
+
+            # Transfer-Encoding wins over Content-Length (RFC 9112 6.3)
+            coding = fields.get(b"transfer-encoding", b"").lower()
+            chunked = coding.rsplit(b",", 1)[-1].strip() == b"chunked"
+            if coding and not chunked:
+                writer.write(b"HTTP/1.1 501 Not Implemented\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                break
+            length = 0 if chunked or not lengths else int(lengths[0])
+            if length > MAX_REQUEST_BODY:
+                writer.write(b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                break
+            if fields.get(b"expect", b"").lower() == b"100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            body = _request_body(reader, length, chunked)
+
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": version.split("/", 1)[-1],
+                "method": method.upper(),
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode("latin-1"),
+                "query_string": query.encode("latin-1"),
+                "root_path": "",
+                "headers": headers,
+                "client": peer[:2],
+                "server": sock[:2],
+            }
+            state = {"close": version == "HTTP/1.0" or fields.get(b"connection", b"").lower() == b"close",
+                     "body_done": False}
+
+            async def receive():
+                # The body goes to the app piece by piece, never buffered whole
+                if not state["body_done"]:
+                    try:
+                        return {"type": "http.request", "body": await body.__anext__(), "more_body": True}
+                    except StopAsyncIteration:
+                        state["body_done"] = True
+                        return {"type": "http.request", "body": b"", "more_body": False}
+                # Only streaming responses listen past the body: wait for the client to go
+                await reader.read()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    response_headers = message.get("headers", [])
+                    # Without a length the body ends when the connection does
+                    if not any(name.lower() == b"content-length" for name, _ in response_headers):
+                        state["close"] = True
+                    try:
+                        reason = HTTPStatus(status).phrase
+                    except ValueError:
+                        reason = ""
+                    lines = [f"HTTP/1.1 {status} {reason}".encode("latin-1")]
+                    lines += [name + b": " + value for name, value in response_headers]
+                    lines.append(b"Connection: close" if state["close"] else b"Connection: keep-alive")
+                    writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+                elif message["type"] == "http.response.body":
+                    writer.write(message.get("body", b""))
+                    await writer.drain()
+
+            await app(scope, receive, send)
+            await writer.drain()
+            # Skip what the app left of the body (it would be parsed as the
+            # next request), unless there is too much to be worth reading
+            if not state["close"] and not state["body_done"]:
+                unread = 0
+                async for piece in body:
+                    unread += len(piece)
+                    if unread > BODY_CHUNK:
+                        state["close"] = True
+                        break
+            if state["close"]:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    except asyncio.CancelledError:
+        # Server shutdown; ending quietly keeps asyncio from logging every connection
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(app, host: str = "127.0.0.1", port: int = 5000, sock=None):
+    """
+    Listening asyncio.Server serving `app` (port 0 picks a free port), or
+    accepting on an already bound `sock` (e.g. one shared by forked workers)
+    """
+    handler = partial(_handle_connection, app)
+    if sock is not None:
+        return await asyncio.start_server(handler, sock=sock, backlog=BACKLOG)
+    return await asyncio.start_server(handler, host, port, backlog=BACKLOG)
+
+
+async def serve_forever(app, host="127.0.0.1", port=5000, sock=None):
+    """Run the built-in server until cancelled, then close the app"""
+    server = await start_server(app, host, port, sock)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.close()
+
+
+def raise_open_file_limit():
+    """Lift the soft open-file limit to the hard limit (one fd per connection)"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else max(soft, 65536)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def serve(app, host: str = "127.0.0.1", port: int = 5000):
+    """Serve with uvicorn if installed, else with the built-in server"""
+    raise_open_file_limit()
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+
+    if uvicorn is not None:
+        uvicorn.run(app, host=host, port=port, timeout_keep_alive=KEEP_ALIVE_TIMEOUT, backlog=BACKLOG)
+        return
+    print(f"🚀 GuardBox (asyncio) listening on http://{host}:{port}")
+    try:
+        asyncio.run(serve_forever(app, host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve GuardBox on asyncio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    serve(create_asgi_app(), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
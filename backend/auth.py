@@ -0,0 +1,40 @@
+"""
+Auth component: JWT bearer tokens.
+
+Issues tokens at login and resolves the Authorization header of the current
+request to a user. Routes call authenticate() instead of decoding tokens
+themselves, so the scheme can be swapped in one place.
+"""
+
+from datetime import datetime, timedelta
+
+import jwt
+from flask import jsonify, request
+
+
+class JWTAuth:
+    """HS256 bearer tokens carrying the user's email."""
+
+    def __init__(self, secret: str, expiry_hours: float = 24):
+        self.secret = secret
+        self.expiry = timedelta(hours=expiry_hours)
+
+    def issue(self, email: str) -> str:
+        return jwt.encode({
+            'email': email,
+            'exp': datetime.utcnow() + self.expiry
+        }, self.secret, algorithm='HS256')
+
+    def decode(self, token: str) -> str:
+        """User email for a token; raises jwt.InvalidTokenError."""
+        return jwt.decode(token, self.secret, algorithms=['HS256'])['email']
+
+    def authenticate(self):
+        """(user_email, token, None) for the current request, or (None, None, error response)."""
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        if not token:
+            return None, None, (jsonify({"error": "No token provided"}), 401)
+        try:
+            return self.decode(token), token, None
+        except jwt.InvalidTokenError:
+            return None, None, (jsonify({"error": "Invalid token"}), 401)
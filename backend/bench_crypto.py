@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Crypto micro-benchmarks with regression baselines
+
+Measures ops/sec and p50/p99 latency for every primitive the server uses:
+Kyber keygen/encapsulate/decapsulate per mode, bcrypt hash/verify, JWT
+encode/decode and HMAC sign/verify. Each one runs with 1..N threads and
+1..N processes, results are written as JSON, and a stored baseline is
+compared so a slower backend or library upgrade shows up as a regression.
+
+Usage:
+    python3 bench_crypto.py                      # run, compare with the baseline
+    python3 bench_crypto.py --save-baseline      # run and store as the new baseline
+    python3 bench_crypto.py --ops kyber512 hmac --max-workers 4 --scale 0.2
+
+Exits with status 1 when any result falls more than --tolerance below the
+baseline.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import platform
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from importlib import metadata
+from typing import Callable, Dict, List
+
+import bcrypt
+import jwt
+
+import kem
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+DEFAULT_OUTPUT = os.path.join(HERE, "bench_results.json")
+DEFAULT_TOLERANCE = 0.2
+
+# Fixed so results stay comparable across hosts (the server calibrates its own)
+BCRYPT_COST = 10
+JWT_SECRET = "benchmark-secret"
+
+
+# ----------------------------
+# Operations
+# ----------------------------
+# Each factory does its setup and returns a zero-argument callable that
+# performs one operation. Factories run inside every worker, so nothing
+# unpicklable crosses a process boundary.
+
+def _kyber_keygen(mode):
+    context = kem.get_context(mode)
+    return context.keygen
+
+
+def _kyber_encapsulate(mode):
+    context = kem.get_context(mode)
+    pk, _ = context.keygen()
+    return lambda: context.encapsulate(pk)
+
+
+def _kyber_decapsulate(mode):
+    context = kem.get_context(mode)
+    pk, sk = context.keygen()
+    ct, _ = context.encapsulate(pk)
+    return lambda: context.decapsulate(sk, ct)
+
+
+def _bcrypt_hash():
+    return lambda: bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=BCRYPT_COST))
+
+
+def _bcrypt_verify():
+    hashed = bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=BCRYPT_COST))
+    return lambda: bcrypt.checkpw(b"password123", hashed)
+
+
+def _jwt_claims():
+    return {"email": "testuser1@guardbox.com", "exp": datetime.utcnow() + timedelta(hours=24)}
+
+
+def _jwt_encode():
+    claims = _jwt_claims()
+    return lambda: jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+
+def _jwt_decode():
+    token = jwt.encode(_jwt_claims(), JWT_SECRET, algorithm="HS256")
+    return lambda: jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+
+
+def _hmac_sign():
+    key, message = secrets.token_bytes(32), secrets.token_bytes(1024)
+    return lambda: hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def _hmac_verify():
+    key, message = secrets.token_bytes(32), secrets.token_bytes(1024)
+    signature = hmac.new(key, message, hashlib.sha256).hexdigest()
+    return lambda: hmac.compare_digest(signature, hmac.new(key, message, hashlib.sha256).hexdigest())
+
+
+# name -> (group, factory, iterations per worker at scale 1.0)
+OPERATIONS: Dict[str, tuple] = {}
+for _mode in kem.SUPPORTED_MODES:
+    OPERATIONS[f"kyber{_mode}_keygen"] = (f"kyber{_mode}", lambda m=_mode: _kyber_keygen(m), 500)
+    OPERATIONS[f"kyber{_mode}_encapsulate"] = (f"kyber{_mode}", lambda m=_mode: _kyber_encapsulate(m), 500)
+    OPERATIONS[f"kyber{_mode}_decapsulate"] = (f"kyber{_mode}", lambda m=_mode: _kyber_decapsulate(m), 500)
+OPERATIONS.update({
+    "bcrypt_hash": ("bcrypt", _bcrypt_hash, 10),
+    "bcrypt_verify": ("bcrypt", _bcrypt_verify, 10),
+    "jwt_encode": ("jwt", _jwt_encode, 5000),
+    "jwt_decode": ("jwt", _jwt_decode, 5000),
+    "hmac_sign": ("hmac", _hmac_sign, 20000),
+    "hmac_verify": ("hmac", _hmac_verify, 20000),
+})
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def _worker(name: str, iterations: int) -> List[float]:
+    """Run one operation `iterations` times; returns per-call latencies in seconds."""
+    op = OPERATIONS[name][1]()
+    op()  # warm-up call outside the measurement
+    latencies = []
+    clock = time.perf_counter
+    for _ in range(iterations):
+        start = clock()
+        op()
+        latencies.append(clock() - start)
+    return latencies
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def measure(name: str, executor: str, workers: int, iterations: int) -> dict:
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        # Start the processes before timing so fork cost is not counted
+        if executor == "process":
+            list(pool.map(_worker, [name] * workers, [0] * workers))
+        start = time.perf_counter()
+        futures = [pool.submit(_worker, name, iterations) for _ in range(workers)]
+        latencies = sorted(t for f in futures for t in f.result())
+        elapsed = time.perf_counter() - start
+
+    return {
+        "operation": name,
+        "executor": executor,
+        "workers": workers,
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000
+    }
+
+
+def worker_counts(max_workers: int) -> List[int]:
+    """1, 2, 4, ... up to and including max_workers."""
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def _version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def environment() -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": {p: _version(p) for p in ("smaj-kyber", "bcrypt", "PyJWT", "cryptography")}
+    }
+
+
+def result_key(result: dict) -> str:
+    return f"{result['operation']}/{result['executor']}/{result['workers']}"
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float = DEFAULT_TOLERANCE) -> List[dict]:
+    """
+    Rows present in both runs with the relative ops/sec change; a row is a
+    regression when throughput dropped by more than `tolerance`.
+    """
+    previous = {result_key(r): r for r in baseline}
+    rows = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None or not before["ops_per_sec"]:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        rows.append({
+            "key": result_key(result),
+            "baseline_ops_per_sec": before["ops_per_sec"],
+            "ops_per_sec": result["ops_per_sec"],
+            "change": change,
+            "regression": change < -tolerance
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GuardBox crypto micro-benchmarks")
+    parser.add_argument("--ops", nargs="*", default=None,
+                        help="operation names or groups (kyber512, bcrypt, jwt, hmac, ...); default all")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executors", nargs="*", default=["thread", "process"], choices=["thread", "process"])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the iteration counts")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    selected = [name for name, (group, _, _) in OPERATIONS.items()
+                if args.ops is None or name in args.ops or group in args.ops]
+    if not selected:
+        parser.error("no matching operations")
+
+    print(f"🔐 Crypto benchmarks: {len(selected)} operations, up to {args.max_workers} workers")
+    print(f"{'operation':<24} {'executor':<8} {'workers':>7} {'ops/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    results = []
+    for name in selected:
+        iterations = max(1, int(OPERATIONS[name][2] * args.scale))
+        for executor in args.executors:
+            for workers in worker_counts(args.max_workers):
+                result = measure(name, executor, workers, iterations)
+                results.append(result)
+                print(f"{name:<24} {executor:<8} {workers:>7} {result['ops_per_sec']:>12.1f} "
+                      f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+
+    report = {"environment": environment(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline["results"], args.tolerance)
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n=== BASELINE ({baseline['environment']['timestamp']}) ===")
+    for row in rows:
+        flag = "❌" if row["regression"] else "✅"
+        print(f"{flag} {row['key']:<40} {row['baseline_ops_per_sec']:>12.1f} -> "
+              f"{row['ops_per_sec']:>12.1f} ({row['change'] * 100:+.1f}%)")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}%")
+        return 1
+    print("\n🎉 No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
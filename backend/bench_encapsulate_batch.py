@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: one /encapsulate_batch call vs N sequential /encapsulate calls
+
+Usage:
+    python3 bench_encapsulate_batch.py [N] [--live]
+
+By default the Flask app is driven in-process through its test client (no
+network, rate limits disabled). With --live the benchmark hits a running
+server at BASE_URL instead; sequential calls may then be rate limited.
+"""
+
+import sys
+import time
+
+import kem
+
+BASE_URL = "http://127.0.0.1:5000"
+
+
+def make_client(live):
+    if live:
+        import requests
+        session = requests.Session()
+        return lambda path, body: session.post(f"{BASE_URL}{path}", json=body).status_code
+
+    from app_factory import create_app
+    client = create_app({"rate_limits": False}).test_client()
+    return lambda path, body: client.post(path, json=body).status_code
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 256
+    live = "--live" in sys.argv
+    post = make_client(live)
+
+    print(f"🔐 Generating {n} Kyber512 public keys...")
+    public_keys = [kem.keygen("512")[0].hex() for _ in range(n)]
+
+    print(f"🧪 {n} sequential /encapsulate calls...")
+    start = time.perf_counter()
+    failures = sum(1 for pk in public_keys if post("/encapsulate", {"client_public_key": pk}) != 200)
+    sequential = time.perf_counter() - start
+
+    print("🧪 One /encapsulate_batch call...")
+    start = time.perf_counter()
+    status = post("/encapsulate_batch", {"public_keys": public_keys})
+    batch = time.perf_counter() - start
+
+    print("\n=== RESULTS ===")
+    print(f"Mode:        {'live server' if live else 'in-process'}")
+    print(f"Sequential:  {sequential * 1000:8.1f} ms  ({n / sequential:8.0f} ops/s, {failures} failed)")
+    print(f"Batch:       {batch * 1000:8.1f} ms  ({n / batch:8.0f} ops/s, HTTP {status})")
+    print(f"Speedup:     {sequential / batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: /sign_batch and /verify_batch vs N sequential /sign and /verify calls
+
+Usage:
+    python3 bench_sign_batch.py [N] [--live]
+
+By default the Flask app is driven in-process through its test client (no
+network). With --live the benchmark hits a running server at BASE_URL.
+"""
+
+import base64
+import hashlib
+import hmac
+import sys
+import time
+
+BASE_URL = "http://127.0.0.1:5000"
+
+
+def make_client(live):
+    if live:
+        import requests
+        session = requests.Session()
+        return lambda path, body: session.post(f"{BASE_URL}{path}", json=body).json()
+
+    from app_factory import create_app
+    client = create_app().test_client()
+    return lambda path, body: client.post(path, json=body).get_json()
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 1000
+    live = "--live" in sys.argv
+    post = make_client(live)
+    key = "benchmark-key"
+    messages = [f"Message {i}: quarterly report and meeting notes" for i in range(n)]
+
+    print(f"🧪 {n} sequential /sign calls...")
+    start = time.perf_counter()
+    signatures = [post("/sign", {"message": m})["signature"] for m in messages]
+    sign_sequential = time.perf_counter() - start
+
+    print("🧪 One /sign_batch call...")
+    start = time.perf_counter()
+    batch_signatures = post("/sign_batch", {"messages": messages})["signatures"]
+    sign_batch = time.perf_counter() - start
+    assert batch_signatures == signatures
+
+    # /verify keys the HMAC with the key in the request, so sign with that key
+    signatures = [hmac.new(key.encode(), m.encode(), hashlib.sha256).hexdigest() for m in messages]
+
+    print(f"🧪 {n} sequential /verify calls...")
+    start = time.perf_counter()
+    valid = sum(post("/verify", {"message": m, "signature": s, "public_key": key})["valid"]
+                for m, s in zip(messages, signatures))
+    verify_sequential = time.perf_counter() - start
+
+    print("🧪 One /verify_batch call...")
+    start = time.perf_counter()
+    result = post("/verify_batch", {"messages": messages, "signatures": signatures, "public_key": key})
+    verify_batch = time.perf_counter() - start
+    assert result["valid_count"] == valid == n
+
+    print("\n=== RESULTS ===")
+    print(f"Mode:               {'live server' if live else 'in-process'}")
+    print(f"Sign sequential:    {sign_sequential * 1000:8.1f} ms  ({n / sign_sequential:9.0f} ops/s)")
+    print(f"Sign batch:         {sign_batch * 1000:8.1f} ms  ({n / sign_batch:9.0f} ops/s)")
+    print(f"Verify sequential:  {verify_sequential * 1000:8.1f} ms  ({n / verify_sequential:9.0f} ops/s)")
+    print(f"Verify batch:       {verify_batch * 1000:8.1f} ms  ({n / verify_batch:9.0f} ops/s, "
+          f"bitmap {len(base64.b64decode(result['bitmap']))} bytes)")
+    print(f"Speedup:            sign {sign_sequential / sign_batch:.1f}x, verify {verify_sequential / verify_batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 import base64
+import importlib
+import json
+import os
+import platform
 import sys
+import time
+from importlib import metadata
 from typing import Tuple, Callable
 
 import requests
@@ -21,54 +27,192 @@ def fetch_server_pk(server_url: str) -> bytes:
         raise ValueError("Public key was not valid hex") from e
 
 
+# Kyber512 byte lengths: public key, ciphertext, shared secret
+KYBER512_LENGTHS = (800, 768, 32)
+BENCHMARK_ROUNDS = 50
+BACKEND_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "guardbox", "kyber_backend.json")
+
+# Known-answer vector from the server's Kyber512 (smaj_kyber): decapsulating
+# `ciphertext` with `secret_key` must give `shared_secret`. ML-KEM (FIPS 203)
+# has the same sizes but derives a different secret, so it fails this check.
+KYBER512_KAT = {
+    "secret_key": (
+        "ZSlq/Dar4eBB78Oz2nRAYdIBtza3fTdGwGx/vRsYpyjCpDu7TdBraup9ZQkDIhUhPzZzGUwb"
+        "O3NGjEqCznF6WsunejtmN9YhFiYDXdFYxUiySNN7PuxHZ/YAIHWMtoI0Nweyg7VI4IqOmLzA"
+        "+YJ3hlE0eBpDZuC4k8I3sgfGlIxWVPi+3+ozGrUKlSOVHneYFIcYy9VWXSIO0JNVljlP3yCY"
+        "5QJSWYRwL1FvKABa/eC5KbU494bL9WiHPpBh+Ps9wCMIhCOz8vuBI6NaJokG6sgj6mFjT3Zn"
+        "MpQgpDlywQQEtgeTMdDC3Fo9R3JKOsF+8ZCxd/Ful2VcQ1uR1tpJG3ENBGoNwzvP92OtkLKK"
+        "G3d1nngWCyfHeosFRQYAfci2J7VzlmVhFDZI2TU388gPEJS+CWGhhlceUrNv8vUyE9u5G1y5"
+        "kFt++cpb/qZD6mB9AcBjH6Na+cSomKdVOswcuVMcVuWCmJijzZpe4xHJmGIu3cMm8/iw+MYA"
+        "BuVkmrx5dqd2dyZn/SGDQaBbzDpXhmcFT9CK8PZsgBUvXqJECRucD0OPrAQK7tpePebMh3nI"
+        "KlZe1IyxFeJtxft83lsxZSEh4+c4NimswcdJ/VmP77grZnTAG5BVBiN2T5Ngwbav2mWn5nOW"
+        "z2SDw9eiSqxVjVV062W2PTlSlwWLS2V5SKXA7+k6XjdnvDG84MAPYpZyPHEoi4GI/vIlJmuo"
+        "kjZtYmaAMAY7SoQyIwqIsBsGUXOuYEIMCPMvgvkJ0qZdVzIU1noXo2aJ8VsgLtCvlJcWZ1ZV"
+        "aqSf2YQOi9bMPgSWZPqkIIhPTCJS6DRjSEApa+AB8NcWw/q269NmjRavGtgEgvq10XmKyDhT"
+        "I/o0Wldu63E3QRApAYyuIYp1XYht94hO8zAJylt/EThYEXdyImtwbsp7YTiskuqxXttBLrpX"
+        "afDFJxyznfyZUDMfZ8OG19ddb/g63WNHIPBK/gEHM/kuu/iuRZBpO0qk9FVw2NBIM8um7Qk9"
+        "kXWcM7iw2qK8TrnBK5Rr6gIR9FtbNqOSHyEPj+RsNXpGBYOwtmYqBMkIGmV98pVDeQkItRwD"
+        "ujlxcUNohvtmAnUDfjisnvNmPJXFGvG7u0QVOWOfSJfOBeUaE7acVflY9ZpxXXIYPVZhVANi"
+        "AJU8NYlObEJJ7ld8HgmWTZQB1WvG85SxNJt8Zhuh3UeFFWkvDztl2XF9QbJqa0lWmBpOqVMT"
+        "a8qSr8Ou8jNiy4CzGMBjxtKhAWNpRMweako3Wvig3YoOKoio3oLNEgIm7wJHYbtL/vUMLLm2"
+        "yvIemiOIfNRk2rIgmNjFV7vDHLwvb8aRwPm9nUkLR2xt8xVryYt9OJtESCInz/hn0CxKL2Uq"
+        "rpu7HllgDUl5Deij4Os+6ydC9mo8jJYhmnMXLkkaDflB5EtJ9rRxA8SLEEIRKideXvpkQRYt"
+        "pDe2o8fH2Le4v6IVT5URinE3LIoRAnyPYaJT6iQqXXe3q9a1nOGPA6G5WSmq8PQ/nXA3TuHD"
+        "SZtB1oQlm3VMnGepAPqquggPnbAOB1ZpKFJWm5WbwAIHRIwQ4JRLwJNugIOUBYQf7kWa6/W3"
+        "dzFFEYIRHPFfoWUCO9hwRFU4Pham+MgQahZcttZh1CoafvI8GAkmTxkMW2ig1SEvJQfFveOR"
+        "1SCoe5SeebdOZCw9W7MTwEBNs+BzyTcsBEYP2cF4zUscnOdz/gg2//V0aYZvoxdQDeUP+klm"
+        "PxUs7wxU/NBcIRujUyh5D0UsFMkAuKRy3IB8yselwPF3/fOK75GbFwnN6IyNBCezdbs0Nie3"
+        "+mQhuOiYPqJV8hO8oNxQTzcojHwF+NqgCkmQM9a8eIEjNkU6tPURWTEHkcYtraBeqBsPZxvJ"
+        "mnlsDSSVliLKtJNvX0J+nimMbJzBb1cvLAA+/ZUl54yMvSI3G9YS6qc8jVsmQmgk2ykXyIZH"
+        "3vOdTTRU+GIG9RVa7Whi0xGqZ8qu/ThTuvg205AM34ZAE/BiX0V2EADMr3VnYjYTEON/ezxJ"
+        "h4JWm4Ux1VYHGiDCAOsF4ppY/NQ0TfW1TYMAloTKbaYgMgF3lJ0PTAN1/jNxS12gPqSlkPN8"
+        "eQ9SXiRwhsONLDw0uexXphy9vs0UKMvvEnUvlqTwG4RdRhQf2Jlb0vbr7IosmKka9/6z1t/P"
+        "C3S+0Pz0YXSkPQ5n"
+    ),
+    "ciphertext": (
+        "BSfZt24hAkbSl4EWCYKlondK0G9Ja58mjaXNN7qxOxH3oEZ8OSUoaaPI6jachIqvHaC7QauT"
+        "MgdpNk0frB9MoxUdgG8GdsEwhtuBJQTis9RDq9cWtCyoEb4TmCA3PIhrRe0pI1XFAp5KBIi2"
+        "cFS/yrjUQqb5C6Q7E04M6eNJOlQ50eMYgqz/9cXj03IEZdmXBnhpH7fKDvKQmjW54/qwCOdp"
+        "ia0gItw7wwn0xpyBDAeEyTrZnigeWlOZank2zQ1elOIYEVYkpEbp6PxaTWs7QlFX3tWiwQap"
+        "p9LKwoHCuvrlMY1Kql8sMCnDk0gpQ1MfaReXKOOjhkisLzpF0lUzOzf+ilDJMhmiy0qkfpLu"
+        "Rl4E9LkieVzTDCWXqzoJdsw/CUSFwg/MwPau/3ZP5hgI3brs9oMpbbgHVZaHIwkJk1IAfEed"
+        "iAicA+9WCaI3WfIJSWG3T9HOVQjk+LofUSn8Lknlv96NlhhcUusxnvk/MwMPjkMml2OeZa9d"
+        "355SJFseWaHQTA8pCFJGMIz0I/nD+h1RGrZD1qnyxmQQVuYwaLCNJH0ovg/1K4iBiJA12uEG"
+        "k4/8k6D2bEp/8dqgGPBPlmemLwnaexK5OewLJjIha+WYgCOFhmMC8UeAvUrHHWYFSjP5buAp"
+        "6pIynUnRUHtpVjoerWJmvDn/E0ySFqBJUUKvvsonYf3KDDMC/rcULski+sOLh0yHFCSUXZpe"
+        "JFsKR6jWosWhzfiQ/7xihexehKe1eW1P4JoZUBW8QVHZZlDMdjls4vf8klREDw7RRVRpF0nQ"
+        "dsls5hCK5etmpVvqY0Hd4MUIcHURhB57YQ/yuxQ2tPziXU5jwVU3yHnO48ybaNBAbN2h/uV0"
+        "yMG0bA+wBGa2DJWAh26VFbUy4tCJ3L34jvR9FXg10xl4ss9OnGwmOzujUqxTYpbPao483bQ4"
+        "ySS9dNQGrsPWG1dBkR1gDpEYztgZetEwCJtoaBKQVBP3Y4bu+trxgZ05tnsSzUAEqYysUmIb"
+        "0lTuI0rdD/96kz8J"
+    ),
+    "shared_secret": "rZXYAQiB/Rj3HV0p/cTpzLQO0Sg8jVXKU3pIWC4n2dM=",
+}
+
+
+def _load_smaj_kyber():
+    import smaj_kyber  # type: ignore
+    smaj_kyber.set_mode("512")  # align with server
+    # Library takes (ciphertext, secret key)
+    return smaj_kyber.keygen, smaj_kyber.encapsulate, lambda sk, ct: smaj_kyber.decapsulate(ct, sk)
+
+
+def _load_pqcrypto(module_name: str):
+    def load():
+        module = importlib.import_module(module_name)
+        return module.generate_keypair, module.encrypt, module.decrypt
+    return load
+
+
+# name -> (distribution whose version is cached, loader returning (keygen, encapsulate, decapsulate))
+KYBER_BACKENDS = {
+    "smaj_kyber": ("smaj-kyber", _load_smaj_kyber),
+    "pqcrypto.kyber512": ("pqcrypto", _load_pqcrypto("pqcrypto.kem.kyber512")),
+}
+
+
+def _installed_version(distribution: str):
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _environment() -> dict:
+    """Python and library versions a cached choice is valid for."""
+    return {
+        "python": platform.python_version(),
+        "versions": {dist: _installed_version(dist) for dist, _ in KYBER_BACKENDS.values()}
+    }
+
+
+def _known_answer_ok(decapsulate) -> bool:
+    """The backend derives the server's shared secret from a fixed Kyber512 keypair and ciphertext."""
+    secret_key, ciphertext, shared_secret = (
+        base64.b64decode(KYBER512_KAT[field]) for field in ("secret_key", "ciphertext", "shared_secret"))
+    return decapsulate(secret_key, ciphertext) == shared_secret
+
+
+def _round_trip_ok(keygen, encapsulate, decapsulate) -> bool:
+    """Lengths match Kyber512 and both sides derive the same secret."""
+    pk, sk = keygen()
+    ct, ss = encapsulate(pk)
+    pk_len, ct_len, ss_len = KYBER512_LENGTHS
+    if (len(pk), len(ct), len(ss)) != (pk_len, ct_len, ss_len):
+        return False
+    return decapsulate(sk, ct) == ss
+
+
+def _benchmark(keygen, encapsulate) -> float:
+    """Encapsulations per second against one key."""
+    pk, _ = keygen()
+    encapsulate(pk)
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_ROUNDS):
+        encapsulate(pk)
+    return BENCHMARK_ROUNDS / (time.perf_counter() - start)
+
+
+def _read_cache():
+    try:
+        with open(BACKEND_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(entry: dict):
+    try:
+        os.makedirs(os.path.dirname(BACKEND_CACHE_PATH), exist_ok=True)
+        with open(BACKEND_CACHE_PATH, "w") as f:
+            json.dump(entry, f, indent=2)
+    except OSError:
+        pass  # cache is an optimisation only
+
+
 def get_kyber_backend() -> tuple[str, Callable[[bytes], Tuple[bytes, bytes]]]:
     """
     Return a (backend_name, encapsulate_fn) pair.
     encapsulate_fn(pk) -> (ciphertext, shared_secret)
-    Prefers smaj_kyber to match the server; falls back to pqcrypto if available.
+    The first run verifies and benchmarks every installed backend and caches
+    the fastest correct one with the library versions; later runs reuse it
+    until Python or a library version changes.
     """
-    
-    # 1) Try smaj_kyber (matches your Flask server)
-    try:
-        from smaj_kyber import set_mode  # type: ignore
-        set_mode("512")  # align with server
-        # Some releases use 'encapsulate', others 'encrypt'; detect dynamically.
+    environment = _environment()
+    cached = _read_cache()
+    if cached and cached.get("environment") == environment and cached.get("backend") in KYBER_BACKENDS:
         try:
-            from smaj_kyber import encapsulate as _enc  # type: ignore
-            def encapsulate_fn(pk: bytes) -> Tuple[bytes, bytes]:
-                ct, ss = _enc(pk)
-                return ct, ss
-            return "smaj_kyber", encapsulate_fn
-        except ImportError:
-            from smaj_kyber import encrypt as _enc  # type: ignore
-            def encapsulate_fn(pk: bytes) -> Tuple[bytes, bytes]:
-                ct, ss = _enc(pk)
-                return ct, ss
-            return "smaj_kyber", encapsulate_fn
-    except Exception:
-        pass
-
-    # 2) Fallback: pqcrypto (works on many envs, but Python 3.13 can be tricky)
-    try:
-        # Prefer importing the concrete submodule directly
-        from pqcrypto.kem.kyber512 import encrypt as pq_encrypt  # type: ignore
-        def encapsulate_fn(pk: bytes) -> Tuple[bytes, bytes]:
-            ct, ss = pq_encrypt(pk)
-            return ct, ss
-        return "pqcrypto.kyber512", encapsulate_fn
-    except Exception:
-        # Last attempt: module import style (older docs)
+            _, encapsulate, decapsulate = KYBER_BACKENDS[cached["backend"]][1]()
+            if _known_answer_ok(decapsulate):
+                return cached["backend"], encapsulate
+        except Exception:
+            pass  # fall through and probe again
+
+    results = {}
+    candidates = {}
+    for name, (_, load) in KYBER_BACKENDS.items():
         try:
-            from pqcrypto.kem import kyber512  # type: ignore
-            def encapsulate_fn(pk: bytes) -> Tuple[bytes, bytes]:
-                ct, ss = kyber512.encrypt(pk)
-                return ct, ss
-            return "pqcrypto.kyber512", encapsulate_fn
+            keygen, encapsulate, decapsulate = load()
+            if not _known_answer_ok(decapsulate):
+                results[name] = {"error": "not the server's Kyber512 (known-answer check failed)"}
+                continue
+            if not _round_trip_ok(keygen, encapsulate, decapsulate):
+                results[name] = {"error": "round-trip check failed"}
+                continue
+            results[name] = {"encapsulations_per_sec": _benchmark(keygen, encapsulate)}
+            candidates[name] = encapsulate
         except Exception as e:
-            raise ImportError(
-                "No usable Kyber backend found. "
-                "Install 'smaj_kyber' (preferred) or 'pqcrypto' that supports your Python."
-            ) from e
+            results[name] = {"error": str(e)}
+
+    if not candidates:
+        raise ImportError(
+            "No usable Kyber backend found. "
+            "Install 'smaj_kyber' (preferred) or 'pqcrypto' that supports your Python."
+        )
+
+    best = max(candidates, key=lambda name: results[name]["encapsulations_per_sec"])
+    _write_cache({"backend": best, "environment": environment, "results": results})
+    return best, candidates[best]
 
 
 def main():
@@ -0,0 +1,99 @@
+"""
+Server configuration for create_app().
+
+DEFAULT_CONFIG lists every setting with its default. load_config() layers
+environment variables and explicit overrides on top, so the same code path
+runs in development, tests, benchmarks and deployment. Setting a component's
+option to None/False/0 disables it; disabled components are never created.
+"""
+
+import os
+
+# Keys and the database live outside the source tree: $GUARDBOX_DATA_DIR, or
+# the per-user data directory ($XDG_DATA_HOME/guardbox)
+DATA_DIR = os.environ.get("GUARDBOX_DATA_DIR") or os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "guardbox")
+
+DEFAULT_CONFIG = {
+    # Werkzeug debugger for the development server (server_complete.main);
+    # never enable it on a reachable host
+    "debug": False,
+
+    # Kyber parameter sets served side by side; each call names its own mode
+    # (or it is inferred from key length)
+    "kyber_modes": ("512", "768", "1024"),
+    "default_kyber_mode": "512",
+
+    # Crypto component: "process" (warm worker processes) or "thread"
+    "crypto_executor": "process",
+    "crypto_workers": None,  # default: one per core
+
+    # Storage component: "memory" (this process only) or "sqlite" (shared by
+    # every worker process opening storage_path)
+    "storage": "memory",
+    "storage_path": os.path.join(DATA_DIR, "guardbox.db"),
+    "seed_test_users": True,
+
+    # Keystore for server and user key material; None keeps keys in memory only
+    "keystore_path": os.path.join(DATA_DIR, "guardbox.keystore"),
+    "keystore_passphrase": None,
+    "keystore_compact_threshold": 1000,  # None: never compact in this process
+
+    # Server Kyber key rotation (seconds); None disables the rotation thread
+    "key_rotation_seconds": 24 * 3600,
+    "key_grace_seconds": 3600,
+    # Reload keys and new users written by sibling workers (seconds); None disables
+    "shared_sync_seconds": None,
+
+    # Auth component: JWT bearer tokens
+    "jwt_secret": "your-secret-key-change-in-production",
+    "jwt_expiry_hours": 24,
+
+    # bcrypt cost calibrated against this login latency; or a fixed cost
+    "password_target_ms": 250,
+    "password_cost": None,
+
+    # Optional components (0/None disables)
+    "keypair_pool_size": 32,
+    "self_test_interval": 60,
+    "session_capacity": 10000,
+    "session_idle_timeout": 30 * 60,
+    "session_max_age": 12 * 3600,
+    "key_registry_capacity": 10000,
+    "secret_key_cache_capacity": 1000,
+    "secret_key_cache_ttl": 3600,
+    "email_verification_cache_capacity": 100000,
+
+    # Rate limits (tokens per second, bucket size); False lets everything through
+    "rate_limits": True,
+    "ip_rate": 5,
+    "ip_burst": 50,
+    "account_rate": 1,
+    "account_burst": 20,
+}
+
+# Environment variable -> setting
+ENVIRONMENT = {
+    "GUARDBOX_KEYSTORE": "keystore_path",
+    "GUARDBOX_KEYSTORE_PASSPHRASE": "keystore_passphrase",
+    "GUARDBOX_STORAGE": "storage",
+    "GUARDBOX_STORAGE_PATH": "storage_path",
+    "GUARDBOX_JWT_SECRET": "jwt_secret",
+    "GUARDBOX_DEBUG": "debug",
+}
+
+
+def load_config(overrides=None) -> dict:
+    """Defaults, then environment variables, then explicit overrides."""
+    config = dict(DEFAULT_CONFIG)
+    for variable, key in ENVIRONMENT.items():
+        if variable in os.environ:
+            value = os.environ[variable]
+            if isinstance(DEFAULT_CONFIG[key], bool):
+                value = value.strip().lower() in ("1", "true", "yes", "on")
+            config[key] = value
+    unknown = set(overrides or {}) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown config settings: {', '.join(sorted(unknown))}")
+    config.update(overrides or {})
+    return config
@@ -0,0 +1,355 @@
+"""
+Multi-core crypto service for Kyber KEM and HMAC signature operations.
+
+Work is executed by a pool of warm worker processes that have already loaded
+a Kyber context for every supported mode (see kem.py), so a single Flask
+process can use every core instead of being bound by its own GIL, and each
+call can pick its own parameter set.
+
+Payloads cross the process boundary as one packed bytes buffer of fixed-size
+records per chunk (e.g. pk|pk|pk...), and results come back the same way in a
+buffer pre-sized by the worker. That keeps pickling to one flat object per
+chunk no matter how many keys are in a batch.
+
+Single operations skip the pool: one Kyber op or a small HMAC is cheaper to
+run in the calling thread (ctypes and hashlib release the GIL) than a round
+trip to a worker, so only batches and large messages are dispatched.
+
+Every operation has a blocking form (encapsulate, sign, ...) and a
+future-returning form (submit_encapsulate, submit_sign, ...).
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import kem
+
+# HMAC over small messages is cheaper than a round trip to a worker, and
+# hashlib already releases the GIL for large buffers
+INLINE_HMAC_LIMIT = 64 * 1024
+
+# Kyber batches up to this many records run in the calling thread
+INLINE_KEM_LIMIT = 1
+
+# Smallest number of records worth shipping to a worker as one chunk
+MIN_CHUNK = 8
+
+
+# ----------------------------
+# Worker side
+# ----------------------------
+
+def _init_worker(modes: Sequence[str]):
+    kem.warm_up(modes)
+
+
+def _keygen_packed(mode: str, count: int) -> bytes:
+    context = kem.get_context(mode)
+    out = bytearray()
+    for _ in range(count):
+        pk, sk = context.keygen()
+        out += pk
+        out += sk
+    return bytes(out)
+
+
+def _encapsulate_packed(mode: str, packed_pks: bytes) -> bytes:
+    context = kem.get_context(mode)
+    pk_len, out_len = context.pk_len, context.ct_len + context.ss_len
+    count = len(packed_pks) // pk_len
+    out = bytearray(count * out_len)
+    view = memoryview(packed_pks)
+    for i in range(count):
+        ct, ss = context.encapsulate(bytes(view[i * pk_len:(i + 1) * pk_len]))
+        out[i * out_len:(i + 1) * out_len] = ct + ss
+    return bytes(out)
+
+
+def _decapsulate_packed(mode: str, sk: bytes, packed_cts: bytes) -> bytes:
+    context = kem.get_context(mode)
+    ct_len, ss_len = context.ct_len, context.ss_len
+    count = len(packed_cts) // ct_len
+    out = bytearray(count * ss_len)
+    view = memoryview(packed_cts)
+    for i in range(count):
+        out[i * ss_len:(i + 1) * ss_len] = context.decapsulate(sk, bytes(view[i * ct_len:(i + 1) * ct_len]))
+    return bytes(out)
+
+
+def _hmac_hex(key: bytes, message: bytes) -> str:
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def _signature_matches(signature, expected: str) -> bool:
+    # Signatures come from clients: compare bytes, since compare_digest
+    # rejects non-ASCII str, and treat anything but a str as invalid
+    return isinstance(signature, str) and hmac.compare_digest(signature.encode(), expected.encode())
+
+
+def _hmac_many_hex(key: bytes, messages: Sequence[bytes]) -> List[str]:
+    # Key schedule (ipad/opad blocks) computed once; each message starts from a copy
+    keyed = hmac.new(key, digestmod=hashlib.sha256)
+    signatures = []
+    for message in messages:
+        mac = keyed.copy()
+        mac.update(message)
+        signatures.append(mac.hexdigest())
+    return signatures
+
+
+# ----------------------------
+# Caller side
+# ----------------------------
+
+def _completed(function: Callable, *args) -> Future:
+    """Run function(*args) in the calling thread; return it as a finished future."""
+    done = Future()
+    try:
+        done.set_result(function(*args))
+    except Exception as e:
+        done.set_exception(e)
+    return done
+
+
+def _chain(future: Future, transform: Callable) -> Future:
+    """Return a future resolving to transform(future.result())."""
+    chained = Future()
+
+    def _done(f):
+        try:
+            chained.set_result(transform(f.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(_done)
+    return chained
+
+
+def _gather(futures: List[Future], transform: Callable) -> Future:
+    """Return a future resolving to transform([f.result() for f in futures])."""
+    if not futures:
+        done = Future()
+        done.set_result(transform([]))
+        return done
+
+    gathered = Future()
+    remaining = [len(futures)]
+
+    def _done(_):
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            try:
+                gathered.set_result(transform([f.result() for f in futures]))
+            except Exception as e:
+                gathered.set_exception(e)
+
+    for f in futures:
+        f.add_done_callback(_done)
+    return gathered
+
+
+def _split(packed: bytes, *lengths: int) -> List[Tuple[bytes, ...]]:
+    """Split a buffer of fixed-size records into tuples of fields."""
+    record_len = sum(lengths)
+    records = []
+    for start in range(0, len(packed), record_len):
+        fields, offset = [], start
+        for length in lengths:
+            fields.append(packed[offset:offset + length])
+            offset += length
+        records.append(tuple(fields))
+    return records
+
+
+class CryptoService:
+    """Kyber and HMAC operations executed on a pool of warm worker processes."""
+
+    def __init__(self, mode: str = kem.DEFAULT_MODE, workers: Optional[int] = None,
+                 modes: Sequence[str] = kem.SUPPORTED_MODES, executor: str = "process"):
+        if mode not in modes:
+            raise ValueError(f"Default mode {mode} is not in the supported modes")
+        # Default parameter set when a call does not name one
+        self.mode = mode
+        self.modes = tuple(modes)
+        self.algorithm = f"Kyber{mode}"
+        self.workers = workers or os.cpu_count() or 4
+
+        if executor not in ("process", "thread"):
+            raise ValueError("executor must be 'process' or 'thread'")
+
+        if executor == "process" and "fork" in multiprocessing.get_all_start_methods():
+            # fork keeps workers from re-importing the server module
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(self.modes,)
+            )
+        else:
+            # Threads on request, or without fork (Windows): ctypes releases
+            # the GIL, so threads still scale
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.modes,)
+            )
+
+    def warm_up(self):
+        """Start every worker now, before the caller spawns any threads."""
+        futures = [self._executor.submit(_keygen_packed, self.mode, 1) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+        return self
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _chunks(self, count: int) -> List[Tuple[int, int]]:
+        size = max(MIN_CHUNK, -(-count // self.workers))
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+    def _context(self, mode: Optional[str]) -> kem.KyberContext:
+        mode = mode or self.mode
+        if mode not in self.modes:
+            raise ValueError(f"Kyber{mode} is not enabled on this server")
+        return kem.get_context(mode)
+
+    def check_public_key(self, pk: bytes, mode: Optional[str] = None) -> str:
+        """Validate a public key; returns its mode (inferred from length if not given)."""
+        mode = mode or kem.mode_for_public_key(pk)
+        context = self._context(mode)
+        if len(pk) != context.pk_len:
+            raise ValueError(f"Public key has the wrong length for {context.algorithm}")
+        return mode
+
+    # Key generation
+
+    def submit_keygen_many(self, count: int, mode: Optional[str] = None) -> Future:
+        context = self._context(mode)
+        if count <= INLINE_KEM_LIMIT:
+            futures = [_completed(_keygen_packed, context.mode, count)]
+        else:
+            futures = [self._executor.submit(_keygen_packed, context.mode, end - start)
+                       for start, end in self._chunks(count)]
+        return _gather(futures, lambda results: _split(b"".join(results), context.pk_len, context.sk_len))
+
+    def keygen_many(self, count: int, mode: Optional[str] = None) -> List[Tuple[bytes, bytes]]:
+        return self.submit_keygen_many(count, mode).result()
+
+    def submit_keygen(self, mode: Optional[str] = None) -> Future:
+        return _chain(self.submit_keygen_many(1, mode), lambda results: results[0])
+
+    def keygen(self, mode: Optional[str] = None) -> Tuple[bytes, bytes]:
+        return self.submit_keygen(mode).result()
+
+    # Encapsulation
+
+    def submit_encapsulate_many(self, public_keys: Sequence[bytes], mode: Optional[str] = None) -> Future:
+        """
+        Future resolving to [(ciphertext, shared_secret), ...] in input order.
+        Keys may mix parameter sets when no mode is given; each set is packed
+        and chunked separately.
+        """
+        by_mode: Dict[str, List[int]] = {}
+        for i, pk in enumerate(public_keys):
+            by_mode.setdefault(self.check_public_key(pk, mode), []).append(i)
+
+        submit = _completed if len(public_keys) <= INLINE_KEM_LIMIT else self._executor.submit
+        futures, layout = [], []
+        for key_mode, indices in by_mode.items():
+            context = kem.get_context(key_mode)
+            for start, end in self._chunks(len(indices)):
+                chunk = indices[start:end]
+                futures.append(submit(_encapsulate_packed, key_mode, b"".join(public_keys[i] for i in chunk)))
+                layout.append((chunk, context.ct_len, context.ss_len))
+
+        def unpack(results):
+            ordered = [None] * len(public_keys)
+            for packed, (chunk, ct_len, ss_len) in zip(results, layout):
+                for i, record in zip(chunk, _split(packed, ct_len, ss_len)):
+                    ordered[i] = record
+            return ordered
+        return _gather(futures, unpack)
+
+    def encapsulate_many(self, public_keys: Sequence[bytes], mode: Optional[str] = None) -> List[Tuple[bytes, bytes]]:
+        return self.submit_encapsulate_many(public_keys, mode).result()
+
+    def submit_encapsulate(self, public_key: bytes, mode: Optional[str] = None) -> Future:
+        return _chain(self.submit_encapsulate_many([public_key], mode), lambda results: results[0])
+
+    def encapsulate(self, public_key: bytes, mode: Optional[str] = None) -> Tuple[bytes, bytes]:
+        return self.submit_encapsulate(public_key, mode).result()
+
+    # Decapsulation
+
+    def submit_decapsulate_many(self, secret_key: bytes, ciphertexts: Sequence[bytes],
+                                mode: Optional[str] = None) -> Future:
+        """Future resolving to [shared_secret, ...] in input order."""
+        context = self._context(mode or kem.mode_for_secret_key(secret_key))
+        if len(secret_key) != context.sk_len:
+            raise ValueError(f"Secret key has the wrong length for {context.algorithm}")
+        for ct in ciphertexts:
+            if len(ct) != context.ct_len:
+                raise ValueError(f"Ciphertext has the wrong length for {context.algorithm}")
+
+        submit = _completed if len(ciphertexts) <= INLINE_KEM_LIMIT else self._executor.submit
+        futures = [
+            submit(_decapsulate_packed, context.mode, secret_key, b"".join(ciphertexts[start:end]))
+            for start, end in self._chunks(len(ciphertexts))
+        ]
+        return _gather(futures, lambda results: [ss for (ss,) in _split(b"".join(results), context.ss_len)])
+
+    def decapsulate_many(self, secret_key: bytes, ciphertexts: Sequence[bytes],
+                         mode: Optional[str] = None) -> List[bytes]:
+        return self.submit_decapsulate_many(secret_key, ciphertexts, mode).result()
+
+    def submit_decapsulate(self, secret_key: bytes, ciphertext: bytes, mode: Optional[str] = None) -> Future:
+        return _chain(self.submit_decapsulate_many(secret_key, [ciphertext], mode), lambda results: results[0])
+
+    def decapsulate(self, secret_key: bytes, ciphertext: bytes, mode: Optional[str] = None) -> bytes:
+        return self.submit_decapsulate(secret_key, ciphertext, mode).result()
+
+    # HMAC signatures
+
+    def submit_sign(self, key: str, message: str) -> Future:
+        key_bytes, message_bytes = key.encode(), message.encode()
+        if len(message_bytes) <= INLINE_HMAC_LIMIT:
+            return _completed(_hmac_hex, key_bytes, message_bytes)
+        return self._executor.submit(_hmac_hex, key_bytes, message_bytes)
+
+    def sign(self, key: str, message: str) -> str:
+        return self.submit_sign(key, message).result()
+
+    def submit_verify(self, key: str, message: str, signature: str) -> Future:
+        return _chain(self.submit_sign(key, message),
+                      lambda expected: _signature_matches(signature, expected))
+
+    def verify(self, key: str, message: str, signature: str) -> bool:
+        return self.submit_verify(key, message, signature).result()
+
+    def submit_sign_many(self, key: str, messages: Sequence[str]) -> Future:
+        """Future resolving to [signature hex, ...]; one pre-keyed HMAC state per chunk."""
+        key_bytes = key.encode()
+        encoded = [m.encode() for m in messages]
+        if sum(len(m) for m in encoded) <= INLINE_HMAC_LIMIT:
+            return _completed(_hmac_many_hex, key_bytes, encoded)
+        futures = [self._executor.submit(_hmac_many_hex, key_bytes, encoded[start:end])
+                   for start, end in self._chunks(len(encoded))]
+        return _gather(futures, lambda results: [sig for chunk in results for sig in chunk])
+
+    def sign_many(self, key: str, messages: Sequence[str]) -> List[str]:
+        return self.submit_sign_many(key, messages).result()
+
+    def submit_verify_many(self, key: str, messages: Sequence[str], signatures: Sequence[str]) -> Future:
+        """Future resolving to [valid, ...] in input order."""
+        if len(messages) != len(signatures):
+            raise ValueError("messages and signatures must have the same length")
+        return _chain(self.submit_sign_many(key, messages),
+                      lambda expected: [_signature_matches(sig, exp) for sig, exp in zip(signatures, expected)])
+
+    def verify_many(self, key: str, messages: Sequence[str], signatures: Sequence[str]) -> List[bool]:
+        return self.submit_verify_many(key, messages, signatures).result()
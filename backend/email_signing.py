@@ -0,0 +1,113 @@
+"""
+Sign-on-send and cached verify-on-read for stored emails.
+
+Each email is signed once when it is sent, over a canonical encoding of its
+immutable fields (flags such as is_read are excluded), with the sender's
+signature key. The signature records the key version it was made with.
+
+Reads look the verification status up in a cache keyed by (email id, key
+version): a message is verified at most once per key version rather than on
+every listing. A sender key change yields a new key version and therefore a
+fresh verification.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+ALGORITHM = "HMAC-SHA256"
+
+# Fields fixed at send time; everything else on the record may change later
+SIGNED_FIELDS = ("id", "from", "to", "cc", "bcc", "subject", "body", "envelope", "timestamp")
+
+VALID = "valid"
+INVALID = "invalid"
+UNSIGNED = "unsigned"
+UNKNOWN_KEY = "unknown_key"
+
+
+def canonical_email(email: dict) -> str:
+    return json.dumps({field: email.get(field) for field in SIGNED_FIELDS},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def key_version(signature_keys: Optional[dict]) -> Optional[str]:
+    """Short id of a signature keypair (changes whenever the key does)."""
+    if not signature_keys:
+        return None
+    return hashlib.sha256(signature_keys["public"].encode()).hexdigest()[:16]
+
+
+def sign_email(email: dict, signature_keys: Optional[dict], sign: Callable[[str, str], str]) -> Optional[dict]:
+    """Signature record for an email, or None if the sender has no signature keys."""
+    if not signature_keys:
+        return None
+    return {
+        "value": sign(signature_keys["private"], canonical_email(email)),
+        "key_version": key_version(signature_keys),
+        "algorithm": ALGORITHM
+    }
+
+
+class VerificationCache:
+    """Bounded (email id, key version) -> status cache with LRU eviction."""
+
+    def __init__(self, verify: Callable[[str, str, str], bool], capacity: int = 100000):
+        self.capacity = capacity
+        self._verify = verify
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def status(self, email: dict, signature_keys: Optional[dict]) -> str:
+        """
+        Verification status of an email against its sender's current
+        signature keys: valid, invalid, unsigned, or unknown_key when the
+        email was signed with a key the sender no longer has.
+        """
+        signature = email.get("signature")
+        if not signature:
+            return UNSIGNED
+        version = signature.get("key_version")
+        if not signature_keys or key_version(signature_keys) != version:
+            return UNKNOWN_KEY
+
+        cache_key = (email["id"], version)
+        with self._lock:
+            status = self._statuses.get(cache_key)
+            if status is not None:
+                self._statuses.move_to_end(cache_key)
+                self._hits += 1
+                return status
+            self._misses += 1
+
+        valid = self._verify(signature_keys["private"], canonical_email(email), signature["value"])
+        status = VALID if valid else INVALID
+        with self._lock:
+            self._statuses[cache_key] = status
+            while len(self._statuses) > self.capacity:
+                self._statuses.popitem(last=False)
+        return status
+
+    def forget(self, email_id):
+        """Drop cached statuses for an email (e.g. when it is deleted for good)."""
+        with self._lock:
+            for cache_key in [k for k in self._statuses if k[0] == email_id]:
+                del self._statuses[cache_key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._statuses),
+                "capacity": self.capacity,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 1.0
+            }
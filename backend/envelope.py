@@ -0,0 +1,122 @@
+"""
+Envelope encryption for multi-recipient mail.
+
+The body is encrypted once (stream_crypto, AES-256-GCM chunks) under a random
+data key. The data key is then wrapped for each recipient: a Kyber
+encapsulation against the recipient's public key yields a shared secret,
+HKDF turns it into a key-encryption key, and AES key wrap (RFC 3394) seals
+the 32-byte data key in 40 bytes. Adding a recipient costs one encapsulation
+and one small wrap, never another pass over the body.
+
+Envelope (JSON-safe, stored with the email):
+
+    {"cipher": "AES-256-GCM-STREAM", "ciphertext": b64,
+     "recipients": {address: {"algorithm": "Kyber512",
+                              "kem_ciphertext": b64, "wrapped_key": b64}}}
+
+A recipient unwraps with decapsulate(secret_key, kem_ciphertext) and then
+decrypts the body with the recovered data key.
+"""
+
+import base64
+import os
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.keywrap import InvalidUnwrap, aes_key_unwrap, aes_key_wrap
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+import kem
+from stream_crypto import StreamCryptoError, decrypt_bytes, encrypt_bytes
+
+CIPHER = "AES-256-GCM-STREAM"
+HKDF_INFO = b"guardbox-envelope-v1"
+DATA_KEY_LEN = 32
+
+
+class EnvelopeError(Exception):
+    """Raised when an envelope cannot be unwrapped or decrypted."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _unb64(value: str) -> bytes:
+    try:
+        return base64.b64decode(value, validate=True)
+    except (TypeError, ValueError) as e:
+        raise EnvelopeError("Malformed envelope") from e
+
+
+def _kek(shared_secret: bytes) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=HKDF_INFO).derive(shared_secret)
+
+
+def wrap_data_key(data_key: bytes, kem_ciphertext: bytes, shared_secret: bytes, algorithm: str) -> dict:
+    return {
+        "algorithm": algorithm,
+        "kem_ciphertext": _b64(kem_ciphertext),
+        "wrapped_key": _b64(aes_key_wrap(_kek(shared_secret), data_key))
+    }
+
+
+def seal_envelope(body: bytes, public_keys: Dict[str, bytes],
+                  encapsulate_many: Callable[[Sequence[bytes]], List[Tuple[bytes, bytes]]]) -> dict:
+    """
+    Encrypt `body` once and wrap its key for every recipient in
+    `public_keys` (address -> Kyber public key). `encapsulate_many` takes the
+    list of public keys and returns [(ciphertext, shared_secret), ...], e.g.
+    CryptoService.encapsulate_many.
+    """
+    data_key = os.urandom(DATA_KEY_LEN)
+    addresses = list(public_keys)
+    keys = [public_keys[address] for address in addresses]
+    encapsulated = encapsulate_many(keys)
+    return {
+        "cipher": CIPHER,
+        "ciphertext": _b64(encrypt_bytes(data_key, body)),
+        "recipients": {
+            address: wrap_data_key(data_key, ct, ss, f"Kyber{kem.mode_for_public_key(pk)}")
+            for address, pk, (ct, ss) in zip(addresses, keys, encapsulated)
+        }
+    }
+
+
+def kem_ciphertext(envelope: dict, address: str) -> bytes:
+    """The Kyber ciphertext `address` must decapsulate to open the envelope."""
+    entry = envelope.get("recipients", {}).get(address)
+    if entry is None:
+        raise EnvelopeError("Not a recipient of this envelope")
+    return _unb64(entry["kem_ciphertext"])
+
+
+def unwrap_data_key(envelope: dict, address: str, shared_secret: bytes) -> bytes:
+    """Recover the data key from the recipient's decapsulated shared secret."""
+    entry = envelope.get("recipients", {}).get(address)
+    if entry is None:
+        raise EnvelopeError("Not a recipient of this envelope")
+    try:
+        return aes_key_unwrap(_kek(shared_secret), _unb64(entry["wrapped_key"]))
+    except InvalidUnwrap as e:
+        raise EnvelopeError("Data key failed to unwrap") from e
+
+
+def open_body(envelope: dict, data_key: bytes) -> bytes:
+    try:
+        return decrypt_bytes(data_key, _unb64(envelope["ciphertext"]))
+    except StreamCryptoError as e:
+        raise EnvelopeError("Body failed authentication") from e
+
+
+def open_envelope(envelope: dict, address: str, secret_key: bytes,
+                  decapsulate: Callable[[bytes, bytes], bytes]) -> bytes:
+    """Decapsulate, unwrap and decrypt in one step; returns the plaintext body."""
+    shared_secret = decapsulate(secret_key, kem_ciphertext(envelope, address))
+    return open_body(envelope, unwrap_data_key(envelope, address, shared_secret))
+
+
+def for_recipient(envelope: dict, address: str) -> dict:
+    """Copy of the envelope carrying only `address`'s wrapped key (keeps Bcc private)."""
+    entry = envelope["recipients"].get(address)
+    return {**envelope, "recipients": {address: entry} if entry else {}}
@@ -0,0 +1,125 @@
+"""
+Thread-safe Kyber KEM with the parameter set chosen per call.
+
+smaj_kyber keeps the active mode in module globals (set_mode swaps the loaded
+library), so two threads using different security levels race with each
+other. Here every mode gets its own warm context: its own handle to the
+mode's shared library and its own buffer sizes. Calls only allocate per-call
+buffers, so contexts can be shared across threads without any lock.
+
+Modes can also be inferred from key/ciphertext lengths, which are distinct
+for 512, 768 and 1024.
+"""
+
+import ctypes
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from smaj_kyber import core as _smaj_core
+
+SUPPORTED_MODES = ("512", "768", "1024")
+DEFAULT_MODE = "512"
+
+# Byte lengths per mode: (public key, secret key, ciphertext, shared secret)
+MODE_PARAMS = _smaj_core.MODE_PARAMS
+
+_LIB_DIR = os.path.join(os.path.dirname(_smaj_core.__file__), "lib")
+_Uint8Array = ctypes.POINTER(ctypes.c_ubyte)
+
+
+class KyberContext:
+    """One loaded Kyber parameter set."""
+
+    def __init__(self, mode: str):
+        if mode not in MODE_PARAMS:
+            raise ValueError("Invalid mode. Choose '512', '768', or '1024'.")
+        self.mode = mode
+        self.algorithm = f"Kyber{mode}"
+        self.pk_len, self.sk_len, self.ct_len, self.ss_len = MODE_PARAMS[mode]
+
+        lib_path = os.path.join(_LIB_DIR, _smaj_core.get_lib_filename(f"libkyber{mode}"))
+        if not os.path.exists(lib_path):
+            raise FileNotFoundError(f"Library not found: {lib_path}")
+        lib = ctypes.CDLL(lib_path)
+        lib.keypair.argtypes = [_Uint8Array, _Uint8Array]
+        lib.encapsulate.argtypes = [_Uint8Array, _Uint8Array, _Uint8Array]
+        lib.decapsulate.argtypes = [_Uint8Array, _Uint8Array, _Uint8Array]
+        self._lib = lib
+
+    def keygen(self) -> Tuple[bytes, bytes]:
+        pk = (ctypes.c_ubyte * self.pk_len)()
+        sk = (ctypes.c_ubyte * self.sk_len)()
+        self._lib.keypair(pk, sk)
+        return bytes(pk), bytes(sk)
+
+    def encapsulate(self, public_key: bytes) -> Tuple[bytes, bytes]:
+        if len(public_key) != self.pk_len:
+            raise ValueError(f"Public key has the wrong length for {self.algorithm}")
+        pk = (ctypes.c_ubyte * self.pk_len).from_buffer_copy(public_key)
+        ct = (ctypes.c_ubyte * self.ct_len)()
+        ss = (ctypes.c_ubyte * self.ss_len)()
+        self._lib.encapsulate(pk, ct, ss)
+        return bytes(ct), bytes(ss)
+
+    def decapsulate(self, secret_key: bytes, ciphertext: bytes) -> bytes:
+        if len(secret_key) != self.sk_len:
+            raise ValueError(f"Secret key has the wrong length for {self.algorithm}")
+        if len(ciphertext) != self.ct_len:
+            raise ValueError(f"Ciphertext has the wrong length for {self.algorithm}")
+        ct = (ctypes.c_ubyte * self.ct_len).from_buffer_copy(ciphertext)
+        sk = (ctypes.c_ubyte * self.sk_len).from_buffer_copy(secret_key)
+        ss = (ctypes.c_ubyte * self.ss_len)()
+        self._lib.decapsulate(ct, sk, ss)
+        return bytes(ss)
+
+
+_contexts: Dict[str, KyberContext] = {}
+_contexts_lock = threading.Lock()
+
+
+def get_context(mode: Optional[str] = None) -> KyberContext:
+    """Warm context for a mode; created once, then read without locking."""
+    mode = mode or DEFAULT_MODE
+    context = _contexts.get(mode)
+    if context is None:
+        with _contexts_lock:
+            context = _contexts.get(mode)
+            if context is None:
+                context = KyberContext(mode)
+                # Pay for page faults and lazy symbol binding up front
+                context.keygen()
+                _contexts[mode] = context
+    return context
+
+
+def warm_up(modes=SUPPORTED_MODES):
+    for mode in modes:
+        get_context(mode)
+
+
+def _mode_for_length(length: int, index: int, what: str) -> str:
+    for mode, params in MODE_PARAMS.items():
+        if params[index] == length:
+            return mode
+    raise ValueError(f"{what} length {length} does not match any Kyber mode")
+
+
+def mode_for_public_key(public_key: bytes) -> str:
+    return _mode_for_length(len(public_key), 0, "Public key")
+
+
+def mode_for_secret_key(secret_key: bytes) -> str:
+    return _mode_for_length(len(secret_key), 1, "Secret key")
+
+
+def keygen(mode: Optional[str] = None) -> Tuple[bytes, bytes]:
+    return get_context(mode).keygen()
+
+
+def encapsulate(public_key: bytes, mode: Optional[str] = None) -> Tuple[bytes, bytes]:
+    return get_context(mode or mode_for_public_key(public_key)).encapsulate(public_key)
+
+
+def decapsulate(secret_key: bytes, ciphertext: bytes, mode: Optional[str] = None) -> bytes:
+    return get_context(mode or mode_for_secret_key(secret_key)).decapsulate(secret_key, ciphertext)
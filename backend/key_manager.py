@@ -0,0 +1,176 @@
+"""
+Server Kyber key manager with versioned key ids.
+
+Several server keypairs can be live at once. The current one is advertised to
+clients together with its key id; clients echo the id back so the server can
+decapsulate with the right secret key. Keys are rotated in the background:
+the replacement is generated off the request path and swapped in atomically,
+and the previous key keeps working for a grace window before it is retired.
+
+With a keystore attached, every key (and which one is current) is persisted,
+so restarts and sibling worker processes see the same key ids.
+"""
+
+import hashlib
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+Keypair = Tuple[bytes, bytes]
+
+# created_at, retires_at (0 = active), public key length
+KEY_RECORD = struct.Struct("<ddH")
+
+
+def key_id_for(public_key: bytes) -> str:
+    """Short, stable identifier derived from the public key."""
+    return hashlib.sha256(public_key).hexdigest()[:16]
+
+
+class ServerKey:
+    __slots__ = ("key_id", "public_key", "secret_key", "created_at", "retires_at")
+
+    def __init__(self, public_key: bytes, secret_key: bytes, created_at: float):
+        self.key_id = key_id_for(public_key)
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.created_at = created_at
+        self.retires_at: Optional[float] = None
+
+    def pack(self) -> bytes:
+        header = KEY_RECORD.pack(self.created_at, self.retires_at or 0.0, len(self.public_key))
+        return header + self.public_key + self.secret_key
+
+    @classmethod
+    def unpack(cls, record: bytes) -> "ServerKey":
+        created_at, retires_at, pk_len = KEY_RECORD.unpack_from(record)
+        body = record[KEY_RECORD.size:]
+        key = cls(body[:pk_len], body[pk_len:], created_at)
+        key.retires_at = retires_at or None
+        return key
+
+
+class KeyManager:
+    """Holds the current and recently rotated server keypairs."""
+
+    def __init__(self, keygen: Callable[[], Keypair],
+                 rotation_interval: float = 24 * 3600,
+                 grace_period: float = 3600,
+                 clock: Callable[[], float] = time.time,
+                 keystore=None,
+                 name: str = "kem"):
+        self._keygen = keygen
+        self._keystore = keystore
+        # Keystore record names; one manager per name (e.g. per Kyber mode)
+        self._prefix = f"server/{name}/"
+        self._current_name = f"server/{name}-current"
+        self.rotation_interval = rotation_interval
+        self.grace_period = grace_period
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._keys: Dict[str, ServerKey] = {}
+        self._current: Optional[ServerKey] = None
+        if not self._load():
+            self.add_key(*keygen())
+
+    def _load(self) -> bool:
+        """Restore keys from the keystore; False if there is nothing to restore."""
+        if self._keystore is None:
+            return False
+        keys = {}
+        for name, record in self._keystore.items(self._prefix):
+            key = ServerKey.unpack(record)
+            keys[key.key_id] = key
+        current_id = (self._keystore.get(self._current_name) or b"").decode()
+        if current_id not in keys:
+            return False
+        with self._lock:
+            self._keys = keys
+            self._current = keys[current_id]
+        return True
+
+    def reload(self) -> bool:
+        """Pick up keys a sibling process rotated; call after keystore.reload()."""
+        return self._load()
+
+    def _persist(self, *keys: ServerKey):
+        if self._keystore is None:
+            return
+        records = {self._prefix + key.key_id: key.pack() for key in keys}
+        records[self._current_name] = self._current.key_id.encode()
+        self._keystore.put_many(records)
+
+    def add_key(self, public_key: bytes, secret_key: bytes, make_current: bool = True) -> ServerKey:
+        """Register a keypair (e.g. loaded from storage) and optionally make it current."""
+        key = ServerKey(public_key, secret_key, self._clock())
+        with self._lock:
+            self._keys[key.key_id] = key
+            changed = [key]
+            if make_current:
+                changed += self._promote(key)
+            self._persist(*changed)
+        return key
+
+    def _promote(self, key: ServerKey):
+        # Caller holds the lock; returns the keys whose state changed
+        previous = self._current
+        key.retires_at = None
+        self._current = key
+        if previous is not None and previous is not key:
+            previous.retires_at = self._clock() + self.grace_period
+            return [previous]
+        return []
+
+    def current(self) -> ServerKey:
+        return self._current
+
+    def get(self, key_id: Optional[str]) -> Optional[ServerKey]:
+        """Key for a client-presented id (current key if none given); None if unknown or retired."""
+        if not key_id:
+            return self._current
+        key = self._keys.get(key_id)
+        if key is None or (key.retires_at is not None and key.retires_at <= self._clock()):
+            return None
+        return key
+
+    def active_keys(self):
+        now = self._clock()
+        return [k for k in list(self._keys.values()) if k.retires_at is None or k.retires_at > now]
+
+    def rotate(self) -> ServerKey:
+        """Generate a new key (outside the lock) and make it current."""
+        public_key, secret_key = self._keygen()
+        key = self.add_key(public_key, secret_key)
+        self.purge_retired()
+        return key
+
+    def purge_retired(self):
+        now = self._clock()
+        with self._lock:
+            for key_id in [k for k, key in self._keys.items()
+                           if key.retires_at is not None and key.retires_at <= now]:
+                del self._keys[key_id]
+                if self._keystore is not None:
+                    self._keystore.delete(self._prefix + key_id)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._rotation_loop, name="server-key-rotation", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def _rotation_loop(self):
+        while not self._stop.wait(min(self.rotation_interval, max(self.grace_period, 1))):
+            if self._clock() - self._current.created_at >= self.rotation_interval:
+                self.rotate()
+            else:
+                self.purge_retired()
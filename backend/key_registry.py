@@ -0,0 +1,119 @@
+"""
+Client public-key registry with fingerprint addressing.
+
+A client registers its Kyber public key once and gets back a short
+fingerprint; later KEM calls send the fingerprint instead of the 1600-char
+hex key. The registry keeps validated, already-parsed keys in an LRU cache,
+so repeat callers skip both the upload and the hex parsing.
+
+SharedPublicKeyRegistry also writes registrations to storage shared by
+several workers, so a fingerprint registered on one worker resolves on all
+of them.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# 128-bit fingerprints: short to send, too long to find collisions for
+FINGERPRINT_BYTES = 16
+# How long a shared registration lasts without being registered again
+SHARED_KEY_TTL = 24 * 3600
+
+
+def fingerprint(public_key: bytes) -> str:
+    return hashlib.sha256(public_key).hexdigest()[:FINGERPRINT_BYTES * 2]
+
+
+class PublicKeyRegistry:
+    """Bounded fingerprint -> public key cache with LRU eviction."""
+
+    def __init__(self, validate: Callable[[bytes], None], capacity: int = 10000):
+        if capacity < 1:
+            raise ValueError("Registry capacity must be at least 1")
+        self.capacity = capacity
+        self._validate = validate
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def register(self, public_key: bytes) -> str:
+        """Validate and cache a key; raises ValueError for malformed keys."""
+        self._validate(public_key)
+        fp = fingerprint(public_key)
+        with self._lock:
+            self._keys[fp] = public_key
+            self._keys.move_to_end(fp)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+                self._evictions += 1
+        return fp
+
+    def get(self, fp: str) -> Optional[bytes]:
+        """Cached key for a fingerprint, or None if unknown or evicted."""
+        with self._lock:
+            public_key = self._keys.get(fp)
+            if public_key is None:
+                self._misses += 1
+                return None
+            self._keys.move_to_end(fp)
+            self._hits += 1
+            return public_key
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._keys),
+                "capacity": self.capacity,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 1.0
+            }
+
+
+class SharedPublicKeyRegistry(PublicKeyRegistry):
+    """
+    Registry backed by shared storage (SQLiteStorage expiring records). The
+    local LRU serves repeat lookups; misses fall back to the store, which
+    keeps up to `capacity` registrations for `ttl` seconds each.
+    """
+
+    NAMESPACE = "public_key"
+
+    def __init__(self, store, validate: Callable[[bytes], None], capacity: int = 10000,
+                 ttl: float = SHARED_KEY_TTL, clock: Callable[[], float] = time.time):
+        super().__init__(validate, capacity)
+        self.ttl = ttl
+        self._store = store
+        self._clock = clock
+
+    def register(self, public_key: bytes) -> str:
+        fp = super().register(public_key)
+        self._store.put_expiring(self.NAMESPACE, fp, {"public_key": public_key},
+                                 self._clock() + self.ttl, self.capacity)
+        return fp
+
+    def get(self, fp: str) -> Optional[bytes]:
+        public_key = super().get(fp)
+        if public_key is not None:
+            return public_key
+        found = self._store.get_expiring(self.NAMESPACE, fp)
+        if found is None or found[1] <= self._clock():
+            return None
+        public_key = found[0]["public_key"]
+        # Validated by the worker that registered it
+        with self._lock:
+            self._keys[fp] = public_key
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+                self._evictions += 1
+        return public_key
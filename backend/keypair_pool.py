@@ -0,0 +1,118 @@
+"""
+Background pool of pre-generated Kyber keypairs.
+
+A refill thread keeps up to `size` keypairs ready so that registration does
+not pay for keygen on the request path. When a burst of sign-ups drains the
+pool, `take()` falls back to generating a keypair inline. A failing keygen
+is logged, counted in the metrics and retried with exponential backoff.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+Keypair = Tuple[bytes, bytes]
+
+REFILL_BACKOFF = 0.1      # first retry delay (seconds) after a failed keygen
+MAX_REFILL_BACKOFF = 10.0
+
+
+class KeypairPool:
+    """Bounded pool of keypairs refilled by a daemon thread."""
+
+    def __init__(self, keygen: Callable[[], Keypair], size: int = 32):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self._keygen = keygen
+        self._keypairs = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._deficit_since: Optional[float] = None
+        self._last_refill_lag = 0.0
+        self._max_refill_lag = 0.0
+        self._refill_failures = 0
+        self._last_refill_error: Optional[str] = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._refill_loop, name="kyber-keypair-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def take(self) -> Keypair:
+        """Return a ready keypair, or generate one inline if the pool is empty."""
+        with self._cond:
+            if self._keypairs:
+                keypair = self._keypairs.popleft()
+                self._hits += 1
+                if self._deficit_since is None:
+                    self._deficit_since = time.monotonic()
+                self._cond.notify()
+                return keypair
+            self._misses += 1
+        return self._keygen()
+
+    def _refill_loop(self):
+        backoff = REFILL_BACKOFF
+        while True:
+            with self._cond:
+                while self._running and len(self._keypairs) >= self.size:
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+            # Generate outside the lock so take() is never blocked by keygen
+            try:
+                keypair = self._keygen()
+            except Exception as e:
+                print(f"⚠️ Keypair pool refill failed, retrying in {backoff:.1f}s: {e}")
+                with self._cond:
+                    self._refill_failures += 1
+                    self._last_refill_error = str(e)
+                    # stop() wakes the wait early
+                    self._cond.wait(backoff)
+                backoff = min(backoff * 2, MAX_REFILL_BACKOFF)
+                continue
+            backoff = REFILL_BACKOFF
+
+            with self._cond:
+                self._last_refill_error = None
+                self._keypairs.append(keypair)
+                if len(self._keypairs) >= self.size and self._deficit_since is not None:
+                    self._last_refill_lag = time.monotonic() - self._deficit_since
+                    self._max_refill_lag = max(self._max_refill_lag, self._last_refill_lag)
+                    self._deficit_since = None
+
+    def metrics(self) -> dict:
+        with self._cond:
+            taken = self._hits + self._misses
+            current_lag = time.monotonic() - self._deficit_since if self._deficit_since else 0.0
+            return {
+                "size": self.size,
+                "available": len(self._keypairs),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / taken if taken else 1.0,
+                "refill_lag_ms": current_lag * 1000,
+                "last_refill_lag_ms": self._last_refill_lag * 1000,
+                "max_refill_lag_ms": self._max_refill_lag * 1000,
+                "refill_failures": self._refill_failures,
+                "last_refill_error": self._last_refill_error
+            }
@@ -0,0 +1,292 @@
+"""
+Persistent on-disk keystore for server and user key material.
+
+Layout (little-endian):
+
+    header  : b"GBKS" | version u8 | flags u8 | reserved u16 | salt[16]
+    record  : length u32 | kind u8 | name_len u16 | name | value | check[16]
+
+`length` covers everything after itself. `check` is a truncated SHA-256 of
+kind|name_len|name|value, so a flipped bit is detected on load. Records are
+append-only; the last record for a name wins and a tombstone (kind 1)
+deletes it. An incomplete last record (an append interrupted by a crash) is
+ignored on load and cut off before the next append. `compact()` rewrites the
+file without dead records.
+
+When a passphrase is given, values are sealed with AES-256-GCM (nonce
+prepended, record name as associated data) under a key derived with scrypt
+from the passphrase and the header salt.
+
+The file is read through mmap, so startup cost is one pass over the records
+with no keygen at all.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process only
+    fcntl = None
+
+MAGIC = b"GBKS"
+VERSION = 1
+FLAG_ENCRYPTED = 0x01
+
+HEADER = struct.Struct("<4sBBH16s")
+RECORD_PREFIX = struct.Struct("<IBH")
+CHECK_LEN = 16
+NONCE_LEN = 12
+
+KIND_VALUE = 0
+KIND_TOMBSTONE = 1
+
+
+class KeystoreError(Exception):
+    """Raised when the keystore is corrupt, tampered with, or cannot be decrypted."""
+
+
+def _check(body: bytes) -> bytes:
+    return hashlib.sha256(body).digest()[:CHECK_LEN]
+
+
+class Keystore:
+    """Append-only, integrity-checked, optionally encrypted name -> bytes store."""
+
+    def __init__(self, path: str, passphrase: Optional[str] = None):
+        self.path = path
+        self._passphrase = passphrase
+        self._aead: Optional[AESGCM] = None
+        # scrypt is deliberately slow: derive once per header salt, not per reload
+        self._derived: Optional[Tuple[bytes, AESGCM]] = None
+        self._entries: Dict[str, bytes] = {}
+        self._dead_records = 0
+        # End of the last complete record seen in file `_inode`
+        self._inode: Optional[int] = None
+        self._valid_end = HEADER.size
+        self._lock = threading.Lock()
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create()
+        self.reload()
+
+    # File handling
+
+    @contextmanager
+    def _flock(self, f, exclusive: bool):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _header(self) -> bytes:
+        flags = FLAG_ENCRYPTED if self._passphrase else 0
+        return HEADER.pack(MAGIC, VERSION, flags, 0, os.urandom(16))
+
+    def _create(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            # O_EXCL: if another worker created it first, just use theirs
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._header())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _init_cipher(self, flags: int, salt: bytes):
+        if flags & FLAG_ENCRYPTED:
+            if not self._passphrase:
+                raise KeystoreError("Keystore is encrypted; a passphrase is required")
+            if self._derived is None or self._derived[0] != salt:
+                key = hashlib.scrypt(self._passphrase.encode(), salt=salt, n=2 ** 14, r=8, p=1, dklen=32)
+                self._derived = (salt, AESGCM(key))
+            self._aead = self._derived[1]
+        else:
+            if self._passphrase:
+                raise KeystoreError("Keystore is not encrypted but a passphrase was given")
+            self._aead = None
+
+    def reload(self):
+        """(Re)read every record from disk through mmap."""
+        with open(self.path, "rb") as f, self._flock(f, exclusive=False):
+            entries, dead, valid_end = self._read(f)
+            inode = os.fstat(f.fileno()).st_ino
+
+        with self._lock:
+            self._entries = entries
+            self._dead_records = dead
+            self._inode, self._valid_end = inode, valid_end
+
+    def _read(self, f) -> Tuple[Dict[str, bytes], int, int]:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise KeystoreError("Keystore header is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return self._parse(mm)
+
+    def _parse(self, view: mmap.mmap) -> Tuple[Dict[str, bytes], int, int]:
+        """(live entries, dead record count, end of the last complete record)"""
+        magic, version, flags, _, salt = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise KeystoreError("Not a GuardBox keystore")
+        if version != VERSION:
+            raise KeystoreError(f"Unsupported keystore version {version}")
+        self._init_cipher(flags, bytes(salt))
+
+        entries: Dict[str, bytes] = {}
+        records = 0
+        offset = HEADER.size
+        end = len(view)
+        while offset < end:
+            if end - offset < RECORD_PREFIX.size:
+                break  # torn append
+            length, kind, name_len = RECORD_PREFIX.unpack_from(view, offset)
+            record_end = offset + 4 + length
+            if record_end > end:
+                break  # torn append
+            if length < 3 + name_len + CHECK_LEN:
+                raise KeystoreError(f"Malformed record at offset {offset}")
+
+            # Slicing the mmap copies only this record out of the page cache
+            body = view[offset + 4:record_end - CHECK_LEN]
+            if _check(body) != view[record_end - CHECK_LEN:record_end]:
+                raise KeystoreError(f"Integrity check failed for record at offset {offset}")
+
+            name = body[3:3 + name_len].decode("utf-8")
+            if kind == KIND_TOMBSTONE:
+                entries.pop(name, None)
+            else:
+                entries[name] = self._open(name, body[3 + name_len:])
+            records += 1
+            offset = record_end
+
+        return entries, records - len(entries), offset
+
+    @staticmethod
+    def _complete_end(f, start: int, size: int) -> int:
+        """End of the last complete record at or after `start`, following lengths only."""
+        offset = start
+        while size - offset >= RECORD_PREFIX.size:
+            (length,) = struct.unpack("<I", os.pread(f.fileno(), 4, offset))
+            if offset + 4 + length > size:
+                break
+            offset += 4 + length
+        return offset
+
+    # Encryption
+
+    def _seal(self, name: str, value: bytes) -> bytes:
+        if self._aead is None:
+            return value
+        nonce = os.urandom(NONCE_LEN)
+        return nonce + self._aead.encrypt(nonce, value, name.encode("utf-8"))
+
+    def _open(self, name: str, stored: bytes) -> bytes:
+        if self._aead is None:
+            return stored
+        try:
+            return self._aead.decrypt(stored[:NONCE_LEN], stored[NONCE_LEN:], name.encode("utf-8"))
+        except Exception as e:
+            raise KeystoreError(f"Could not decrypt record '{name}' (wrong passphrase?)") from e
+
+    # Records
+
+    def _encode(self, name: str, value: Optional[bytes]) -> bytes:
+        name_bytes = name.encode("utf-8")
+        kind = KIND_TOMBSTONE if value is None else KIND_VALUE
+        stored = b"" if value is None else self._seal(name, value)
+        body = struct.pack("<BH", kind, len(name_bytes)) + name_bytes + stored
+        return struct.pack("<I", len(body) + CHECK_LEN) + body + _check(body)
+
+    def _append(self, records: Iterable[Tuple[str, Optional[bytes]]]):
+        payload = b"".join(self._encode(name, value) for name, value in records)
+        while True:
+            with open(self.path, "a+b") as f, self._flock(f, exclusive=True):
+                # Another process may have compacted (replaced) the file meanwhile
+                inode, size = os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_size
+                if inode != os.stat(self.path).st_ino:
+                    continue
+                # Cut off a record torn by a crash, or the payload would be
+                # read as its missing tail
+                start = self._valid_end if inode == self._inode and self._valid_end <= size else HEADER.size
+                end = self._complete_end(f, start, size)
+                if end < size:
+                    os.ftruncate(f.fileno(), end)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                self._inode, self._valid_end = inode, end + len(payload)
+                return
+
+    def get(self, name: str, default: Optional[bytes] = None) -> Optional[bytes]:
+        return self._entries.get(name, default)
+
+    def items(self, prefix: str = ""):
+        return [(k, v) for k, v in list(self._entries.items()) if k.startswith(prefix)]
+
+    def put(self, name: str, value: bytes):
+        self.put_many({name: value})
+
+    def put_many(self, values: Dict[str, bytes]):
+        """Persist several records with a single write and fsync."""
+        with self._lock:
+            self._append(values.items())
+            for name in values:
+                if name in self._entries:
+                    self._dead_records += 1
+            self._entries.update(values)
+
+    def delete(self, name: str):
+        with self._lock:
+            if name not in self._entries:
+                return
+            self._append([(name, None)])
+            del self._entries[name]
+            self._dead_records += 2
+
+    @property
+    def dead_records(self) -> int:
+        return self._dead_records
+
+    def compact(self):
+        """Rewrite the file with only live records (atomic replace)."""
+        with self._lock:
+            while True:
+                with open(self.path, "rb") as current, self._flock(current, exclusive=True):
+                    # Another process may have compacted (replaced) the file meanwhile
+                    if os.fstat(current.fileno()).st_ino != os.stat(self.path).st_ino:
+                        continue
+                    # Re-read under the lock: other processes may have appended
+                    # since our last reload
+                    entries, _, _ = self._read(current)
+                    # Keep the existing header (and salt) so the derived key stays valid
+                    header = current.read(HEADER.size)
+                    payload = b"".join(self._encode(name, value) for name, value in entries.items())
+                    tmp_path = f"{self.path}.tmp"
+                    # Private keys: never readable by others, not even briefly;
+                    # then keep whatever mode the keystore already had
+                    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    os.fchmod(fd, os.fstat(current.fileno()).st_mode & 0o777)
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(header)
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                    self._entries = entries
+                    self._dead_records = 0
+                    self._inode, self._valid_end = os.stat(self.path).st_ino, HEADER.size + len(payload)
+                    return
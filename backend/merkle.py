@@ -0,0 +1,143 @@
+"""
+Incremental Merkle trees over mailboxes.
+
+Each mailbox keeps a binary hash tree with one leaf per email. Appending an
+email or changing one (e.g. a flag) only rehashes the path from that leaf to
+the root, O(log n). One signed root then vouches for the whole mailbox: a
+client checks a page of emails with a single signature check and log2(n)
+sibling hashes per email.
+
+Hashing (domain separated so a leaf can never pass for an inner node):
+
+    leaf  = sha256(0x00 || leaf data)
+    inner = sha256(0x01 || left || right)
+
+A node without a right sibling is promoted to the next level unchanged.
+"""
+
+import hashlib
+import threading
+from typing import Callable, Dict, Hashable, List, Optional
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def _inner_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+class MerkleTree:
+    """Append/update-in-place Merkle tree; every level is kept as a list of hashes."""
+
+    def __init__(self):
+        self._levels: List[List[bytes]] = [[]]
+
+    def __len__(self):
+        return len(self._levels[0])
+
+    def _rehash_path(self, index: int):
+        level = 0
+        while len(self._levels[level]) > 1:
+            nodes = self._levels[level]
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            parents = self._levels[level + 1]
+            parent = index // 2
+            left = nodes[2 * parent]
+            value = _inner_hash(left, nodes[2 * parent + 1]) if 2 * parent + 1 < len(nodes) else left
+            if parent == len(parents):
+                parents.append(value)
+            else:
+                parents[parent] = value
+            index = parent
+            level += 1
+
+    def append(self, leaf: bytes) -> int:
+        index = len(self._levels[0])
+        self._levels[0].append(leaf)
+        self._rehash_path(index)
+        return index
+
+    def update(self, index: int, leaf: bytes):
+        self._levels[0][index] = leaf
+        self._rehash_path(index)
+
+    def root(self) -> str:
+        # Levels only grow, so the first single-node level is the top
+        for nodes in self._levels:
+            if len(nodes) == 1:
+                return nodes[0].hex()
+        return EMPTY_ROOT
+
+    def leaf(self, index: int) -> bytes:
+        return self._levels[0][index]
+
+    def proof(self, index: int) -> List[dict]:
+        """Sibling hashes from the leaf up; side says where the sibling sits."""
+        path = []
+        for nodes in self._levels:
+            if len(nodes) == 1:
+                break
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                path.append({"hash": nodes[sibling].hex(), "side": "left" if sibling < index else "right"})
+            index //= 2
+        return path
+
+
+def verify_proof(leaf: bytes, proof: List[dict], root: str) -> bool:
+    """Recompute the root from a leaf hash and its proof."""
+    node = leaf
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = _inner_hash(sibling, node) if step["side"] == "left" else _inner_hash(node, sibling)
+    return node.hex() == root
+
+
+class MailboxTrees:
+    """One Merkle tree per mailbox, leaves addressed by item id (e.g. email id)."""
+
+    def __init__(self, leaf_data: Callable[[dict], bytes]):
+        self._leaf_data = leaf_data
+        self._trees: Dict[str, MerkleTree] = {}
+        self._indexes: Dict[str, Dict[Hashable, int]] = {}
+        self._ids: Dict[str, List[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, mailbox: str, item_id: Hashable, item: dict):
+        leaf = leaf_hash(self._leaf_data(item))
+        with self._lock:
+            tree = self._trees.setdefault(mailbox, MerkleTree())
+            indexes = self._indexes.setdefault(mailbox, {})
+            if item_id in indexes:
+                tree.update(indexes[item_id], leaf)
+            else:
+                indexes[item_id] = tree.append(leaf)
+                self._ids.setdefault(mailbox, []).append(item_id)
+
+    def update(self, mailbox: str, item_id: Hashable, item: dict):
+        """Rehash one item's leaf after it changed; ignored if not in the mailbox."""
+        leaf = leaf_hash(self._leaf_data(item))
+        with self._lock:
+            index = self._indexes.get(mailbox, {}).get(item_id)
+            if index is not None:
+                self._trees[mailbox].update(index, leaf)
+
+    def snapshot(self, mailbox: str, offset: int = 0, limit: Optional[int] = None) -> dict:
+        """Root, size and inclusion proofs for leaves [offset, offset + limit), taken atomically."""
+        with self._lock:
+            tree = self._trees.get(mailbox) or MerkleTree()
+            ids = self._ids.get(mailbox, [])
+            end = len(ids) if limit is None else offset + limit
+            return {
+                "root": tree.root(),
+                "size": len(tree),
+                "proofs": [
+                    {"id": ids[index], "index": index, "leaf": tree.leaf(index).hex(), "proof": tree.proof(index)}
+                    for index in range(offset, min(end, len(ids)))
+                ]
+            }
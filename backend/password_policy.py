@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Password hashing policy for GuardBox.
+
+The bcrypt cost factor is calibrated against a target login latency on the
+current hardware instead of relying on the library default. Hashes created
+with a lower cost than the current policy are upgraded transparently the next
+time the user logs in successfully.
+
+Run this file directly to print hash/verify latency for each cost level:
+
+    python3 password_policy.py [target_ms]
+"""
+
+import sys
+import time
+from typing import Optional, Tuple
+
+import bcrypt
+
+# Target time for a single bcrypt verify during login (milliseconds)
+TARGET_LOGIN_MS = 250
+
+# Never go below OWASP's recommended minimum, never above what bcrypt allows
+# in a reasonable login path
+MIN_COST = 10
+MAX_COST = 16
+
+
+def hash_cost(password_hash: bytes) -> int:
+    """Return the cost factor encoded in a bcrypt hash ($2b$<cost>$...)."""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    try:
+        return int(password_hash.split(b'$')[2])
+    except (IndexError, ValueError) as e:
+        raise ValueError("Not a bcrypt hash") from e
+
+
+def _time_hash(cost: int, rounds: int = 1) -> float:
+    """Average seconds for one bcrypt hash at the given cost."""
+    salt = bcrypt.gensalt(rounds=cost)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        bcrypt.hashpw(b"calibration-password", salt)
+    return (time.perf_counter() - start) / rounds
+
+
+def calibrate_cost(target_ms: float = TARGET_LOGIN_MS,
+                   min_cost: int = MIN_COST,
+                   max_cost: int = MAX_COST) -> int:
+    """
+    Pick the highest cost whose hash time stays within target_ms.
+    Only the cheapest cost is measured; each extra round doubles the work,
+    so the rest of the curve is extrapolated from that single sample.
+    """
+    base = _time_hash(min_cost, rounds=2) * 1000
+    cost = min_cost
+    while cost < max_cost and base * 2 ** (cost + 1 - min_cost) <= target_ms:
+        cost += 1
+    return cost
+
+
+class PasswordPolicy:
+    """bcrypt hashing with a calibrated cost and rehash-on-login support."""
+
+    def __init__(self, cost: Optional[int] = None,
+                 target_ms: float = TARGET_LOGIN_MS,
+                 min_cost: int = MIN_COST,
+                 max_cost: int = MAX_COST):
+        self.target_ms = target_ms
+        self.min_cost = min_cost
+        self.max_cost = max_cost
+        self._cost = cost
+
+    @property
+    def cost(self) -> int:
+        # Calibrate lazily so importing the module stays cheap
+        if self._cost is None:
+            self._cost = calibrate_cost(self.target_ms, self.min_cost, self.max_cost)
+        return self._cost
+
+    def hash(self, password: str) -> bytes:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.cost))
+
+    def verify(self, password: str, password_hash: bytes) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash)
+
+    def needs_rehash(self, password_hash: bytes) -> bool:
+        # Only upgrade: a noisy calibration must not weaken stored hashes
+        return hash_cost(password_hash) < self.cost
+
+    def verify_and_upgrade(self, password: str,
+                           password_hash: bytes) -> Tuple[bool, Optional[bytes]]:
+        """
+        Verify a password and return (is_valid, new_hash).
+        new_hash is only set when the password is valid and the stored hash
+        uses an outdated cost; the caller should persist it.
+        """
+        if not self.verify(password, password_hash):
+            return False, None
+        if self.needs_rehash(password_hash):
+            return True, self.hash(password)
+        return True, None
+
+
+def benchmark(min_cost: int = MIN_COST, max_cost: int = MAX_COST, rounds: int = 3):
+    """Measure hash and verify latency (ms) for every cost level."""
+    results = []
+    password = b"benchmark-password"
+    for cost in range(min_cost, max_cost + 1):
+        salt = bcrypt.gensalt(rounds=cost)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            hashed = bcrypt.hashpw(password, salt)
+        hash_ms = (time.perf_counter() - start) / rounds * 1000
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            bcrypt.checkpw(password, hashed)
+        verify_ms = (time.perf_counter() - start) / rounds * 1000
+
+        results.append({
+            "cost": cost,
+            "hash_ms": hash_ms,
+            "verify_ms": verify_ms,
+            "logins_per_sec_per_core": 1000 / verify_ms
+        })
+    return results
+
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else TARGET_LOGIN_MS
+
+    print("🔐 bcrypt cost benchmark")
+    print("=" * 56)
+    print(f"{'cost':>4}  {'hash (ms)':>10}  {'verify (ms)':>12}  {'logins/s/core':>14}")
+    for row in benchmark():
+        marker = "  <= target" if row["verify_ms"] <= target_ms else ""
+        print(f"{row['cost']:>4}  {row['hash_ms']:>10.1f}  {row['verify_ms']:>12.1f}  "
+              f"{row['logins_per_sec_per_core']:>14.1f}{marker}")
+        # Anything far past the target only makes the benchmark slow
+        if row["verify_ms"] > target_ms * 4:
+            break
+
+    print("=" * 56)
+    print(f"✅ Calibrated cost for {target_ms:.0f} ms target: {calibrate_cost(target_ms)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Multi-worker GuardBox: N pre-forked worker processes sharing one port and
+one consistent state.
+
+Each worker builds its own app with create_app(), and all of them share:
+
+- users and mail in SQLite storage (storage = "sqlite", one file),
+- server Kyber and signature keys in the keystore. The master creates them
+  before forking. Worker 0 alone rotates Kyber keys, and the others reload
+  the keystore every shared_sync_seconds,
+- the JWT secret from config (GUARDBOX_JWT_SECRET), so a token issued by one
+  worker is accepted by all of them,
+- sessions, registered key fingerprints and rate-limit buckets, kept as
+  expiring records in the same SQLite file, so a session or fingerprint from
+  one worker works on every other and limits hold for the whole port,
+- new-mail events: each worker polls the store for mail sent through any
+  worker and pushes it to its own /events streams.
+
+Only caches of shared data stay per worker (user secret keys, signature
+checks, mailbox trees replayed from the store).
+
+The master binds the socket, forks the workers, restarts any that die and
+forwards SIGTERM/SIGINT. Workers serve with the asyncio server from asgi.py.
+
+    GUARDBOX_JWT_SECRET=... python prefork.py --workers 4 --port 5000
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import traceback
+from functools import partial
+
+import kem
+from app_factory import load_signature_keys
+from asgi import BACKLOG, create_asgi_app, raise_open_file_limit, serve_forever
+from config import DEFAULT_CONFIG, load_config
+from key_manager import KeyManager
+from keystore import Keystore
+from storage import create_storage
+
+SHARED_SYNC_SECONDS = 5
+
+
+def check_shared_config(config: dict):
+    """ValueError unless every worker would see the same users, mail and keys"""
+    if not config["storage"] or config["storage"] == "memory":
+        raise ValueError("Multi-worker mode needs shared storage (storage = 'sqlite')")
+    if not config["keystore_path"]:
+        raise ValueError("Multi-worker mode needs a keystore_path for shared keys")
+
+
+def prepare_shared_state(config: dict):
+    """
+    Create the storage schema and the server keys once, in the master, so
+    workers starting side by side load the same keys instead of racing to
+    generate their own.
+    """
+    create_storage(config)
+    keystore = Keystore(config["keystore_path"], config["keystore_passphrase"])
+    threshold = config["keystore_compact_threshold"]
+    if threshold is not None and keystore.dead_records > threshold:
+        keystore.compact()
+    for mode in config["kyber_modes"]:
+        KeyManager(partial(kem.keygen, mode), config["key_rotation_seconds"] or 24 * 3600,
+                   config["key_grace_seconds"], keystore=keystore, name=f"kem{mode}")
+    load_signature_keys(keystore)
+
+
+def worker_config(config: dict, index: int, workers: int) -> dict:
+    """Config of one worker: only worker 0 rotates keys; nobody compacts under the others"""
+    return {
+        **config,
+        "key_rotation_seconds": config["key_rotation_seconds"] if index == 0 else None,
+        "keystore_compact_threshold": None,
+        "shared_sync_seconds": config["shared_sync_seconds"] or SHARED_SYNC_SECONDS,
+        # Split the cores between the workers' crypto pools
+        "crypto_workers": config["crypto_workers"] or max(1, (os.cpu_count() or 1) // workers),
+    }
+
+
+def run_worker(sock, config: dict):
+    # SIGTERM from the master ends asyncio.run, which closes the app
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    app = create_asgi_app(config)
+    try:
+        asyncio.run(serve_forever(app, sock=sock))
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+def serve(config=None, workers: int = None, host: str = "127.0.0.1", port: int = 5000):
+    """Run the master: fork `workers` processes serving host:port until signalled."""
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Multi-worker mode needs os.fork (POSIX)")
+    config = load_config(config)
+    check_shared_config(config)
+    workers = workers or os.cpu_count() or 1
+    if config["jwt_secret"] == DEFAULT_CONFIG["jwt_secret"]:
+        print("⚠️ Using the default JWT secret; set GUARDBOX_JWT_SECRET in production")
+
+    raise_open_file_limit()
+    prepare_shared_state(config)
+    sock = socket.create_server((host, port), backlog=BACKLOG)
+    sock.setblocking(False)
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, worker_config(config, index, workers))
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"🚀 GuardBox master {os.getpid()} serving http://{host}:{port} with {workers} workers")
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"⚠️ Worker {index} (pid {pid}) exited; restarting")
+            spawn(index)
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve GuardBox with pre-forked workers")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    # Shared storage unless the environment picks another backend
+    overrides = {} if "GUARDBOX_STORAGE" in os.environ else {"storage": "sqlite"}
+    serve(overrides, args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
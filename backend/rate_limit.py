@@ -0,0 +1,195 @@
+"""
+Token-bucket rate limiting for CPU-expensive endpoints.
+
+Each limiter keeps one (tokens, last_refill) pair per active key, so memory
+is O(1) per caller. A bucket that has been idle long enough to refill
+completely is indistinguishable from a new one, so it is evicted instead of
+being kept around forever.
+
+SharedTokenBucketLimiter keeps the buckets in storage shared by several
+workers, so the limits hold for the whole deployment instead of per worker.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import jsonify, request
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled at `rate` tokens/second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate and burst must be positive")
+        self.rate = rate
+        self.burst = burst
+        # Set to False to let everything through (benchmarks, trusted deployments)
+        self.enabled = True
+        self._clock = clock
+        # Time after which an untouched bucket is full again and can be dropped
+        self._idle_ttl = burst / rate
+        # key -> [tokens, last_refill]; ordered by last access for eviction
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens from the bucket for `key`.
+        Returns 0.0 if the request is allowed, otherwise the number of
+        seconds until enough tokens will be available.
+        """
+        if not self.enabled:
+            return 0.0
+        if cost > self.burst:
+            # Can never be satisfied; report the time to a full bucket
+            return self._idle_ttl
+
+        now = self._clock()
+        with self._lock:
+            self._evict_idle(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.burst, now]
+                self._buckets[key] = bucket
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+    def refund(self, key: str, cost: float = 1.0):
+        """Give back tokens taken by an acquire() whose request did not go ahead"""
+        if not self.enabled:
+            return
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def _evict_idle(self, now: float):
+        # Oldest entries sit at the front, so this is amortised O(1)
+        while self._buckets:
+            key, (_, last_refill) = next(iter(self._buckets.items()))
+            if now - last_refill < self._idle_ttl:
+                break
+            del self._buckets[key]
+
+
+class SharedTokenBucketLimiter(TokenBucketLimiter):
+    """
+    Token buckets in shared storage (SQLiteStorage expiring records), each
+    acquire one atomic read-modify-write. Buckets expire once full again.
+    """
+
+    def __init__(self, store, namespace: str, rate: float, burst: float,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(rate, burst, clock)
+        self.namespace = namespace
+        self._store = store
+
+    def __len__(self):
+        return self._store.count_expiring(self.namespace, self._clock())
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        if not self.enabled:
+            return 0.0
+        if cost > self.burst:
+            return self._idle_ttl
+
+        def take(bucket):
+            now = self._clock()
+            tokens = self.burst
+            if bucket is not None:
+                # max(): another process may have stamped a slightly later clock
+                tokens = min(self.burst, bucket["tokens"] + max(0.0, now - bucket["updated"]) * self.rate)
+                now = max(now, bucket["updated"])
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / self.rate
+            return {"tokens": tokens, "updated": now}, now + (self.burst - tokens) / self.rate, retry_after
+
+        return self._store.update_expiring(self.namespace, key, take)
+
+    def refund(self, key: str, cost: float = 1.0):
+        if not self.enabled:
+            return
+
+        def give_back(bucket):
+            if bucket is None:
+                return None, 0.0, None
+            tokens = min(self.burst, bucket["tokens"] + cost)
+            return {**bucket, "tokens": tokens}, bucket["updated"] + (self.burst - tokens) / self.rate, None
+
+        self._store.update_expiring(self.namespace, key, give_back)
+
+
+def _too_many_requests(retry_after: float):
+    response = jsonify({"error": "Rate limit exceeded", "retry_after": math.ceil(retry_after)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _resolve(limiter):
+    # Limiters may be given directly or as a zero-argument callable looked up
+    # per request (e.g. the limiter of the current app instance)
+    if limiter is None or isinstance(limiter, TokenBucketLimiter):
+        return limiter
+    return limiter()
+
+
+def charge(ip_limiter, ip_key: str, cost: float = 1.0, account_limiter=None, account_key: Optional[str] = None) -> float:
+    """
+    Take `cost` from the IP bucket and, with an account key, the account
+    bucket. Returns 0.0 or the seconds to wait. A request the account bucket
+    rejects gets its IP tokens back, so hammering one locked account does not
+    throttle the other logins from that IP.
+    """
+    retry_after = ip_limiter.acquire(ip_key, cost)
+    if retry_after or account_limiter is None or not account_key:
+        return retry_after
+    retry_after = account_limiter.acquire(account_key, cost)
+    if retry_after:
+        ip_limiter.refund(ip_key, cost)
+    return retry_after
+
+
+def rate_limited(ip_limiter,
+                 cost=1.0,
+                 account_limiter=None,
+                 account_key: Optional[Callable[[], Optional[str]]] = None):
+    """
+    Flask route decorator charging `cost` tokens per call against the caller's
+    IP and, when `account_key` returns an account name, against that account.
+    Limiters are TokenBucketLimiter instances or callables returning one.
+    `cost` is a number or a callable computing it from the request (e.g. per
+    item of a batch).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tokens = cost() if callable(cost) else cost
+            limiter = _resolve(account_limiter)
+            account = account_key() if limiter is not None and account_key is not None else None
+            retry_after = charge(_resolve(ip_limiter), f"ip:{request.remote_addr}", tokens,
+                                 limiter, f"account:{account}" if account else None)
+            if retry_after:
+                return _too_many_requests(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,971 @@
+"""
+HTTP routes of the GuardBox server, registered by app_factory.create_app().
+
+Handlers reach the app's components (crypto, storage, auth, caches) through
+services(); nothing here holds module-level state, so several apps with
+different configs can live in one process.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime
+from functools import partial
+
+from flask import Blueprint, current_app, jsonify, request
+
+import kem
+from email_signing import sign_email
+from envelope import EnvelopeError, for_recipient, kem_ciphertext, open_body, seal_envelope, unwrap_data_key
+from rate_limit import rate_limited
+from session import request_json, session_protected
+from storage import email_participants
+from stream_signing import sign_stream, verify_stream
+from user_directory import DEFAULT_LIMIT
+
+bp = Blueprint("guardbox", __name__)
+
+MAX_ENCAPSULATE_BATCH = 256
+MAX_DECAPSULATE_BATCH = 256
+MAX_SIGN_BATCH = 5000
+
+MAILBOX_DIGEST_DEFAULT_LIMIT = 50
+MAILBOX_DIGEST_MAX_LIMIT = 200
+
+# Each rate-limited endpoint charges a cost weight roughly proportional to its CPU time
+LOGIN_COST = 5        # bcrypt verify
+REGISTER_COST = 10    # bcrypt hash + Kyber keygen
+ENCAPSULATE_COST = 1  # Kyber encapsulation
+KEY_EXCHANGE_COST = 1  # Kyber decapsulation
+# Batches pay a base cost plus a share per item (batched ops amortise the
+# dispatch overhead); a full batch still fits in the default IP burst
+ENCAPSULATE_BATCH_BASE_COST = 2
+ENCAPSULATE_BATCH_ITEM_COST = 0.125
+TEST_PQC_COST = 5     # keygen + encapsulate + decapsulate + HMAC
+DECAPSULATE_BATCH_BASE_COST = 2
+DECAPSULATE_BATCH_ITEM_COST = 0.125
+
+
+def services():
+    """The GuardBox components of the app serving this request"""
+    return current_app.extensions["guardbox"]
+
+def ip_limiter():
+    return services().ip_limiter
+
+def account_limiter():
+    return services().account_limiter
+
+def session_cache():
+    return services().session_cache
+
+def batch_cost(base, per_item, limit, *fields):
+    """
+    Rate-limit cost of a batch request: `base` plus `per_item` for each item
+    of the first of `fields` present, in the order the route reads them.
+    """
+    def cost():
+        try:
+            data = request_json()
+        except Exception:
+            data = None
+        data = data if isinstance(data, dict) else {}
+        items = next((data[field] for field in fields if data.get(field) is not None), [])
+        return base + per_item * min(len(items) if isinstance(items, list) else 0, limit)
+    return cost
+
+def request_account():
+    """Account name a login/register request is aimed at"""
+    data = request.get_json(silent=True) or {}
+    account = data.get('email') or data.get('username')
+    return account if isinstance(account, str) else None
+
+@bp.route("/")
+def home():
+    return jsonify({
+        "message": "Post-Quantum Mail Service - Server Running",
+        "features": [
+            "Kyber512/768/1024 KEM for key exchange",
+            "Digital signatures for message integrity",
+            "Secure user authentication",
+            "Encrypted key storage"
+        ],
+        "test_users": ["testuser1", "testuser2"]
+    })
+
+@bp.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness probe: answers as long as the process serves requests"""
+    # pid tells which worker answered when several share the port
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@bp.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness probe: cached result of the background crypto self-test"""
+    self_test = services().self_test
+    if self_test is None:
+        return jsonify({"ready": True, "checks": {}, "self_test": "disabled"})
+    status = self_test.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@bp.route("/get_server_pk", methods=["GET"])
+def get_server_pk():
+    svc = services()
+    mode = request.args.get('mode', svc.default_kyber_mode)
+    if mode not in svc.key_managers:
+        return jsonify({"error": f"Unsupported Kyber mode: {mode}"}), 400
+
+    # Top-level fields describe the requested (default) mode; "keys" lists every mode
+    keys = {}
+    for key_mode, manager in svc.key_managers.items():
+        server_key = manager.current()
+        keys[key_mode] = {
+            "public_key": server_key.public_key.hex(),
+            "key_id": server_key.key_id,
+            "algorithm": f"Kyber{key_mode}"
+        }
+    return jsonify({**keys[mode], "keys": keys})
+
+def decapsulate_client_ciphertext(data):
+    """
+    Decapsulate a client ciphertext made against the server key named by
+    key_id/mode. Returns (server_key, mode, shared_secret, None) or
+    (None, None, None, error response).
+    """
+    svc = services()
+    ciphertext_hex = data.get('ciphertext')
+    if not isinstance(ciphertext_hex, str):
+        return None, None, None, (jsonify({"error": "Ciphertext required"}), 400)
+
+    mode = data.get('mode', svc.default_kyber_mode)
+    manager = svc.key_managers.get(mode)
+    if manager is None:
+        return None, None, None, (jsonify({"error": f"Unsupported Kyber mode: {mode}"}), 400)
+
+    server_key = manager.get(data.get('key_id'))
+    if server_key is None and isinstance(data.get('key_id'), str) and svc.reload_shared_keys():
+        # Possibly rotated by a sibling worker since our last sync
+        server_key = manager.get(data.get('key_id'))
+    if server_key is None:
+        # Unknown or retired key: tell the client which key to use now
+        return None, None, None, (jsonify({
+            "error": "Unknown or retired server key id",
+            "current_key_id": manager.current().key_id
+        }), 409)
+
+    try:
+        ciphertext = bytes.fromhex(ciphertext_hex)
+        shared_secret = svc.crypto.decapsulate(server_key.secret_key, ciphertext, mode)
+    except ValueError:
+        return None, None, None, (jsonify({"error": "Invalid ciphertext"}), 400)
+
+    return server_key, mode, shared_secret, None
+
+@bp.route("/key_exchange", methods=["POST"])
+@rate_limited(ip_limiter, KEY_EXCHANGE_COST)
+def key_exchange():
+    """Decapsulate a client ciphertext made against the server key with the given key id"""
+    try:
+        data = request.get_json(silent=True) or {}
+        server_key, mode, shared_secret, error = decapsulate_client_ciphertext(data)
+        if error:
+            return error
+
+        # Key confirmation: proves the server derived the same secret without revealing it
+        confirmation = hmac.new(shared_secret, b"guardbox-key-confirmation", hashlib.sha256).hexdigest()
+
+        return jsonify({
+            "key_id": server_key.key_id,
+            "confirmation": confirmation,
+            "algorithm": f"Kyber{mode}"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/session", methods=["POST"])
+@rate_limited(ip_limiter, KEY_EXCHANGE_COST)
+def create_session():
+    """
+    Establish a session from one KEM handshake. Both sides derive per-direction
+    AES-GCM keys with HKDF(shared_secret, salt=session_id); later requests send
+    the session id in X-Session-Id and sealed JSON bodies.
+    """
+    try:
+        svc = services()
+        if svc.session_cache is None:
+            return jsonify({"error": "Sessions are disabled"}), 404
+
+        data = request.get_json(silent=True) or {}
+        server_key, mode, shared_secret, error = decapsulate_client_ciphertext(data)
+        if error:
+            return error
+
+        session = svc.session_cache.create(shared_secret)
+        confirmation = hmac.new(shared_secret, session.session_id.encode(), hashlib.sha256).hexdigest()
+
+        return jsonify({
+            "session_id": session.session_id,
+            "key_id": server_key.key_id,
+            "confirmation": confirmation,
+            "expires_in": svc.config["session_idle_timeout"],
+            "algorithm": f"Kyber{mode}+HKDF-SHA256+AES-256-GCM"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/get_server_signature_pk", methods=["GET"])
+def get_server_signature_pk():
+    return jsonify({
+        "public_key": services().signature_pk,
+        "algorithm": "HMAC-SHA256"
+    })
+
+@bp.route("/register", methods=["POST"])
+@rate_limited(ip_limiter, REGISTER_COST, account_limiter, request_account)
+def register():
+    try:
+        svc = services()
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+
+        if not username or not password:
+            return jsonify({"error": "Username and password required"}), 400
+
+        if svc.storage.get_user(username):
+            return jsonify({"error": "User already exists"}), 400
+
+        # Hash password and store the user with fresh PQC keypairs
+        password_hash = svc.password_policy.hash(password)
+        user = svc.create_user(username, password_hash, svc.take_keypair())
+        if user is None:
+            return jsonify({"error": "User already exists"}), 400
+
+        return jsonify({
+            "message": "User registered successfully",
+            "user_kyber_pk": user['kyber_keys']['public'],
+            "user_signature_pk": user['signature_keys']['public']
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/login", methods=["POST"])
+@rate_limited(ip_limiter, LOGIN_COST, account_limiter, request_account)
+def login():
+    try:
+        svc = services()
+        data = request.get_json()
+        email = data.get('email') or data.get('username')
+        password = data.get('password')
+
+        if not email or not password:
+            return jsonify({"error": "Email and password required"}), 400
+
+        user = svc.storage.get_user(email)
+        if user is None:
+            return jsonify({"error": "User not found"}), 404
+
+        # Verify password, upgrading hashes created with an outdated cost
+        is_valid, upgraded_hash = svc.password_policy.verify_and_upgrade(password, user['password_hash'])
+        if not is_valid:
+            return jsonify({"error": "Invalid password"}), 401
+        if upgraded_hash:
+            svc.storage.update_user(email, password_hash=upgraded_hash)
+
+        return jsonify({
+            "message": "Login successful",
+            "token": svc.auth.issue(email),
+            "user_kyber_pk": user['kyber_keys']['public'],
+            "user_signature_pk": user['signature_keys']['public']
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def parse_public_key(client_pk_hex, mode=None):
+    """Return (public_key_bytes, None) or (None, error message)"""
+    if not isinstance(client_pk_hex, str):
+        return None, "Public key must be a hex string"
+    try:
+        client_pk = bytes.fromhex(client_pk_hex)
+    except ValueError:
+        return None, "Public key is not valid hex"
+    try:
+        services().crypto.check_public_key(client_pk, mode)
+    except ValueError as e:
+        return None, str(e)
+    return client_pk, None
+
+@bp.route("/register_public_key", methods=["POST"])
+@rate_limited(ip_limiter, ENCAPSULATE_COST)
+def register_public_key():
+    """Register a client public key once and get a fingerprint to use in later KEM calls"""
+    try:
+        data = request.get_json(silent=True) or {}
+        client_pk, error = parse_public_key(data.get('client_public_key'))
+        if error:
+            return jsonify({"error": error}), 400
+
+        return jsonify({
+            "fingerprint": services().key_registry.register(client_pk),
+            "algorithm": f"Kyber{kem.mode_for_public_key(client_pk)}"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/encapsulate", methods=["POST"])
+@rate_limited(ip_limiter, ENCAPSULATE_COST)
+def encapsulate_key():
+    try:
+        svc = services()
+        data = request.get_json()
+        client_pk_hex = data.get('client_public_key')
+        fingerprint = data.get('key_fingerprint')
+        mode = data.get('mode')
+
+        if fingerprint:
+            # Registered key: already validated and parsed
+            client_pk = svc.key_registry.get(fingerprint)
+            if client_pk is None:
+                return jsonify({"error": "Unknown key fingerprint, register the key again"}), 404
+        elif client_pk_hex:
+            # Convert hex to bytes
+            client_pk = bytes.fromhex(client_pk_hex)
+        else:
+            return jsonify({"error": "Client public key or key fingerprint required"}), 400
+
+        # Perform Kyber encapsulation (mode inferred from the key unless given)
+        mode = svc.crypto.check_public_key(client_pk, mode)
+        ciphertext, shared_secret = svc.crypto.encapsulate(client_pk, mode)
+
+        return jsonify({
+            "ciphertext": ciphertext.hex(),
+            "shared_secret": shared_secret.hex(),
+            "algorithm": f"Kyber{mode}"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/encapsulate_batch", methods=["POST"])
+@rate_limited(ip_limiter, batch_cost(ENCAPSULATE_BATCH_BASE_COST, ENCAPSULATE_BATCH_ITEM_COST,
+                                     MAX_ENCAPSULATE_BATCH, 'fingerprints', 'usernames', 'public_keys'))
+def encapsulate_batch():
+    """Encapsulate against many public keys (or registered users) in one call"""
+    try:
+        svc = services()
+        data = request.get_json(silent=True) or {}
+        public_keys = data.get('public_keys')
+        usernames = data.get('usernames')
+        fingerprints = data.get('fingerprints')
+        mode = data.get('mode')
+        if mode is not None and mode not in svc.kyber_modes:
+            return jsonify({"error": f"Unsupported Kyber mode: {mode}"}), 400
+
+        # Each item resolves to (public key bytes, None) or (None, error)
+        if fingerprints is not None:
+            if not isinstance(fingerprints, list):
+                return jsonify({"error": "fingerprints must be a list"}), 400
+            items = fingerprints
+            def resolve(fp):
+                client_pk = svc.key_registry.get(fp) if isinstance(fp, str) else None
+                if client_pk is None:
+                    return None, "Unknown key fingerprint"
+                if mode and kem.mode_for_public_key(client_pk) != mode:
+                    return None, f"Public key has the wrong length for Kyber{mode}"
+                return client_pk, None
+        elif usernames is not None:
+            if not isinstance(usernames, list):
+                return jsonify({"error": "usernames must be a list"}), 400
+            items = usernames
+            def resolve(username):
+                # Resolve key ids to the users' stored Kyber public keys
+                user = svc.storage.get_user(username) if isinstance(username, str) else None
+                if not user or not user['kyber_keys']:
+                    return None, "Unknown user"
+                return parse_public_key(user['kyber_keys']['public'], mode)
+        else:
+            items = public_keys
+            resolve = partial(parse_public_key, mode=mode)
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "public_keys, usernames or fingerprints list required"}), 400
+        if len(items) > MAX_ENCAPSULATE_BATCH:
+            return jsonify({"error": f"At most {MAX_ENCAPSULATE_BATCH} keys per batch"}), 400
+
+        # Validate up front so only well-formed keys are shipped to the workers
+        results = []
+        valid_keys = []
+        for item in items:
+            client_pk, error = resolve(item)
+            if error:
+                results.append({"error": error})
+            else:
+                results.append(None)
+                valid_keys.append(client_pk)
+
+        # Encapsulations are spread across the workers, order preserved;
+        # keys of different modes may be mixed in one batch
+        encapsulated = iter(zip(valid_keys, svc.crypto.encapsulate_many(valid_keys, mode)))
+        for i, result in enumerate(results):
+            if result is None:
+                client_pk, (ciphertext, shared_secret) = next(encapsulated)
+                results[i] = {
+                    "ciphertext": ciphertext.hex(),
+                    "shared_secret": shared_secret.hex(),
+                    "algorithm": f"Kyber{kem.mode_for_public_key(client_pk)}"
+                }
+
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "errors": sum(1 for r in results if "error" in r)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/sign", methods=["POST"])
+def sign_message_endpoint():
+    try:
+        data = request.get_json()
+        message = data.get('message')
+
+        if not message:
+            return jsonify({"error": "Message required"}), 400
+
+        # Sign message with server's signature private key
+        signature = services().sign(message)
+
+        return jsonify({
+            "signature": signature,
+            "message": message,
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/verify", methods=["POST"])
+def verify_signature_endpoint():
+    try:
+        data = request.get_json()
+        message = data.get('message')
+        signature = data.get('signature')
+        public_key = data.get('public_key')
+
+        if not all([message, signature, public_key]):
+            return jsonify({"error": "Message, signature, and public key required"}), 400
+
+        # Verify signature
+        is_valid = services().crypto.verify(public_key, message, signature)
+
+        return jsonify({
+            "valid": is_valid,
+            "message": message,
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/sign_stream", methods=["POST"])
+def sign_stream_endpoint():
+    """Sign the raw request body, read in chunks (constant memory for any size)"""
+    try:
+        # The body is the message itself; it is never parsed or buffered whole
+        signature, size = sign_stream(services().signature_sk.encode(), request.stream)
+
+        return jsonify({
+            "signature": signature,
+            "bytes": size,
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/verify_stream", methods=["POST"])
+def verify_stream_endpoint():
+    """Verify a signature over the raw request body; key and signature come in headers"""
+    try:
+        signature = request.headers.get('X-Signature')
+        public_key = request.headers.get('X-Public-Key')
+
+        if not signature or not public_key:
+            return jsonify({"error": "X-Signature and X-Public-Key headers required"}), 400
+
+        is_valid, size = verify_stream(public_key.encode(), request.stream, signature)
+
+        return jsonify({
+            "valid": is_valid,
+            "bytes": size,
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def pack_bitmap(flags):
+    """Validity flags as base64 bytes, bit i set (LSB first) when item i is valid"""
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bitmap[i // 8] |= 1 << (i % 8)
+    return base64.b64encode(bytes(bitmap)).decode()
+
+@bp.route("/sign_batch", methods=["POST"])
+def sign_batch_endpoint():
+    """Sign many messages with the server key in one call"""
+    try:
+        svc = services()
+        data = request.get_json(silent=True) or {}
+        messages = data.get('messages')
+
+        if not string_list(messages) or not messages:
+            return jsonify({"error": "messages list of strings required"}), 400
+        if len(messages) > MAX_SIGN_BATCH:
+            return jsonify({"error": f"At most {MAX_SIGN_BATCH} messages per batch"}), 400
+
+        # One pre-keyed HMAC state, copied per message
+        signatures = svc.crypto.sign_many(svc.signature_sk, messages)
+
+        return jsonify({
+            "signatures": signatures,
+            "count": len(signatures),
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/verify_batch", methods=["POST"])
+def verify_batch_endpoint():
+    """Verify many signatures in one call; returns a validity bitmap"""
+    try:
+        data = request.get_json(silent=True) or {}
+        messages = data.get('messages')
+        signatures = data.get('signatures')
+        public_key = data.get('public_key')
+
+        if not public_key or not string_list(messages) or not string_list(signatures) or not messages:
+            return jsonify({"error": "Messages, signatures, and public key required"}), 400
+        if len(messages) != len(signatures):
+            return jsonify({"error": "messages and signatures must have the same length"}), 400
+        if len(messages) > MAX_SIGN_BATCH:
+            return jsonify({"error": f"At most {MAX_SIGN_BATCH} messages per batch"}), 400
+
+        valid = services().crypto.verify_many(public_key, messages, signatures)
+
+        return jsonify({
+            "bitmap": pack_bitmap(valid),
+            "count": len(valid),
+            "valid_count": sum(valid),
+            "algorithm": "HMAC-SHA256"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/test_pqc", methods=["GET"])
+@rate_limited(ip_limiter, TEST_PQC_COST)
+def test_pqc():
+    try:
+        svc = services()
+        # Test Kyber KEM on a fresh keypair: the pool is kept for registrations
+        test_pk, test_sk = svc.crypto.keygen()
+        ciphertext, shared_secret = svc.crypto.encapsulate(test_pk)
+        decrypted_secret = svc.crypto.decapsulate(test_sk, ciphertext)
+
+        # Test digital signatures
+        test_signature_pk, test_signature_sk = secrets.token_hex(32), secrets.token_hex(32)
+        test_message = "Post-Quantum Cryptography Test"
+        test_signature = svc.crypto.sign(test_signature_sk, test_message)
+        signature_valid = svc.crypto.verify(test_signature_pk, test_message, test_signature)
+
+        return jsonify({
+            "kyber_test": {
+                "success": shared_secret == decrypted_secret,
+                "shared_secret_length": len(shared_secret)
+            },
+            "signature_test": {
+                "success": signature_valid,
+                "signature_length": len(test_signature)
+            },
+            "server_info": {
+                "kyber_public_key": svc.key_manager.current().public_key.hex()[:50] + "...",
+                "kyber_key_id": svc.key_manager.current().key_id,
+                "signature_public_key": svc.signature_pk[:50] + "..."
+            }
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Runtime metrics for the crypto fast paths (null for disabled components)"""
+    svc = services()
+    return jsonify({
+        "keypair_pool": svc.keypair_pool.metrics() if svc.keypair_pool else None,
+        "key_registry": svc.key_registry.metrics(),
+        "sessions": svc.session_cache.metrics() if svc.session_cache else None,
+        "secret_keys": svc.secret_key_cache.metrics(),
+        "email_verification": svc.email_verification.metrics()
+    })
+
+@bp.route("/users", methods=["GET"])
+def get_users():
+    """Get list of available test users"""
+    return jsonify({
+        "users": services().storage.usernames(),
+        "test_users": ["testuser1@guardbox.com", "testuser2@guardbox.com"]
+    })
+
+@bp.route("/users/search", methods=["GET"])
+def search_users():
+    """Paginated prefix search over usernames for recipient autocomplete"""
+    prefix = request.args.get('prefix', '')
+    after = request.args.get('after')
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    users, next_cursor = services().user_directory.search(prefix, limit, after)
+
+    return jsonify({
+        "users": users,
+        "prefix": prefix,
+        "next": next_cursor
+    })
+
+def visible_email(email, user_email):
+    """Email as shown to one user: an envelope only carries that user's wrapped key"""
+    if not email.get('envelope'):
+        return email
+    return {**email, "envelope": for_recipient(email['envelope'], user_email)}
+
+def folder_listing(svc, emails, user_email, folder):
+    """A user's emails in one folder, newest first, as shown to that user"""
+    # Filter emails based on folder and user
+    user_emails = []
+    for email in emails:
+        if folder == 'inbox' and email['to'] == user_email and not email['is_deleted']:
+            user_emails.append(email)
+        elif folder == 'sent' and email['from'] == user_email and not email['is_deleted']:
+            user_emails.append(email)
+        elif folder == 'starred' and (email['to'] == user_email or email['from'] == user_email) and email['is_starred'] and not email['is_deleted']:
+            user_emails.append(email)
+        elif folder == 'important' and (email['to'] == user_email or email['from'] == user_email) and email['is_important'] and not email['is_deleted']:
+            user_emails.append(email)
+        elif folder == 'trash' and (email['to'] == user_email or email['from'] == user_email) and email['is_deleted']:
+            user_emails.append(email)
+
+    # Sort by timestamp (newest first)
+    user_emails.sort(key=lambda x: x['timestamp'], reverse=True)
+    return [
+        {**visible_email(email, user_email), "signature_status": svc.signature_status(email)}
+        for email in user_emails
+    ]
+
+def own_email(email_id, user_email):
+    """Stored email if user_email sent it or is its To address, else None"""
+    email = services().storage.get_email(email_id) if isinstance(email_id, int) else None
+    if email and (email['to'] == user_email or email['from'] == user_email):
+        return email
+    return None
+
+@bp.route("/send_email", methods=["POST"])
+@session_protected(session_cache)
+def send_email():
+    """Send an email between users"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        data = request_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Validate required fields
+        required_fields = ['to', 'subject', 'body']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({"error": f"Missing required field: {field}"}), 400
+
+        # Envelope encryption: encrypt the body once, wrap its key per recipient
+        envelope = None
+        if data.get('envelope'):
+            recipients = email_participants({**data, "from": user_email})
+            public_keys = {}
+            for address in recipients:
+                keys = svc.user_kyber_keys(address)
+                if keys:
+                    public_keys[address] = keys[0]
+                elif address != user_email:
+                    return jsonify({"error": f"Recipient {address} has no Kyber public key"}), 400
+            envelope = seal_envelope(data['body'].encode(), public_keys, svc.crypto.encapsulate_many)
+
+        # Create email object
+        email_id = svc.storage.allocate_email_id()
+        email = {
+            "id": email_id,
+            "from": user_email,
+            "to": data['to'],
+            "cc": data.get('cc', ''),
+            "bcc": data.get('bcc', ''),
+            "subject": data['subject'],
+            "body": "" if envelope else data['body'],
+            "envelope": envelope,
+            "timestamp": datetime.now().isoformat(),
+            "is_read": False,
+            "is_starred": False,
+            "is_important": False,
+            "is_deleted": False,
+            "encryption_info": data.get('encryptionInfo', ''),
+            "is_pqc_encrypted": data.get('isPQCEncrypted', False)
+        }
+
+        # Sign with the sender's signature key; stored with the record
+        email["signature"] = sign_email(email, svc.sender_signature_keys(email), svc.crypto.sign)
+
+        # Store email
+        svc.store_email(email)
+
+        print(f"📧 Email sent from {user_email} to {data['to']}")
+
+        return jsonify({
+            "message": "Email sent successfully",
+            "email_id": email_id
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/get_emails", methods=["GET"])
+@session_protected(session_cache)
+def get_emails():
+    """Get emails for a user"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        folder = request.args.get('folder', 'inbox')
+        user_emails = folder_listing(svc, svc.storage.mailbox(user_email), user_email, folder)
+
+        return jsonify({
+            "emails": user_emails,
+            "folder": folder,
+            "count": len(user_emails)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/open_email", methods=["POST"])
+@session_protected(session_cache)
+def open_email():
+    """Unwrap an envelope-encrypted email with the user's Kyber key and return its body"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        data = request_json() or {}
+        email_id = data.get('email_id')
+        email = svc.storage.get_email(email_id) if isinstance(email_id, int) else None
+        if email is None or not email.get('envelope') or user_email not in email['envelope']['recipients']:
+            return jsonify({"error": "Email not found"}), 404
+
+        secret = svc.secret_key_cache.get(token, user_email)
+        if not secret:
+            return jsonify({"error": "User has no Kyber keys"}), 400
+
+        try:
+            envelope = email['envelope']
+            shared_secret = svc.crypto.decapsulate(secret[0], kem_ciphertext(envelope, user_email), secret[1])
+            body = open_body(envelope, unwrap_data_key(envelope, user_email, shared_secret))
+        except EnvelopeError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({
+            "email_id": email_id,
+            "body": body.decode()
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/decapsulate_batch", methods=["POST"])
+@session_protected(session_cache)
+@rate_limited(ip_limiter, batch_cost(DECAPSULATE_BATCH_BASE_COST, DECAPSULATE_BATCH_ITEM_COST,
+                                     MAX_DECAPSULATE_BATCH, 'email_ids', 'ciphertexts'))
+def decapsulate_batch():
+    """Decapsulate many ciphertexts (or open many envelope emails) with the user's Kyber key"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        data = request_json() or {}
+        email_ids = data.get('email_ids')
+        items = email_ids if email_ids is not None else data.get('ciphertexts')
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "ciphertexts or email_ids list required"}), 400
+        if len(items) > MAX_DECAPSULATE_BATCH:
+            return jsonify({"error": f"At most {MAX_DECAPSULATE_BATCH} items per batch"}), 400
+
+        secret = svc.secret_key_cache.get(token, user_email)
+        if not secret:
+            return jsonify({"error": "User has no Kyber keys"}), 400
+        secret_key, mode = secret
+        ct_len = kem.get_context(mode).ct_len
+
+        # Resolve every item to a ciphertext first (None + error if it can't be)
+        envelopes = {}
+        results = []
+        ciphertexts = []
+        for item in items:
+            try:
+                if email_ids is not None:
+                    email = svc.storage.get_email(item) if isinstance(item, int) else None
+                    if email is None or not email.get('envelope'):
+                        raise EnvelopeError("Email not found")
+                    envelopes[item] = email['envelope']
+                    ciphertext = kem_ciphertext(email['envelope'], user_email)
+                elif isinstance(item, str) and all(c in "0123456789abcdefABCDEF" for c in item):
+                    ciphertext = bytes.fromhex(item)
+                else:
+                    raise ValueError("Invalid ciphertext")
+                if len(ciphertext) != ct_len:
+                    raise ValueError(f"Ciphertext has the wrong length for Kyber{mode}")
+            except (EnvelopeError, TypeError, ValueError) as e:
+                results.append({"error": str(e)})
+                continue
+            results.append(None)
+            ciphertexts.append(ciphertext)
+
+        # All decapsulations for the batch run across the workers at once
+        shared_secrets = iter(svc.crypto.decapsulate_many(secret_key, ciphertexts, mode))
+        for i, item in enumerate(items):
+            if results[i] is not None:
+                continue
+            shared_secret = next(shared_secrets)
+            if email_ids is None:
+                results[i] = {"shared_secret": shared_secret.hex()}
+                continue
+            try:
+                data_key = unwrap_data_key(envelopes[item], user_email, shared_secret)
+                results[i] = {"email_id": item, "data_key": data_key.hex()}
+            except EnvelopeError as e:
+                results[i] = {"email_id": item, "error": str(e)}
+
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "errors": sum(1 for r in results if "error" in r),
+            "algorithm": f"Kyber{mode}"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/mailbox_digest", methods=["GET"])
+@session_protected(session_cache)
+def mailbox_digest():
+    """Signed Merkle root of the user's mailbox plus inclusion proofs for a page of emails"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', MAILBOX_DIGEST_DEFAULT_LIMIT, type=int), 1),
+                    MAILBOX_DIGEST_MAX_LIMIT)
+
+        snapshot = svc.mailbox_snapshot(user_email, offset, limit)
+        # One signature over (mailbox, size, root) vouches for every proof below
+        signed = f"{user_email}|{snapshot['size']}|{snapshot['root']}"
+
+        return jsonify({
+            "mailbox": user_email,
+            "root": snapshot['root'],
+            "size": snapshot['size'],
+            "signed_message": signed,
+            "signature": svc.sign(signed),
+            "algorithm": "HMAC-SHA256",
+            "proofs": [
+                {"email_id": p['id'], "index": p['index'], "leaf": p['leaf'], "proof": p['proof']}
+                for p in snapshot['proofs']
+            ],
+            "offset": offset,
+            "limit": limit
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/mark_read", methods=["POST"])
+def mark_read():
+    """Mark an email as read"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        data = request.get_json()
+        email_id = data.get('email_id')
+
+        if not email_id:
+            return jsonify({"error": "Email ID required"}), 400
+
+        if own_email(email_id, user_email) is None:
+            return jsonify({"error": "Email not found"}), 404
+
+        svc.update_email(email_id, is_read=True)
+        return jsonify({"message": "Email marked as read"})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/delete_email", methods=["POST"])
+def delete_email():
+    """Delete an email (move to trash)"""
+    try:
+        svc = services()
+        user_email, token, error = svc.auth.authenticate()
+        if error:
+            return error
+
+        data = request.get_json()
+        email_id = data.get('email_id')
+
+        if not email_id:
+            return jsonify({"error": "Email ID required"}), 400
+
+        if own_email(email_id, user_email) is None:
+            return jsonify({"error": "Email not found"}), 404
+
+        svc.update_email(email_id, is_deleted=True)
+        return jsonify({"message": "Email moved to trash"})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,80 @@
+"""
+Per-session cache of users' parsed Kyber secret keys.
+
+Opening a folder of envelope-encrypted mail needs the user's secret key for
+every message. Looking it up and parsing the hex once per login session,
+instead of once per message or request, keeps batch decapsulation down to the
+KEM work itself. Entries are keyed by a hash of the session token, expire
+after a TTL and are evicted least-recently-used beyond the capacity.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+SecretKey = Tuple[bytes, str]  # (secret key, Kyber mode)
+
+
+class SecretKeyCache:
+    """Bounded (session, user) -> parsed secret key cache with TTL and LRU eviction."""
+
+    def __init__(self, loader: Callable[[str], Optional[SecretKey]], capacity: int = 1000,
+                 ttl: float = 3600, clock: Callable[[], float] = time.time):
+        if capacity < 1:
+            raise ValueError("Cache capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self._loader = loader
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(session_token: str, username: str):
+        return hashlib.sha256(session_token.encode()).hexdigest(), username
+
+    def get(self, session_token: str, username: str) -> Optional[SecretKey]:
+        """User's (secret key, mode), loaded on the first call of a session; None if they have none."""
+        key = self._key(session_token, username)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        secret = self._loader(username)
+        if secret is None:
+            return None
+        with self._lock:
+            self._entries[key] = (secret, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return secret
+
+    def invalidate(self, username: str):
+        """Drop every cached session entry for a user (e.g. after a key change)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == username]:
+                del self._entries[key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 1.0
+            }
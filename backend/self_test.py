@@ -0,0 +1,87 @@
+"""
+Periodic background crypto self-test for readiness probes.
+
+A background thread runs a set of named checks on a schedule, times them and
+stores the outcome. Readiness probes read that cached result, so a probe does
+no crypto work at all but a broken or stalled crypto backend still shows up:
+as a failed check, or as a result that has gone stale because the last run
+never finished.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class SelfTestMonitor:
+    """Runs `checks` (name -> callable returning truthy on success) every `interval` seconds."""
+
+    def __init__(self, checks: Dict[str, Callable[[], bool]], interval: float = 60,
+                 clock: Callable[[], float] = time.time):
+        self.checks = dict(checks)
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._result: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> dict:
+        """Run every check now and store the result."""
+        results = {}
+        started = self._clock()
+        start = time.perf_counter()
+        for name, check in self.checks.items():
+            check_start = time.perf_counter()
+            try:
+                ok, error = bool(check()), None
+            except Exception as e:
+                ok, error = False, str(e)
+            results[name] = {
+                "ok": ok,
+                "duration_ms": (time.perf_counter() - check_start) * 1000,
+                **({"error": error} if error else {})
+            }
+        result = {
+            "ok": all(r["ok"] for r in results.values()),
+            "checked_at": started,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+            "checks": results
+        }
+        with self._lock:
+            self._result = result
+        return result
+
+    def status(self) -> dict:
+        """
+        Cached result plus readiness. Not ready before the first run, after a
+        failed run, or when the last run is older than three intervals.
+        """
+        with self._lock:
+            result = self._result
+        if result is None:
+            return {"ready": False, "reason": "self-test has not run yet"}
+        age = self._clock() - result["checked_at"]
+        status = {**result, "age_seconds": age, "ready": result["ok"]}
+        if not result["ok"]:
+            status["reason"] = "self-test failed"
+        elif age > 3 * self.interval:
+            status["ready"] = False
+            status["reason"] = "self-test result is stale"
+        return status
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="crypto-self-test", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def _loop(self):
+        self.run_once()
+        while not self._stop.wait(self.interval):
+            self.run_once()
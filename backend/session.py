@@ -0,0 +1,336 @@
+"""
+KEM-established sessions with AEAD-protected requests and responses.
+
+One Kyber handshake (client encapsulates against the server key, server
+decapsulates) yields a shared secret. HKDF turns it into one AES-256-GCM key
+per direction, salted with the session id. Later requests carry the session
+id in the X-Session-Id header and a sealed JSON body; responses come back
+sealed with the other key. The client pays the KEM cost once per session
+instead of once per message.
+
+Envelope: {"counter": n, "ciphertext": base64(AES-GCM(json))}. The 96-bit
+nonce is the big-endian counter, so a key never sees a repeated nonce, and
+the receiver keeps a sliding replay window over counters. The session id and
+request path are bound in as associated data.
+
+SessionCache keeps sessions in process memory; SharedSessionCache keeps them
+in shared storage for multi-worker deployments.
+
+The same helpers (derive_keys, seal, open_envelope) are what a Python client
+uses on its side.
+"""
+
+import base64
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from flask import g, jsonify, make_response, request
+
+SESSION_HEADER = "X-Session-Id"
+HKDF_INFO = b"guardbox-session-v1"
+REPLAY_WINDOW = 64
+
+
+class SessionError(Exception):
+    """Raised for malformed, replayed or forged session envelopes."""
+
+
+def derive_keys(shared_secret: bytes, session_id: str) -> Tuple[bytes, bytes]:
+    """Return (client_to_server_key, server_to_client_key)."""
+    okm = HKDF(
+        algorithm=hashes.SHA256(),
+        length=64,
+        salt=session_id.encode(),
+        info=HKDF_INFO
+    ).derive(shared_secret)
+    return okm[:32], okm[32:]
+
+
+def _nonce(counter: int) -> bytes:
+    return counter.to_bytes(12, "big")
+
+
+def seal(aead: AESGCM, counter: int, payload, aad: bytes) -> dict:
+    plaintext = json.dumps(payload, separators=(",", ":")).encode()
+    return {
+        "counter": counter,
+        "ciphertext": base64.b64encode(aead.encrypt(_nonce(counter), plaintext, aad)).decode()
+    }
+
+
+def open_envelope(aead: AESGCM, envelope, aad: bytes):
+    """Return (counter, payload) from a sealed envelope."""
+    try:
+        counter = int(envelope["counter"])
+        ciphertext = base64.b64decode(envelope["ciphertext"], validate=True)
+    except (KeyError, TypeError, ValueError) as e:
+        raise SessionError("Malformed session envelope") from e
+    if counter < 1 or counter >= 2 ** 96:
+        raise SessionError("Invalid session counter")
+    try:
+        plaintext = aead.decrypt(_nonce(counter), ciphertext, aad)
+    except Exception as e:
+        raise SessionError("Session envelope failed authentication") from e
+    return counter, json.loads(plaintext)
+
+
+def aad_for(session_id: str, path: str) -> bytes:
+    return f"{session_id}|{path}".encode()
+
+
+def slide_window(max_seen: int, window: int, counter: int) -> Tuple[int, int]:
+    """
+    Accept `counter` into a replay window (highest counter seen and a bitmap
+    of the REPLAY_WINDOW below it); returns the new pair or raises SessionError.
+    """
+    if counter > max_seen:
+        shift = counter - max_seen
+        return counter, ((window << shift) | 1) & ((1 << REPLAY_WINDOW) - 1)
+    offset = max_seen - counter
+    if offset >= REPLAY_WINDOW or window & (1 << offset):
+        raise SessionError("Replayed or stale session message")
+    return max_seen, window | 1 << offset
+
+
+class Session:
+    """Keys and counters for one established session (server side)."""
+
+    def __init__(self, session_id: str, shared_secret: bytes, now: float):
+        self.session_id = session_id
+        c2s, s2c = derive_keys(shared_secret, session_id)
+        self._receive = AESGCM(c2s)
+        self._send = AESGCM(s2c)
+        self.created_at = now
+        self.last_used = now
+        self._lock = threading.Lock()
+        self._send_counter = 0
+        self._max_seen = 0
+        self._window = 0
+
+    def open_request(self, envelope, aad: bytes):
+        counter, payload = open_envelope(self._receive, envelope, aad)
+        self._accept(counter)
+        return payload
+
+    def seal_response(self, payload, aad: bytes) -> dict:
+        return seal(self._send, self._next_counter(), payload, aad)
+
+    def _accept(self, counter: int):
+        with self._lock:
+            self._max_seen, self._window = slide_window(self._max_seen, self._window, counter)
+
+    def _next_counter(self) -> int:
+        with self._lock:
+            self._send_counter += 1
+            return self._send_counter
+
+
+class SessionCache:
+    """Bounded session table with idle and absolute expiry."""
+
+    def __init__(self, capacity: int = 10000, idle_timeout: float = 30 * 60,
+                 max_age: float = 12 * 3600, clock: Callable[[], float] = time.time):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, shared_secret: bytes) -> Session:
+        now = self._clock()
+        session = Session(secrets.token_urlsafe(18), shared_secret, now)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._created += 1
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+        return session
+
+    def _is_expired(self, session: Session, now: float) -> bool:
+        return now - session.last_used > self.idle_timeout or now - session.created_at > self.max_age
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = self._clock()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self._is_expired(session, now):
+                del self._sessions[session_id]
+                self._expired += 1
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            # Least recently used sessions sit at the front; drop expired ones
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if not self._is_expired(oldest, now):
+                    break
+                del self._sessions[oldest.session_id]
+                self._expired += 1
+            return session
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "capacity": self.capacity,
+                "created": self._created,
+                "expired": self._expired,
+                "evicted": self._evicted
+            }
+
+
+class SharedSession(Session):
+    """
+    A session whose counters live in shared storage. Every worker derives the
+    same keys, so the send counter and replay window must be one atomic
+    record: per-worker counters would reuse AES-GCM nonces.
+    """
+
+    def __init__(self, cache: "SharedSessionCache", session_id: str, record: dict):
+        super().__init__(session_id, record["secret"], record["created_at"])
+        self.last_used = record["last_used"]
+        self._cache = cache
+
+    def _accept(self, counter: int):
+        def accept(record):
+            record["max_seen"], record["window"] = slide_window(record["max_seen"], record["window"], counter)
+        self._cache.update(self.session_id, accept)
+
+    def _next_counter(self) -> int:
+        def advance(record):
+            record["send_counter"] += 1
+            return record["send_counter"]
+        return self._cache.update(self.session_id, advance)
+
+
+class SharedSessionCache(SessionCache):
+    """
+    Sessions in storage shared by several workers (SQLiteStorage expiring
+    records), so a session opened on one worker is usable on all of them.
+    The soonest-expiring sessions are dropped beyond `capacity`.
+    """
+
+    NAMESPACE = "session"
+
+    def __init__(self, store, capacity: int = 10000, idle_timeout: float = 30 * 60,
+                 max_age: float = 12 * 3600, clock: Callable[[], float] = time.time):
+        super().__init__(capacity, idle_timeout, max_age, clock)
+        self._store = store
+
+    def __len__(self):
+        return self._store.count_expiring(self.NAMESPACE, self._clock())
+
+    def _expires(self, record: dict) -> float:
+        return min(record["last_used"] + self.idle_timeout, record["created_at"] + self.max_age)
+
+    def create(self, shared_secret: bytes) -> Session:
+        now = self._clock()
+        session_id = secrets.token_urlsafe(18)
+        record = {"secret": shared_secret, "created_at": now, "last_used": now,
+                  "max_seen": 0, "window": 0, "send_counter": 0}
+        evicted = self._store.put_expiring(self.NAMESPACE, session_id, record, self._expires(record),
+                                           self.capacity)
+        with self._lock:
+            self._created += 1
+            self._evicted += evicted
+        return SharedSession(self, session_id, record)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        found = self._store.get_expiring(self.NAMESPACE, session_id)
+        if found is None:
+            return None
+        record, expires = found
+        if expires <= self._clock():
+            with self._lock:
+                self._expired += 1
+            return None
+        return SharedSession(self, session_id, record)
+
+    def update(self, session_id: str, change: Callable[[dict], object]):
+        """Apply `change` to the stored record atomically and mark it used; returns its result"""
+        def update(record):
+            if record is None:
+                raise SessionError("Session expired or unknown")
+            result = change(record)
+            record["last_used"] = max(record["last_used"], self._clock())
+            return record, self._expires(record), result
+        return self._store.update_expiring(self.NAMESPACE, session_id, update)
+
+    def metrics(self) -> dict:
+        active = len(self)
+        with self._lock:
+            return {
+                "active": active,
+                "capacity": self.capacity,
+                "created": self._created,
+                "expired": self._expired,
+                "evicted": self._evicted
+            }
+
+
+def session_protected(cache):
+    """
+    Flask route decorator. Requests without X-Session-Id pass through
+    unchanged; with it, the JSON body is opened with the session key (see
+    request_json()) and the JSON response is sealed for the client.
+    `cache` is a SessionCache or a callable returning one (or None when
+    sessions are disabled).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            session_id = request.headers.get(SESSION_HEADER)
+            sessions = cache if cache is None or isinstance(cache, SessionCache) else cache()
+            if not session_id or sessions is None:
+                return view(*args, **kwargs)
+
+            session = sessions.get(session_id)
+            if session is None:
+                return jsonify({"error": "Session expired or unknown"}), 401
+
+            aad = aad_for(session_id, request.path)
+            g.session = session
+            g.session_payload = None
+            if request.content_length:
+                try:
+                    g.session_payload = session.open_request(request.get_json(silent=True), aad)
+                except SessionError as e:
+                    return jsonify({"error": str(e)}), 400
+
+            response = make_response(view(*args, **kwargs))
+            if not response.is_json:
+                return response
+            try:
+                sealed = jsonify(session.seal_response(response.get_json(), aad))
+            except SessionError as e:
+                # Expired or evicted by another worker while the view ran
+                return jsonify({"error": str(e)}), 401
+            sealed.status_code = response.status_code
+            return sealed
+        return wrapper
+    return decorator
+
+
+def request_json():
+    """JSON body of the current request, decrypted if it arrived over a session."""
+    if getattr(g, "session", None) is not None:
+        return g.session_payload
+    return request.get_json()
@@ -0,0 +1,390 @@
+"""
+Storage components for users and emails.
+
+Routes only talk to storage through this interface, so backends can be
+swapped by config. Records are plain dicts; updates replace a record with a
+modified copy instead of mutating it in place, so a record a reader already
+holds never changes underneath it.
+
+MemoryStorage keeps everything in process memory (the original users_db and
+emails_db). SQLiteStorage keeps it in one SQLite file (WAL mode), so several
+worker processes on a host share the same users and mail, plus the
+short-lived records (sessions, registered keys, rate-limit buckets) that
+must look the same from every worker.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+EMAIL_PARTICIPANT_FIELDS = ("to", "cc", "bcc")
+EMAIL_LOCK_STRIPES = 64
+
+
+def email_participants(email: dict) -> List[str]:
+    """Distinct addresses from To, Cc and Bcc plus the sender."""
+    addresses = []
+    for field in EMAIL_PARTICIPANT_FIELDS:
+        for address in str(email.get(field) or "").split(","):
+            address = address.strip()
+            if address and address not in addresses:
+                addresses.append(address)
+    if email["from"] not in addresses:
+        addresses.append(email["from"])
+    return addresses
+
+
+class MemoryStorage:
+    """
+    In-process users and emails.
+
+    Email records are never mutated: updates store a new dict under the
+    email's lock (email_lock(), striped by id and re-entrant, so callers can
+    hold it across their own follow-up writes). Each mailbox is a tuple of email ids that writers
+    replace under that mailbox's own lock, so senders to different users
+    never contend and readers take the current tuple without locking.
+    A send appends its id to every mailbox first and publishes the record
+    last, in one dict store; listings skip ids without a record, so a send
+    appears in all its mailboxes at once and a listing never waits on one.
+    """
+
+    # Calls never wait on I/O, so async callers may run them inline
+    blocking = False
+    # Only this process sees the data
+    shared = False
+
+    def __init__(self):
+        self._users: Dict[str, dict] = {}
+        self._emails: Dict[int, dict] = {}
+        self._mailboxes: Dict[str, Tuple[int, ...]] = {}
+        self._mailbox_locks: Dict[str, threading.Lock] = {}
+        self._email_locks = [threading.RLock() for _ in range(EMAIL_LOCK_STRIPES)]
+        self._next_email_id = 1
+        self._lock = threading.Lock()
+
+    def email_lock(self, email_id):
+        """The re-entrant lock guarding writes to this email"""
+        return self._email_locks[hash(email_id) % EMAIL_LOCK_STRIPES]
+
+    def _mailbox_lock(self, address: str) -> threading.Lock:
+        lock = self._mailbox_locks.get(address)
+        if lock is None:
+            with self._lock:
+                lock = self._mailbox_locks.setdefault(address, threading.Lock())
+        return lock
+
+    # Users
+
+    def get_user(self, username: str) -> Optional[dict]:
+        return self._users.get(username)
+
+    def add_user(self, username: str, record: dict) -> bool:
+        """Store a new user; False if the name is taken."""
+        with self._lock:
+            if username in self._users:
+                return False
+            self._users[username] = record
+            return True
+
+    def update_user(self, username: str, **fields) -> Optional[dict]:
+        with self._lock:
+            user = self._users.get(username)
+            if user is None:
+                return None
+            user = self._users[username] = {**user, **fields}
+            return user
+
+    def usernames(self) -> List[str]:
+        return list(self._users)
+
+    # Emails
+
+    def allocate_email_id(self) -> int:
+        with self._lock:
+            email_id = self._next_email_id
+            self._next_email_id += 1
+            return email_id
+
+    def add_email(self, email: dict) -> dict:
+        """Store an email whose id came from allocate_email_id()."""
+        for address in email_participants(email):
+            with self._mailbox_lock(address):
+                self._mailboxes[address] = self._mailboxes.get(address, ()) + (email["id"],)
+        # Publishing the record makes the email visible in every mailbox at once
+        self._emails[email["id"]] = email
+        return email
+
+    def get_email(self, email_id) -> Optional[dict]:
+        return self._emails.get(email_id)
+
+    def update_email(self, email_id, **fields) -> Optional[dict]:
+        with self.email_lock(email_id):
+            email = self._emails.get(email_id)
+            if email is None:
+                return None
+            email = self._emails[email_id] = {**email, **fields}
+            return email
+
+    def mailbox(self, address: str) -> List[dict]:
+        """Every email `address` sent or received, in the order they were stored."""
+        # Ids of sends still being applied have no record yet
+        records = map(self._emails.get, self._mailboxes.get(address, ()))
+        return [email for email in records if email is not None]
+
+
+def _json_default(value):
+    # bcrypt hashes are bytes and must come back as bytes; created_at
+    # timestamps are stored as ISO 8601 strings
+    if isinstance(value, bytes):
+        return {"__bytes__": value.hex()}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _json_object(value: dict):
+    if len(value) == 1 and "__bytes__" in value:
+        return bytes.fromhex(value["__bytes__"])
+    return value
+
+
+def _encode(record: dict) -> str:
+    return json.dumps(record, default=_json_default)
+
+
+def _decode(record: str) -> dict:
+    return json.loads(record, object_hook=_json_object)
+
+
+class SQLiteStorage:
+    """
+    Users and emails in a SQLite database shared by every process that opens
+    the same file.
+
+    Each email row carries `seq` (commit order of its insert) and `version`
+    (commit order of its latest write), both drawn from one counter under the
+    write lock, so every process replays changes in the same order.
+
+    Expiring records are (namespace, key) -> record rows with an expiry time,
+    updated atomically under the write lock and pruned once expired.
+    """
+
+    blocking = True
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            record TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS emails (
+            id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS emails_version ON emails (version);
+        CREATE INDEX IF NOT EXISTS emails_seq ON emails (seq);
+        CREATE TABLE IF NOT EXISTS mailboxes (
+            address TEXT NOT NULL,
+            email_id INTEGER NOT NULL,
+            PRIMARY KEY (address, email_id)
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS expiring (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            expires REAL NOT NULL,
+            record TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS expiring_by_expiry ON expiring (namespace, expires);
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        # WAL: readers never block the writer and vice versa
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened in a forked child
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextmanager
+    def _write(self):
+        """Write transaction; BEGIN IMMEDIATE serialises writers across processes"""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _next(self, db, name: str) -> int:
+        # Caller holds the write transaction
+        row = db.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        value = (row[0] if row else 0) + 1
+        db.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, value))
+        return value
+
+    # Users
+
+    def get_user(self, username: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT record FROM users WHERE username = ?", (username,)).fetchone()
+        return _decode(row[0]) if row else None
+
+    def add_user(self, username: str, record: dict) -> bool:
+        """Store a new user; False if the name is taken."""
+        with self._write() as db:
+            cursor = db.execute("INSERT OR IGNORE INTO users (username, record) VALUES (?, ?)",
+                                (username, _encode(record)))
+            return cursor.rowcount == 1
+
+    def update_user(self, username: str, **fields) -> Optional[dict]:
+        with self._write() as db:
+            row = db.execute("SELECT record FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            user = {**_decode(row[0]), **fields}
+            db.execute("UPDATE users SET record = ? WHERE username = ?", (_encode(user), username))
+        return user
+
+    def usernames(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT username FROM users ORDER BY rowid")]
+
+    def usernames_since(self, cursor: int = 0) -> Tuple[List[str], int]:
+        """Users added after `cursor` (0 = all) and the cursor to pass next time."""
+        rows = self._connection().execute(
+            "SELECT rowid, username FROM users WHERE rowid > ? ORDER BY rowid", (cursor,)).fetchall()
+        return [row[1] for row in rows], (rows[-1][0] if rows else cursor)
+
+    # Emails
+
+    def allocate_email_id(self) -> int:
+        with self._write() as db:
+            return self._next(db, "email_id")
+
+    def add_email(self, email: dict) -> dict:
+        """Store an email whose id came from allocate_email_id()."""
+        with self._write() as db:
+            seq = self._next(db, "version")
+            db.execute("INSERT INTO emails (id, seq, version, record) VALUES (?, ?, ?, ?)",
+                       (email["id"], seq, seq, _encode(email)))
+            db.executemany("INSERT OR IGNORE INTO mailboxes (address, email_id) VALUES (?, ?)",
+                           [(address, email["id"]) for address in email_participants(email)])
+        return email
+
+    def get_email(self, email_id) -> Optional[dict]:
+        row = self._connection().execute("SELECT record FROM emails WHERE id = ?", (email_id,)).fetchone()
+        return _decode(row[0]) if row else None
+
+    def update_email(self, email_id, **fields) -> Optional[dict]:
+        with self._write() as db:
+            row = db.execute("SELECT record FROM emails WHERE id = ?", (email_id,)).fetchone()
+            if row is None:
+                return None
+            email = {**_decode(row[0]), **fields}
+            db.execute("UPDATE emails SET version = ?, record = ? WHERE id = ?",
+                       (self._next(db, "version"), _encode(email), email_id))
+        return email
+
+    def mailbox(self, address: str) -> List[dict]:
+        """Every email `address` sent or received, in send order."""
+        rows = self._connection().execute(
+            "SELECT e.record FROM mailboxes m JOIN emails e ON e.id = m.email_id "
+            "WHERE m.address = ? ORDER BY e.seq", (address,))
+        return [_decode(row[0]) for row in rows]
+
+    def emails_changed_since(self, version: int = 0) -> Tuple[List[dict], int]:
+        """Emails added or updated after `version`, in insert order, and the latest version."""
+        rows = self._connection().execute(
+            "SELECT record, version FROM emails WHERE version > ? ORDER BY seq", (version,)).fetchall()
+        return [_decode(row[0]) for row in rows], max((row[1] for row in rows), default=version)
+
+    def emails_added_since(self, seq: Optional[int] = None) -> Tuple[List[dict], int]:
+        """Emails stored after `seq` in insert order (None: none, just the cursor) and the next cursor."""
+        db = self._connection()
+        if seq is None:
+            return [], db.execute("SELECT COALESCE(MAX(seq), 0) FROM emails").fetchone()[0]
+        rows = db.execute("SELECT record, seq FROM emails WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        return [_decode(row[0]) for row in rows], (rows[-1][1] if rows else seq)
+
+    # Expiring records
+
+    def get_expiring(self, namespace: str, key: str) -> Optional[Tuple[dict, float]]:
+        """(record, expires) or None; expired rows are returned until pruned"""
+        row = self._connection().execute(
+            "SELECT record, expires FROM expiring WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        return (_decode(row[0]), row[1]) if row else None
+
+    def put_expiring(self, namespace: str, key: str, record: dict, expires: float,
+                     limit: Optional[int] = None) -> int:
+        """
+        Store a record; with `limit`, drop the soonest-expiring rows of the
+        namespace beyond it. Returns the number dropped.
+        """
+        with self._write() as db:
+            db.execute("INSERT OR REPLACE INTO expiring (namespace, key, expires, record) VALUES (?, ?, ?, ?)",
+                       (namespace, key, expires, _encode(record)))
+            if limit is None:
+                return 0
+            return db.execute(
+                "DELETE FROM expiring WHERE namespace = ? AND key IN (SELECT key FROM expiring "
+                "WHERE namespace = ? ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, limit)).rowcount
+
+    def update_expiring(self, namespace: str, key: str, update: Callable):
+        """
+        Atomic read-modify-write: update(record or None) returns
+        (record, expires, result); a None record deletes the row. Returns
+        `result`. Exceptions from `update` roll back.
+        """
+        with self._write() as db:
+            row = db.execute("SELECT record FROM expiring WHERE namespace = ? AND key = ?",
+                             (namespace, key)).fetchone()
+            record, expires, result = update(_decode(row[0]) if row else None)
+            if record is None:
+                db.execute("DELETE FROM expiring WHERE namespace = ? AND key = ?", (namespace, key))
+            else:
+                db.execute("INSERT OR REPLACE INTO expiring (namespace, key, expires, record) VALUES (?, ?, ?, ?)",
+                           (namespace, key, expires, _encode(record)))
+        return result
+
+    def count_expiring(self, namespace: str, now: float) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM expiring WHERE namespace = ? AND expires > ?", (namespace, now)).fetchone()[0]
+
+    def prune_expiring(self, now: float) -> int:
+        """Delete every expired record; returns how many"""
+        with self._write() as db:
+            return db.execute("DELETE FROM expiring WHERE expires <= ?", (now,)).rowcount
+
+
+def create_storage(config: dict):
+    kind = config["storage"]
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "sqlite":
+        return SQLiteStorage(config["storage_path"])
+    raise ValueError(f"Unknown storage backend: {kind}")
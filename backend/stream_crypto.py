@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Streaming chunked AEAD encryption for message bodies and attachments.
+
+Data is encrypted in fixed-size chunks, each authenticated on its own, so
+memory use stays constant regardless of message size and a reader can stop
+at the first tampered chunk.
+
+Format:
+
+    header : b"GBS1" | algorithm u8 | chunk_size u32 | salt[16]
+    chunks : AEAD(chunk_i) (= up to chunk_size bytes + 16-byte tag) ...
+
+Every stream gets its own subkey, HKDF(key, salt), so the nonce can simply
+be counter u32 | last-chunk flag u8 (zero padded to 12 bytes) without ever
+repeating under one key. The last-chunk flag makes truncation detectable,
+and the header is bound into every chunk as associated data.
+
+Interfaces:
+    encrypt_stream / decrypt_stream   generators over iterables of bytes
+    EncryptingWriter / DecryptingReader  file-like wrappers
+    encrypt_file / decrypt_file       copy between file objects
+
+Run this file directly for a throughput benchmark in MB/s:
+
+    python3 stream_crypto.py [size_mb]
+"""
+
+import io
+import os
+import struct
+import sys
+import time
+from typing import BinaryIO, Iterable, Iterator
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"GBS1"
+HEADER = struct.Struct("<4sBI16s")
+TAG_LEN = 16
+
+AES_GCM = 1
+CHACHA20_POLY1305 = 2
+ALGORITHMS = {
+    AES_GCM: AESGCM,
+    CHACHA20_POLY1305: ChaCha20Poly1305
+}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class StreamCryptoError(Exception):
+    """Raised when a stream is malformed, truncated or fails authentication."""
+
+
+def _subkey(key: bytes, salt: bytes):
+    if len(key) != 32:
+        raise ValueError("Stream key must be 32 bytes")
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"guardbox-stream-v1").derive(key)
+
+
+def _nonce(index: int, last: bool) -> bytes:
+    if index >= 2 ** 32:
+        raise StreamCryptoError("Stream too long")
+    return struct.pack(">7xIB", index, 1 if last else 0)
+
+
+class EncryptingWriter(io.RawIOBase):
+    """Write plaintext, get the encrypted stream written to `sink`. close() finalises."""
+
+    def __init__(self, key: bytes, sink: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 algorithm: int = AES_GCM, aad: bytes = b""):
+        super().__init__()
+        if algorithm not in ALGORITHMS:
+            raise ValueError("Unknown stream algorithm")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        salt = os.urandom(16)
+        self._header = HEADER.pack(MAGIC, algorithm, chunk_size, salt)
+        self._aead = ALGORITHMS[algorithm](_subkey(key, salt))
+        self._aad = self._header + aad
+        self._sink = sink
+        self._chunk_size = chunk_size
+        # Always hold back up to one full chunk: we only know which chunk is
+        # last when the writer is closed
+        self._buffer = bytearray()
+        self._index = 0
+        sink.write(self._header)
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed stream")
+        self._buffer += data
+        chunk_size = self._chunk_size
+        if len(self._buffer) > chunk_size:
+            # Emit every full chunk except the one that might be last
+            ready = (len(self._buffer) - 1) // chunk_size * chunk_size
+            view = memoryview(self._buffer)
+            for start in range(0, ready, chunk_size):
+                self._emit(view[start:start + chunk_size], last=False)
+            view.release()
+            del self._buffer[:ready]
+        return len(data)
+
+    def _emit(self, chunk, last: bool):
+        self._sink.write(self._aead.encrypt(_nonce(self._index, last), bytes(chunk), self._aad))
+        self._index += 1
+
+    def close(self):
+        if not self.closed:
+            self._emit(self._buffer, last=True)
+            self._buffer = bytearray()
+        super().close()
+
+
+class DecryptingReader(io.RawIOBase):
+    """Read plaintext from an encrypted stream in `source`, one chunk in memory at a time."""
+
+    def __init__(self, key: bytes, source: BinaryIO, aad: bytes = b""):
+        super().__init__()
+        header = _read_exact(source, HEADER.size)
+        if len(header) != HEADER.size:
+            raise StreamCryptoError("Stream header is truncated")
+        magic, algorithm, chunk_size, salt = HEADER.unpack(header)
+        if magic != MAGIC or algorithm not in ALGORITHMS or not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise StreamCryptoError("Not a GuardBox encrypted stream")
+        self._aead = ALGORITHMS[algorithm](_subkey(key, salt))
+        self._aad = header + aad
+        self._source = source
+        self._record_len = chunk_size + TAG_LEN
+        self._index = 0
+        self._finished = False
+        # Next encrypted record, read one ahead to know whether it is the last
+        self._pending = _read_exact(source, self._record_len)
+        self._plain = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        record = self._pending
+        self._pending = _read_exact(self._source, self._record_len)
+        last = not self._pending
+        if len(record) < TAG_LEN or (not last and len(record) != self._record_len):
+            raise StreamCryptoError("Stream is truncated")
+        try:
+            plain = self._aead.decrypt(_nonce(self._index, last), record, self._aad)
+        except Exception as e:
+            raise StreamCryptoError(f"Chunk {self._index} failed authentication") from e
+        self._index += 1
+        self._finished = last
+        self._plain = memoryview(plain)
+
+    def readinto(self, buffer) -> int:
+        while not self._plain and not self._finished:
+            self._next_chunk()
+        n = min(len(buffer), len(self._plain))
+        buffer[:n] = self._plain[:n]
+        self._plain = self._plain[n:]
+        return n
+
+
+def _read_exact(source: BinaryIO, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        part = source.read(size - len(data))
+        if not part:
+            break
+        data += part
+    return bytes(data)
+
+
+class _QueueSink:
+    """Collects writes so a generator can yield them."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+    def drain(self):
+        parts, self.parts = self.parts, []
+        return parts
+
+
+class _IterSource:
+    """File-like view over an iterable of byte strings."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._offset = 0
+
+    def read(self, size: int) -> bytes:
+        # Track an offset rather than re-slicing the remainder, so one large
+        # input buffer is not copied once per chunk
+        while len(self._buffer) - self._offset < size:
+            part = next(self._chunks, None)
+            if part is None:
+                break
+            self._buffer = self._buffer[self._offset:] + part
+            self._offset = 0
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+
+def encrypt_stream(key: bytes, chunks: Iterable[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   algorithm: int = AES_GCM, aad: bytes = b"") -> Iterator[bytes]:
+    """Yield the encrypted stream for an iterable of plaintext pieces of any size."""
+    sink = _QueueSink()
+    writer = EncryptingWriter(key, sink, chunk_size, algorithm, aad)
+    for chunk in chunks:
+        writer.write(chunk)
+        yield from sink.drain()
+    writer.close()
+    yield from sink.drain()
+
+
+def decrypt_stream(key: bytes, chunks: Iterable[bytes], aad: bytes = b"") -> Iterator[bytes]:
+    """Yield plaintext chunks from an iterable of encrypted pieces of any size."""
+    reader = DecryptingReader(key, _IterSource(chunks), aad)
+    while True:
+        reader._next_chunk()
+        if reader._plain:
+            yield bytes(reader._plain)
+        reader._plain = memoryview(b"")
+        if reader._finished:
+            return
+
+
+def encrypt_file(key: bytes, src: BinaryIO, dst: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 algorithm: int = AES_GCM, aad: bytes = b""):
+    writer = EncryptingWriter(key, dst, chunk_size, algorithm, aad)
+    while True:
+        data = src.read(chunk_size)
+        if not data:
+            break
+        writer.write(data)
+    writer.close()
+
+
+def decrypt_file(key: bytes, src: BinaryIO, dst: BinaryIO, aad: bytes = b""):
+    for chunk in decrypt_stream(key, iter(lambda: src.read(DEFAULT_CHUNK_SIZE), b""), aad):
+        dst.write(chunk)
+
+
+def encrypt_bytes(key: bytes, data: bytes, **kwargs) -> bytes:
+    return b"".join(encrypt_stream(key, [data], **kwargs))
+
+
+def decrypt_bytes(key: bytes, data: bytes, aad: bytes = b"") -> bytes:
+    return b"".join(decrypt_stream(key, [data], aad))
+
+
+class _NullSink:
+    def write(self, data):
+        pass
+
+
+def benchmark(size_mb: int = 64, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Encrypt/decrypt throughput in MB/s for each algorithm."""
+    key = os.urandom(32)
+    block = os.urandom(chunk_size)
+    blocks = size_mb * 1024 * 1024 // chunk_size
+    results = []
+    for algorithm, name in ((AES_GCM, "AES-256-GCM"), (CHACHA20_POLY1305, "ChaCha20-Poly1305")):
+        start = time.perf_counter()
+        ciphertext = b"".join(encrypt_stream(key, (block for _ in range(blocks)), chunk_size, algorithm))
+        encrypt_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sink = _NullSink()
+        for chunk in decrypt_stream(key, [ciphertext]):
+            sink.write(chunk)
+        decrypt_s = time.perf_counter() - start
+
+        results.append({
+            "algorithm": name,
+            "encrypt_mb_s": size_mb / encrypt_s,
+            "decrypt_mb_s": size_mb / decrypt_s
+        })
+    return results
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    print(f"🔐 Streaming AEAD benchmark ({size_mb} MB, {DEFAULT_CHUNK_SIZE // 1024} KiB chunks)")
+    print("=" * 56)
+    print(f"{'algorithm':<20}  {'encrypt MB/s':>14}  {'decrypt MB/s':>14}")
+    for row in benchmark(size_mb):
+        print(f"{row['algorithm']:<20}  {row['encrypt_mb_s']:>14.1f}  {row['decrypt_mb_s']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for the application factory, config and storage components
+"""
+
+import os
+
+from app_factory import create_app
+from config import load_config
+from routes import MAX_DECAPSULATE_BATCH, MAX_ENCAPSULATE_BATCH
+from storage import MemoryStorage, email_participants
+from testing import MINIMAL_CONFIG
+
+
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_load_config():
+    """Overrides win over defaults; unknown settings are rejected"""
+    config = load_config({"storage": "memory", "ip_rate": 1})
+    assert config["ip_rate"] == 1
+    assert config["ip_burst"] == load_config()["ip_burst"]
+    # Key material and the database default to a data directory, not the source tree
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for setting in ("keystore_path", "storage_path"):
+        assert not os.path.abspath(config[setting]).startswith(source_dir + os.sep)
+    assert load_config()["debug"] is False
+    for value, expected in (("1", True), ("false", False)):
+        os.environ["GUARDBOX_DEBUG"] = value
+        try:
+            assert load_config()["debug"] is expected
+        finally:
+            del os.environ["GUARDBOX_DEBUG"]
+    try:
+        load_config({"no_such_setting": 1})
+        assert False, "unknown setting accepted"
+    except ValueError:
+        pass
+    print("✅ Config loading")
+
+
+def test_memory_storage_copy_on_write():
+    """Updates replace records, so a record already handed out never changes"""
+    storage = MemoryStorage()
+    assert storage.add_user("alice", {"password_hash": "h"})
+    assert not storage.add_user("alice", {"password_hash": "other"})
+
+    email_id = storage.allocate_email_id()
+    storage.add_email({"id": email_id, "from": "alice", "to": "bob", "cc": "carol, bob", "is_read": False})
+    before = storage.get_email(email_id)
+    after = storage.update_email(email_id, is_read=True)
+    assert not before["is_read"] and after["is_read"]
+    assert storage.get_email(email_id) is after
+
+    assert email_participants(after) == ["bob", "carol", "alice"]
+    assert [e["id"] for e in storage.mailbox("carol")] == [email_id]
+    assert storage.mailbox("dave") == []
+    print("✅ Memory storage")
+
+
+def test_minimal_app():
+    """Disabled components are not created and the core routes still work"""
+    app = create_app(MINIMAL_CONFIG)
+    svc = app.extensions["guardbox"]
+    try:
+        assert svc.keystore is None and svc.keypair_pool is None
+        assert svc.session_cache is None and svc.self_test is None
+        assert svc.storage.usernames() == []
+
+        client = app.test_client()
+        assert client.get("/readyz").status_code == 200
+        for username in ("alice@guardbox.com", "bob@guardbox.com"):
+            assert client.post("/register", json={"username": username, "password": "pw"}).status_code == 200
+        assert client.post("/register", json={"username": "bob@guardbox.com", "password": "pw"}).status_code == 400
+
+        alice = client.post("/login", json={"email": "alice@guardbox.com", "password": "pw"}).get_json()["token"]
+        bob = client.post("/login", json={"email": "bob@guardbox.com", "password": "pw"}).get_json()["token"]
+        assert client.post("/login", json={"email": "bob@guardbox.com", "password": "x"}).status_code == 401
+
+        response = client.post("/send_email", headers=auth(alice),
+                               json={"to": "bob@guardbox.com", "subject": "Hi", "body": "Hello"})
+        email_id = response.get_json()["email_id"]
+
+        inbox = client.get("/get_emails", headers=auth(bob)).get_json()
+        assert inbox["count"] == 1
+        assert inbox["emails"][0]["signature_status"] == "valid"
+        assert client.get("/get_emails?folder=sent", headers=auth(alice)).get_json()["count"] == 1
+
+        assert client.post("/mark_read", headers=auth(bob), json={"email_id": email_id}).status_code == 200
+        assert svc.storage.get_email(email_id)["is_read"]
+        assert client.post("/mark_read", headers=auth(bob), json={"email_id": 99}).status_code == 404
+        assert client.get("/get_emails").status_code == 401
+        assert client.post("/session", json={}).status_code == 404
+    finally:
+        svc.shutdown()
+    print("✅ Minimal app")
+
+
+def test_apps_are_independent():
+    """Two apps in one process share no users"""
+    first, second = create_app(MINIMAL_CONFIG), create_app(MINIMAL_CONFIG)
+    try:
+        first.test_client().post("/register", json={"username": "alice", "password": "pw"})
+        assert second.test_client().get("/users").get_json()["users"] == []
+    finally:
+        first.extensions["guardbox"].shutdown()
+        second.extensions["guardbox"].shutdown()
+    print("✅ Independent apps")
+
+
+def test_pqc_self_check_keeps_pool():
+    """The /test_pqc diagnostic never takes keypairs meant for registration"""
+    app = create_app({**MINIMAL_CONFIG, "keypair_pool_size": 2})
+    svc = app.extensions["guardbox"]
+    try:
+        client = app.test_client()
+        for _ in range(3):
+            assert client.get("/test_pqc").get_json()["kyber_test"]["success"]
+        metrics = svc.keypair_pool.metrics()
+        assert metrics["hits"] == metrics["misses"] == 0
+    finally:
+        svc.shutdown()
+    print("✅ PQC self-check keeps the keypair pool")
+
+
+def test_batch_cost_scales_with_items():
+    """A full batch drains the IP bucket far faster than a single item"""
+    app = create_app({**MINIMAL_CONFIG, "rate_limits": True, "ip_rate": 0.01, "ip_burst": 50})
+    svc = app.extensions["guardbox"]
+    try:
+        client = app.test_client()
+        public_key = svc.crypto.keygen()[0].hex()
+        full = {"public_keys": [public_key] * MAX_ENCAPSULATE_BATCH}
+        assert client.post("/encapsulate_batch", json=full).status_code == 200
+        assert client.post("/encapsulate_batch", json=full).status_code == 429
+        assert client.post("/encapsulate_batch", json={"public_keys": [public_key]}).status_code == 200
+        # The route reads fingerprints first, so an empty public_keys list buys nothing
+        cheat = {"public_keys": [], "fingerprints": ["x"] * MAX_ENCAPSULATE_BATCH}
+        assert client.post("/encapsulate_batch", json=cheat).status_code == 429
+
+        # Decapsulation batches are charged the same way (from a fresh IP bucket)
+        client = app.test_client()
+        client.environ_base["REMOTE_ADDR"] = "10.0.0.2"
+        client.post("/register", json={"username": "alice", "password": "pw"})
+        token = client.post("/login", json={"email": "alice", "password": "pw"}).get_json()["token"]
+        client.environ_base["REMOTE_ADDR"] = "10.0.0.3"
+        full = {"ciphertexts": ["00"] * MAX_DECAPSULATE_BATCH}
+        assert client.post("/decapsulate_batch", headers=auth(token), json=full).status_code == 200
+        assert client.post("/decapsulate_batch", headers=auth(token), json=full).status_code == 429
+        assert client.post("/decapsulate_batch", headers=auth(token), json={"ciphertexts": ["00"]}).status_code == 200
+    finally:
+        svc.shutdown()
+    print("✅ Batch cost scales with items")
+
+
+if __name__ == "__main__":
+    test_load_config()
+    test_memory_storage_copy_on_write()
+    test_minimal_app()
+    test_apps_are_independent()
+    test_pqc_self_check_keeps_pool()
+    test_batch_cost_scales_with_items()
+    print("\n🎉 App factory tests passed")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio serving mode
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import tracemalloc
+
+from asgi import create_asgi_app, start_server
+from testing import MINIMAL_CONFIG
+
+
+async def call(app, method, path, body=None, token=None, headers=(), response_headers=None):
+    """
+    Run one request through the ASGI app; returns (status, JSON body or raw
+    bytes). Response headers are stored in the `response_headers` dict if given.
+    """
+    headers = [(b"content-type", b"application/json"), *headers]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "headers": headers, "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 5000)}
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    if response_headers is not None:
+        for name, value in sent[0]["headers"]:
+            assert name not in response_headers, f"duplicate {name} header"
+            response_headers[name] = value
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    try:
+        return sent[0]["status"], json.loads(body)
+    except ValueError:
+        return sent[0]["status"], body
+
+
+async def register_and_login(app, *usernames):
+    tokens = []
+    for username in usernames:
+        status, _ = await call(app, "POST", "/register", {"username": username, "password": "pw"})
+        assert status == 200
+        status, data = await call(app, "POST", "/login", {"email": username, "password": "pw"})
+        assert status == 200
+        tokens.append(data["token"])
+    return tokens
+
+
+def test_native_and_bridged_routes():
+    """Native handlers and the Flask routes behind the WSGI bridge share one state"""
+    app = create_asgi_app(MINIMAL_CONFIG)
+
+    async def scenario():
+        alice, bob = await register_and_login(app, "alice@guardbox.com", "bob@guardbox.com")
+        assert (await call(app, "POST", "/register", {"username": "bob@guardbox.com", "password": "pw"}))[0] == 400
+        assert (await call(app, "POST", "/login", {"email": "bob@guardbox.com", "password": "x"}))[0] == 401
+        assert (await call(app, "GET", "/healthz"))[1]["status"] == "ok"
+
+        # send_email has no native handler: it runs in Flask through the bridge
+        status, data = await call(app, "POST", "/send_email",
+                                  {"to": "bob@guardbox.com", "subject": "Hi", "body": "Hello"}, alice)
+        assert status == 200
+
+        status, inbox = await call(app, "GET", "/get_emails?folder=inbox", token=bob)
+        assert status == 200 and inbox["count"] == 1
+        assert inbox["emails"][0]["id"] == data["email_id"]
+        assert inbox["emails"][0]["signature_status"] == "valid"
+        assert (await call(app, "GET", "/get_emails"))[0] == 401
+        assert (await call(app, "GET", "/users"))[1]["users"] == ["alice@guardbox.com", "bob@guardbox.com"]
+        assert (await call(app, "GET", "/no_such_route"))[0] == 404
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.close()
+    print("✅ Native and bridged routes")
+
+
+def test_cors_headers_on_native_routes():
+    """Native handlers send the same CORS headers flask_cors adds to bridged routes"""
+    app = create_asgi_app(MINIMAL_CONFIG)
+    origin = [(b"origin", b"http://localhost:3000")]
+
+    async def scenario():
+        await register_and_login(app, "alice@guardbox.com")
+        for method, path, body in (("POST", "/login", {"email": "alice@guardbox.com", "password": "pw"}),
+                                   ("POST", "/login", {"email": "alice@guardbox.com", "password": "x"}),
+                                   ("GET", "/healthz", None),
+                                   ("GET", "/users", None)):
+            headers = {}
+            await call(app, method, path, body, headers=origin, response_headers=headers)
+            assert headers[b"access-control-allow-origin"] == b"http://localhost:3000", path
+        headers = {}
+        await call(app, "GET", "/healthz", response_headers=headers)
+        assert headers[b"access-control-allow-origin"] == b"*"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.close()
+    print("✅ CORS headers on native routes")
+
+
+async def post_stream(reader, writer, path, pieces, chunked, headers=b""):
+    """POST `pieces` on an open connection, chunked or with Content-Length; returns the JSON response"""
+    head = b"POST " + path.encode() + b" HTTP/1.1\r\nHost: localhost\r\n" + headers
+    if chunked:
+        writer.write(head + b"Transfer-Encoding: chunked\r\n\r\n")
+    else:
+        writer.write(head + b"Content-Length: " + str(sum(len(p) for p in pieces)).encode() + b"\r\n\r\n")
+    for piece in pieces:
+        writer.write(b"%x\r\n%s\r\n" % (len(piece), piece) if chunked else piece)
+        await writer.drain()
+    if chunked:
+        writer.write(b"0\r\n\r\n")
+    await writer.drain()
+    response = await reader.readuntil(b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 200"), response
+    length = int(response.split(b"content-length: ")[1].split(b"\r\n")[0])
+    return json.loads(await reader.readexactly(length))
+
+
+def test_streamed_request_bodies():
+    """Large chunked and Content-Length bodies reach /sign_stream piece by piece, not buffered whole"""
+    app = create_asgi_app(MINIMAL_CONFIG)
+    block = bytes(range(256)) * 256  # 64 KiB
+    pieces = 256                     # 16 MiB per request
+
+    async def scenario():
+        server = await start_server(app, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        expected = hmac.new(app.services.signature_sk.encode(), digestmod=hashlib.sha256)
+        for _ in range(pieces):
+            expected.update(block)
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        tracemalloc.start()
+        try:
+            # Both framings on one keep-alive connection
+            for chunked in (True, False):
+                data = await post_stream(reader, writer, "/sign_stream", [block] * pieces, chunked)
+                assert data == {"signature": expected.hexdigest(), "bytes": pieces * len(block),
+                                "algorithm": "HMAC-SHA256"}
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < 4 * 1024 * 1024, f"peak {peak} bytes"
+
+        # A small chunked JSON body on the same connection
+        body = json.dumps({"username": "carol@guardbox.com", "password": "pw"}).encode()
+        data = await post_stream(reader, writer, "/register", [body[:5], body[5:]], True,
+                                 b"Content-Type: application/json\r\n")
+        assert data["message"] == "User registered successfully"
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.close()
+    print("✅ Streamed request bodies")
+
+
+def test_bad_content_length_rejected():
+    """Negative, malformed or repeated Content-Length gets 400 and the connection closes"""
+    app = create_asgi_app(MINIMAL_CONFIG)
+
+    async def scenario():
+        server = await start_server(app, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        for lengths in ([b"-1"], [b"+5"], [b"5x"], [b""], [b"5", b"5"]):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            head = b"POST /sign_stream HTTP/1.1\r\nHost: localhost\r\n"
+            writer.write(head + b"".join(b"Content-Length: " + n + b"\r\n" for n in lengths) + b"\r\n")
+            writer.write(b"x" * 1024)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            assert response.startswith(b"HTTP/1.1 400"), (lengths, response)
+            writer.close()
+        server.close()
+        await server.wait_closed()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.close()
+    print("✅ Bad Content-Length rejected")
+
+
+async def open_stream(port, token):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /events?token={token} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    header = await reader.readuntil(b": connected\n\n")
+    assert header.startswith(b"HTTP/1.1 200")
+    return reader, writer
+
+
+def test_many_idle_event_streams():
+    """Hundreds of idle SSE connections on one loop all receive a pushed email"""
+    app = create_asgi_app(MINIMAL_CONFIG)
+    streams = 300
+
+    async def scenario():
+        server = await start_server(app, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        alice, bob = await register_and_login(app, "alice@guardbox.com", "bob@guardbox.com")
+
+        connections = await asyncio.gather(*[open_stream(port, bob) for _ in range(streams)])
+        assert sum(len(queues) for queues in app.subscribers.values()) == streams
+
+        # Send over a keep-alive connection: two requests, one socket
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for subject in ("first", "second"):
+            body = json.dumps({"to": "bob@guardbox.com", "subject": subject, "body": "x"}).encode()
+            writer.write(b"POST /send_email HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         b"Authorization: Bearer " + alice.encode() +
+                         b"\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            assert head.startswith(b"HTTP/1.1 200") and b"keep-alive" in head
+            length = int(head.split(b"content-length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+        writer.close()
+
+        for stream_reader, _ in connections:
+            for subject in ("first", "second"):
+                event = await asyncio.wait_for(stream_reader.readuntil(b"\n\n"), 5)
+                assert event.startswith(b"event: email") and subject.encode() in event
+
+        for _, stream_writer in connections:
+            stream_writer.close()
+        for _ in range(100):
+            if not app.subscribers:
+                break
+            await asyncio.sleep(0.02)
+        assert not app.subscribers
+        server.close()
+        await server.wait_closed()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.close()
+    print(f"✅ {streams} idle event streams")
+
+
+if __name__ == "__main__":
+    test_native_and_bridged_routes()
+    test_cors_headers_on_native_routes()
+    test_streamed_request_bodies()
+    test_bad_content_length_rejected()
+    test_many_idle_event_streams()
+    print("\n🎉 ASGI tests passed")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the crypto benchmark harness (statistics and baseline comparison)
+"""
+
+from bench_crypto import compare, measure, percentile, worker_counts
+
+
+def test_percentiles_and_worker_counts():
+    values = sorted(float(i) for i in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+    assert worker_counts(1) == [1]
+    assert worker_counts(6) == [1, 2, 4, 6]
+    print("✅ Percentiles and worker counts")
+
+
+def test_baseline_comparison_flags_regressions():
+    """Only drops beyond the tolerance count; new rows are ignored"""
+    baseline = [
+        {"operation": "hmac_sign", "executor": "thread", "workers": 1, "ops_per_sec": 1000.0},
+        {"operation": "jwt_encode", "executor": "thread", "workers": 1, "ops_per_sec": 1000.0},
+    ]
+    results = [
+        {"operation": "hmac_sign", "executor": "thread", "workers": 1, "ops_per_sec": 850.0},
+        {"operation": "jwt_encode", "executor": "thread", "workers": 1, "ops_per_sec": 700.0},
+        {"operation": "jwt_encode", "executor": "thread", "workers": 2, "ops_per_sec": 10.0},
+    ]
+    rows = {row["key"]: row for row in compare(results, baseline, tolerance=0.2)}
+    assert set(rows) == {"hmac_sign/thread/1", "jwt_encode/thread/1"}
+    assert not rows["hmac_sign/thread/1"]["regression"]
+    assert rows["jwt_encode/thread/1"]["regression"]
+    print("✅ Baseline comparison")
+
+
+def test_measure_reports_throughput():
+    result = measure("hmac_sign", "thread", 2, 50)
+    assert result["ops"] == 100 and result["ops_per_sec"] > 0
+    assert result["p50_ms"] <= result["p99_ms"]
+    print("✅ Measurement")
+
+
+if __name__ == "__main__":
+    test_percentiles_and_worker_counts()
+    test_baseline_comparison_flags_regressions()
+    test_measure_reports_throughput()
+    print("\n🎉 Benchmark harness tests passed")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-core crypto service
+"""
+
+from crypto_service import CryptoService
+from kem import decapsulate, keygen
+
+
+def test_kem_round_trip():
+    """Service encapsulate/decapsulate agree with the library"""
+    crypto = CryptoService("512", workers=2).warm_up()
+    try:
+        pk, sk = crypto.keygen()
+        ciphertext, shared_secret = crypto.encapsulate(pk)
+        assert crypto.decapsulate(sk, ciphertext) == shared_secret
+        assert decapsulate(sk, ciphertext) == shared_secret
+    finally:
+        crypto.shutdown()
+    print("✅ KEM round trip")
+
+
+def test_batches_keep_order():
+    """Batched results come back in input order across chunks"""
+    crypto = CryptoService("512", workers=2)
+    try:
+        keypairs = [keygen() for _ in range(40)]
+        future = crypto.submit_encapsulate_many([pk for pk, _ in keypairs])
+        results = future.result()
+        assert len(results) == 40
+        for (pk, sk), (ciphertext, shared_secret) in zip(keypairs, results):
+            assert decapsulate(sk, ciphertext) == shared_secret
+
+        pk, sk = keypairs[0]
+        ciphertexts = [crypto.encapsulate(pk) for _ in range(20)]
+        secrets = crypto.decapsulate_many(sk, [ct for ct, _ in ciphertexts])
+        assert secrets == [ss for _, ss in ciphertexts]
+
+        assert len(crypto.keygen_many(10)) == 10
+    finally:
+        crypto.shutdown()
+    print("✅ Batch order preserved")
+
+
+def test_mixed_modes_in_one_batch():
+    """Kyber512/768/1024 keys can be encapsulated side by side"""
+    crypto = CryptoService("512", workers=2)
+    try:
+        keypairs = [keygen(mode) for mode in ("512", "768", "1024", "768")]
+        results = crypto.encapsulate_many([pk for pk, _ in keypairs])
+        for (pk, sk), (ciphertext, shared_secret) in zip(keypairs, results):
+            assert crypto.decapsulate(sk, ciphertext) == shared_secret
+
+        pk, sk = crypto.keygen("1024")
+        assert len(pk) == 1568
+    finally:
+        crypto.shutdown()
+    print("✅ Mixed modes")
+
+
+def test_invalid_key_rejected_before_dispatch():
+    """Wrong-length keys raise ValueError in the caller"""
+    crypto = CryptoService("512", workers=1)
+    try:
+        crypto.encapsulate(b"short")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    finally:
+        crypto.shutdown()
+    print("✅ Invalid key rejected")
+
+
+def test_hmac_sign_verify():
+    """Small messages are signed inline, large ones on a worker"""
+    crypto = CryptoService("512", workers=1)
+    try:
+        for message in ["hello", "x" * 200_000]:
+            signature = crypto.sign("key", message)
+            assert crypto.verify("key", message, signature)
+            assert not crypto.verify("other", message, signature)
+    finally:
+        crypto.shutdown()
+    print("✅ HMAC sign/verify")
+
+
+def test_hmac_batches_match_single_calls():
+    """Batch signatures equal single ones, inline and across workers"""
+    crypto = CryptoService("512", workers=2)
+    try:
+        for messages in (["a", "b", "c"], [f"message {i}" * 2000 for i in range(40)]):
+            signatures = crypto.sign_many("key", messages)
+            assert signatures == [crypto.sign("key", m) for m in messages]
+            tampered = signatures[:-1] + ["0" * 64]
+            assert crypto.verify_many("key", messages, tampered) == [True] * (len(messages) - 1) + [False]
+            # Non-ASCII or non-str signatures are invalid items, not errors
+            garbled = ["é" * 64] + signatures[1:-1] + [None]
+            assert crypto.verify_many("key", messages, garbled) == [False] + [True] * (len(messages) - 2) + [False]
+            assert not crypto.verify("key", messages[0], "é")
+    finally:
+        crypto.shutdown()
+    print("✅ HMAC batches")
+
+
+def test_single_kem_ops_skip_the_pool():
+    """Single Kyber ops run inline; only batches need the worker pool"""
+    crypto = CryptoService("512", workers=1)
+    crypto.shutdown()
+    pk, sk = crypto.keygen()
+    ciphertext, shared_secret = crypto.encapsulate(pk)
+    assert crypto.decapsulate(sk, ciphertext) == shared_secret
+    try:
+        crypto.encapsulate_many([pk, pk])
+        assert False, "batch ran without a pool"
+    except RuntimeError:
+        pass
+    print("✅ Single KEM ops inline")
+
+
+if __name__ == "__main__":
+    test_kem_round_trip()
+    test_single_kem_ops_skip_the_pool()
+    test_batches_keep_order()
+    test_mixed_modes_in_one_batch()
+    test_invalid_key_rejected_before_dispatch()
+    test_hmac_sign_verify()
+    test_hmac_batches_match_single_calls()
+    print("\n🎉 Crypto service tests passed")
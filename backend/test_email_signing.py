@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for sign-on-send and cached verify-on-read
+"""
+
+import hashlib
+import hmac
+
+from email_signing import INVALID, UNKNOWN_KEY, UNSIGNED, VALID, VerificationCache, sign_email
+
+
+def sign(key, message):
+    return hmac.new(key.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+class CountingVerify:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, key, message, signature):
+        self.calls += 1
+        return hmac.compare_digest(sign(key, message), signature)
+
+
+def make_email(**fields):
+    return {"id": 1, "from": "a@x.com", "to": "b@x.com", "subject": "Hi", "body": "Hello",
+            "timestamp": "2025-01-01T00:00:00", "is_read": False, **fields}
+
+
+def test_verified_once_per_key_version():
+    keys = {"public": "pk-1", "private": "sk-1"}
+    email = make_email()
+    email["signature"] = sign_email(email, keys, sign)
+    verify = CountingVerify()
+    cache = VerificationCache(verify)
+
+    for _ in range(5):
+        assert cache.status(email, keys) == VALID
+    assert verify.calls == 1
+
+    # Flags are not signed
+    email["is_read"] = True
+    cache.forget(1)
+    assert cache.status(email, keys) == VALID
+    print("✅ Verified once, flags excluded")
+
+
+def test_tampered_unsigned_and_rotated():
+    keys = {"public": "pk-1", "private": "sk-1"}
+    cache = VerificationCache(CountingVerify())
+
+    email = make_email()
+    email["signature"] = sign_email(email, keys, sign)
+    email["body"] = "Hello (edited)"
+    assert cache.status(email, keys) == INVALID
+
+    assert cache.status(make_email(id=2), keys) == UNSIGNED
+    assert sign_email(make_email(), None, sign) is None
+
+    rotated = {"public": "pk-2", "private": "sk-2"}
+    signed = make_email(id=3)
+    signed["signature"] = sign_email(signed, keys, sign)
+    assert cache.status(signed, rotated) == UNKNOWN_KEY
+    print("✅ Tampered, unsigned and rotated-key emails")
+
+
+if __name__ == "__main__":
+    test_verified_once_per_key_version()
+    test_tampered_unsigned_and_rotated()
+    print("\n🎉 Email signing tests passed")
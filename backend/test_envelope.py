@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-recipient envelope encryption
+"""
+
+from envelope import EnvelopeError, for_recipient, open_envelope, seal_envelope
+from kem import decapsulate, encapsulate, keygen
+
+
+def encapsulate_many(public_keys):
+    return [encapsulate(pk) for pk in public_keys]
+
+
+def test_every_recipient_opens_the_same_body():
+    """One body ciphertext, one wrapped key per recipient, mixed Kyber modes"""
+    keys = {"alice": keygen("512"), "bob": keygen("768"), "carol": keygen("1024")}
+    body = "Quarterly report 📈".encode() * 1000
+    envelope = seal_envelope(body, {name: pk for name, (pk, _) in keys.items()}, encapsulate_many)
+
+    assert set(envelope["recipients"]) == set(keys)
+    assert envelope["recipients"]["bob"]["algorithm"] == "Kyber768"
+    for name, (_, sk) in keys.items():
+        assert open_envelope(envelope, name, sk, decapsulate) == body
+    print("✅ All recipients open the envelope")
+
+
+def test_outsiders_and_wrong_keys_rejected():
+    """Non-recipients and other recipients' secret keys cannot open it"""
+    alice, bob = keygen("512"), keygen("512")
+    envelope = seal_envelope(b"secret", {"alice": alice[0], "bob": bob[0]}, encapsulate_many)
+
+    for address, sk in (("mallory", alice[1]), ("alice", bob[1])):
+        try:
+            open_envelope(envelope, address, sk, decapsulate)
+            assert False, "expected EnvelopeError"
+        except EnvelopeError:
+            pass
+
+    alice_view = for_recipient(envelope, "alice")
+    assert list(alice_view["recipients"]) == ["alice"]
+    assert open_envelope(alice_view, "alice", alice[1], decapsulate) == b"secret"
+    print("✅ Outsiders rejected, per-recipient view")
+
+
+if __name__ == "__main__":
+    test_every_recipient_opens_the_same_body()
+    test_outsiders_and_wrong_keys_rejected()
+    print("\n🎉 Envelope tests passed")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for per-call Kyber parameter set selection
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import kem
+
+
+def test_each_mode_round_trip():
+    """Every supported mode works without touching global state"""
+    for mode in kem.SUPPORTED_MODES:
+        pk, sk = kem.keygen(mode)
+        assert kem.mode_for_public_key(pk) == mode
+        ciphertext, shared_secret = kem.encapsulate(pk)
+        assert kem.decapsulate(sk, ciphertext) == shared_secret
+    print("✅ Round trip in every mode")
+
+
+def test_modes_in_parallel_threads():
+    """Mixed-security-level traffic from many threads stays correct"""
+    def round_trips(mode):
+        for _ in range(50):
+            pk, sk = kem.keygen(mode)
+            ciphertext, shared_secret = kem.encapsulate(pk, mode)
+            if kem.decapsulate(sk, ciphertext, mode) != shared_secret:
+                return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        assert all(executor.map(round_trips, list(kem.SUPPORTED_MODES) * 4))
+    print("✅ Parallel mixed-mode threads")
+
+
+def test_wrong_length_rejected():
+    """Keys of the wrong size raise ValueError instead of crashing the library"""
+    pk, _ = kem.keygen("768")
+    try:
+        kem.encapsulate(pk, "512")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Wrong length rejected")
+
+
+if __name__ == "__main__":
+    test_each_mode_round_trip()
+    test_modes_in_parallel_threads()
+    test_wrong_length_rejected()
+    print("\n🎉 KEM tests passed")
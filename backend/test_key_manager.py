@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for server Kyber key rotation
+"""
+
+import itertools
+
+from key_manager import KeyManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_keygen():
+    counter = itertools.count()
+    def keygen():
+        n = next(counter)
+        return f"pk{n}".encode(), f"sk{n}".encode()
+    return keygen
+
+
+def test_rotation_keeps_old_key_during_grace():
+    """Clients holding the previous key id keep working until the grace window ends"""
+    clock = FakeClock()
+    manager = KeyManager(fake_keygen(), rotation_interval=100, grace_period=10, clock=clock)
+    old = manager.current()
+
+    new = manager.rotate()
+    assert manager.current() is new and new.key_id != old.key_id
+    assert manager.get(old.key_id).secret_key == b"sk0"
+
+    clock.now += 11
+    assert manager.get(old.key_id) is None
+    manager.purge_retired()
+    assert [k.key_id for k in manager.active_keys()] == [new.key_id]
+    print("✅ Grace window honoured")
+
+
+def test_missing_key_id_uses_current():
+    """Older clients that send no key id get the current key"""
+    manager = KeyManager(fake_keygen())
+    assert manager.get(None) is manager.current()
+    assert manager.get("unknown") is None
+    print("✅ Default and unknown key ids")
+
+
+if __name__ == "__main__":
+    test_rotation_keeps_old_key_during_grace()
+    test_missing_key_id_uses_current()
+    print("\n🎉 Key manager tests passed")
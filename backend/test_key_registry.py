@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the fingerprint-addressed public key registry
+"""
+
+import os
+import tempfile
+
+from key_registry import PublicKeyRegistry, SharedPublicKeyRegistry, fingerprint
+from storage import SQLiteStorage
+
+
+def check_length(public_key):
+    if len(public_key) != 4:
+        raise ValueError("Public key has the wrong length")
+
+
+def test_register_and_lookup():
+    """Registering returns a stable fingerprint that resolves to the key"""
+    registry = PublicKeyRegistry(check_length)
+    fp = registry.register(b"key1")
+    assert fp == fingerprint(b"key1") and len(fp) == 32
+    assert registry.get(fp) == b"key1"
+    assert registry.get("unknown") is None
+    print("✅ Register and lookup")
+
+
+def test_invalid_key_rejected():
+    """Malformed keys are never cached"""
+    registry = PublicKeyRegistry(check_length)
+    try:
+        registry.register(b"too long")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert len(registry) == 0
+    print("✅ Invalid key rejected")
+
+
+def test_lru_eviction():
+    """The least recently used key is evicted first"""
+    registry = PublicKeyRegistry(check_length, capacity=2)
+    fp1 = registry.register(b"key1")
+    fp2 = registry.register(b"key2")
+    registry.get(fp1)
+    registry.register(b"key3")
+    assert registry.get(fp1) == b"key1"
+    assert registry.get(fp2) is None
+    assert registry.metrics()["evictions"] == 1
+    print("✅ LRU eviction")
+
+
+def test_shared_registry_spans_handles():
+    """A key registered through one storage handle resolves through another (another worker)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guardbox.db")
+        first = SharedPublicKeyRegistry(SQLiteStorage(path), check_length, capacity=2)
+        second = SharedPublicKeyRegistry(SQLiteStorage(path), check_length, capacity=2)
+        fp = first.register(b"key1")
+        assert second.get(fp) == b"key1"
+        first.register(b"key2")
+        first.register(b"key3")
+        # Dropped from the store beyond capacity; `second` still holds its cached copy
+        assert SharedPublicKeyRegistry(SQLiteStorage(path), check_length).get(fp) is None
+        assert second.get(fp) == b"key1"
+    print("✅ Shared registry")
+
+
+if __name__ == "__main__":
+    test_register_and_lookup()
+    test_invalid_key_rejected()
+    test_lru_eviction()
+    test_shared_registry_spans_handles()
+    print("\n🎉 Key registry tests passed")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-generated Kyber keypair pool
+"""
+
+import itertools
+import time
+
+from keypair_pool import KeypairPool
+
+
+def counting_keygen():
+    counter = itertools.count()
+    def keygen():
+        n = next(counter)
+        return f"pk{n}".encode(), f"sk{n}".encode()
+    return keygen
+
+
+def wait_until_full(pool, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while pool.metrics()["available"] < pool.size:
+        assert time.monotonic() < deadline, "pool did not refill"
+        time.sleep(0.01)
+
+
+def test_pool_serves_pregenerated_keys():
+    """take() hands out keypairs generated by the refill thread"""
+    pool = KeypairPool(counting_keygen(), size=4).start()
+    try:
+        wait_until_full(pool)
+        keys = [pool.take() for _ in range(4)]
+        assert len(set(keys)) == 4
+        assert pool.metrics()["hits"] == 4
+
+        # Refill thread tops the pool back up
+        wait_until_full(pool)
+        assert pool.metrics()["last_refill_lag_ms"] > 0
+    finally:
+        pool.stop()
+    print("✅ Pool hits and refill")
+
+
+def test_empty_pool_falls_back_inline():
+    """Without a refill thread, take() generates inline and counts a miss"""
+    pool = KeypairPool(counting_keygen(), size=4)
+    assert pool.take() == (b"pk0", b"sk0")
+    metrics = pool.metrics()
+    assert metrics["misses"] == 1 and metrics["hit_rate"] == 0.0
+    print("✅ Inline fallback on empty pool")
+
+
+def test_refill_survives_keygen_failures():
+    """A failing keygen is counted and retried; the pool fills once it recovers"""
+    keygen = counting_keygen()
+    failures = [RuntimeError("entropy source unavailable")] * 2
+
+    def flaky_keygen():
+        if failures:
+            raise failures.pop()
+        return keygen()
+
+    pool = KeypairPool(flaky_keygen, size=2).start()
+    try:
+        wait_until_full(pool)
+        metrics = pool.metrics()
+        assert metrics["refill_failures"] == 2 and metrics["last_refill_error"] is None
+    finally:
+        pool.stop()
+    print("✅ Refill survives keygen failures")
+
+
+if __name__ == "__main__":
+    test_pool_serves_pregenerated_keys()
+    test_empty_pool_falls_back_inline()
+    test_refill_survives_keygen_failures()
+    print("\n🎉 Keypair pool tests passed")
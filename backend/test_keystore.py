@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent keystore
+"""
+
+import os
+import tempfile
+
+from keystore import Keystore, KeystoreError
+from key_manager import KeyManager
+
+
+def temp_path():
+    return os.path.join(tempfile.mkdtemp(), "test.keystore")
+
+
+def test_round_trip_and_overwrite():
+    """Values survive a reload; the last write and deletes win"""
+    path = temp_path()
+    store = Keystore(path)
+    store.put("server/a", b"1")
+    store.put_many({"server/b": b"2", "server/a": b"3"})
+    store.delete("server/b")
+
+    reloaded = Keystore(path)
+    assert reloaded.items() == [("server/a", b"3")]
+
+    reloaded.compact()
+    assert Keystore(path).items() == [("server/a", b"3")]
+    assert Keystore(path).dead_records == 0
+    print("✅ Round trip, overwrite, delete and compaction")
+
+
+def test_encrypted_at_rest():
+    """Encrypted values never hit the disk in clear and need the passphrase"""
+    path = temp_path()
+    Keystore(path, "correct horse").put("user/alice/kyber/private", b"top secret key")
+    with open(path, "rb") as f:
+        assert b"top secret key" not in f.read()
+
+    assert Keystore(path, "correct horse").get("user/alice/kyber/private") == b"top secret key"
+    for passphrase in ("wrong", None):
+        try:
+            Keystore(path, passphrase)
+            assert False, "expected KeystoreError"
+        except KeystoreError:
+            pass
+    print("✅ Encryption at rest")
+
+
+def test_corruption_detected():
+    """A flipped bit fails the integrity check instead of loading a bad key"""
+    path = temp_path()
+    Keystore(path).put("server/signature/private", b"abcdef")
+    with open(path, "r+b") as f:
+        f.seek(-20, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-20, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 1]))
+    try:
+        Keystore(path)
+        assert False, "expected KeystoreError"
+    except KeystoreError:
+        pass
+    print("✅ Corruption detected")
+
+
+def test_torn_append_dropped():
+    """An append cut short by a crash is ignored on load and cut off by the next write"""
+    path = temp_path()
+    Keystore(path).put_many({"server/a": b"1", "server/b": b"2"})
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    store = Keystore(path)
+    assert store.items() == [("server/a", b"1")]
+    store.put("server/c", b"3")
+    assert Keystore(path).items() == [("server/a", b"1"), ("server/c", b"3")]
+    print("✅ Torn append dropped")
+
+
+def test_compact_keeps_other_writers_records():
+    """Compaction re-reads the file, so records appended by another handle survive"""
+    path = temp_path()
+    first, second = Keystore(path), Keystore(path)
+    first.put("server/a", b"1")
+    first.put("server/a", b"2")
+    second.put("server/b", b"3")
+    first.compact()
+    assert Keystore(path).items() == [("server/a", b"2"), ("server/b", b"3")]
+    assert first.get("server/b") == b"3"
+    second.put("server/c", b"4")
+    assert len(Keystore(path).items()) == 3
+    print("✅ Compaction keeps concurrent appends")
+
+
+def test_compact_keeps_file_private():
+    """The rewritten file keeps the keystore's 0600 mode"""
+    path = temp_path()
+    store = Keystore(path)
+    store.put("server/a", b"1")
+    store.put("server/a", b"2")
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    store.compact()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    print("✅ Compaction keeps the file private")
+
+
+def test_reload_reuses_derived_key():
+    """scrypt runs once per salt, not on every reload"""
+    path = temp_path()
+    store = Keystore(path, "correct horse")
+    derived = store._derived
+    store.put("server/a", b"1")
+    store.reload()
+    assert store._derived is derived and store.get("server/a") == b"1"
+    print("✅ Derived key cached across reloads")
+
+
+def test_key_manager_restores_keys():
+    """Server KEM keys and the current key id are stable across restarts"""
+    path = temp_path()
+    calls = []
+
+    def keygen():
+        calls.append(1)
+        return os.urandom(800), os.urandom(1632)
+
+    first = KeyManager(keygen, keystore=Keystore(path))
+    rotated = first.rotate()
+    second = KeyManager(keygen, keystore=Keystore(path))
+
+    assert len(calls) == 2
+    assert second.current().key_id == rotated.key_id
+    assert second.current().secret_key == rotated.secret_key
+    assert len(second.active_keys()) == 2
+    print("✅ Key manager restored from keystore")
+
+
+if __name__ == "__main__":
+    test_round_trip_and_overwrite()
+    test_encrypted_at_rest()
+    test_corruption_detected()
+    test_torn_append_dropped()
+    test_compact_keeps_other_writers_records()
+    test_compact_keeps_file_private()
+    test_reload_reuses_derived_key()
+    test_key_manager_restores_keys()
+    print("\n🎉 Keystore tests passed")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental mailbox Merkle trees
+"""
+
+import hashlib
+
+from merkle import EMPTY_ROOT, MailboxTrees, MerkleTree, leaf_hash, verify_proof
+
+
+def full_root(leaves):
+    """Root rebuilt from scratch, for comparison with the incremental tree"""
+    level = list(leaves)
+    if not level:
+        return EMPTY_ROOT
+    while len(level) > 1:
+        level = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def test_incremental_matches_rebuild():
+    """Appends and in-place updates give the same root as a full rebuild"""
+    tree = MerkleTree()
+    leaves = []
+    assert tree.root() == EMPTY_ROOT
+    for i in range(37):
+        leaves.append(leaf_hash(f"email {i}".encode()))
+        tree.append(leaves[-1])
+        assert tree.root() == full_root(leaves)
+    for i in (0, 17, 36):
+        leaves[i] = leaf_hash(f"email {i} read".encode())
+        tree.update(i, leaves[i])
+        assert tree.root() == full_root(leaves)
+    print("✅ Incremental root matches rebuild")
+
+
+def test_inclusion_proofs():
+    """Every leaf proves against the root; a changed leaf does not"""
+    tree = MerkleTree()
+    for i in range(21):
+        tree.append(leaf_hash(str(i).encode()))
+    root = tree.root()
+    for i in range(21):
+        proof = tree.proof(i)
+        assert len(proof) <= 5
+        assert verify_proof(tree.leaf(i), proof, root)
+    assert not verify_proof(leaf_hash(b"forged"), tree.proof(3), root)
+    print("✅ Inclusion proofs")
+
+
+def test_mailbox_pages():
+    trees = MailboxTrees(lambda email: f"{email['id']}:{email['is_read']}".encode())
+    for i in range(1, 11):
+        trees.add("b@x.com", i, {"id": i, "is_read": False})
+    before = trees.snapshot("b@x.com")["root"]
+    trees.update("b@x.com", 4, {"id": 4, "is_read": True})
+    snapshot = trees.snapshot("b@x.com", offset=2, limit=3)
+    assert snapshot["root"] != before and snapshot["size"] == 10
+    assert [p["id"] for p in snapshot["proofs"]] == [3, 4, 5]
+    for p in snapshot["proofs"]:
+        assert verify_proof(bytes.fromhex(p["leaf"]), p["proof"], snapshot["root"])
+    assert trees.snapshot("nobody")["root"] == EMPTY_ROOT
+    print("✅ Mailbox pages")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_rebuild()
+    test_inclusion_proofs()
+    test_mailbox_pages()
+    print("\n🎉 Merkle tree tests passed")
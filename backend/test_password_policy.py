@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive bcrypt password policy
+"""
+
+import bcrypt
+
+from password_policy import PasswordPolicy, calibrate_cost, hash_cost
+
+
+def test_hash_cost_parsing():
+    """The cost factor is read back from the stored hash"""
+    policy = PasswordPolicy(cost=5)
+    assert hash_cost(policy.hash("secret")) == 5
+    print("✅ Cost factor parsed from hash")
+
+
+def test_outdated_hash_upgraded_on_login():
+    """A valid login with an old-cost hash returns an upgraded hash"""
+    old_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4))
+    policy = PasswordPolicy(cost=5)
+
+    is_valid, new_hash = policy.verify_and_upgrade("secret", old_hash)
+    assert is_valid
+    assert new_hash is not None and hash_cost(new_hash) == 5
+    assert policy.verify("secret", new_hash)
+
+    # Already at the current cost: nothing to do
+    assert policy.verify_and_upgrade("secret", new_hash) == (True, None)
+    print("✅ Outdated hash upgraded on login")
+
+
+def test_wrong_password_not_upgraded():
+    """A failed login never rewrites the stored hash"""
+    old_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4))
+    policy = PasswordPolicy(cost=5)
+    assert policy.verify_and_upgrade("wrong", old_hash) == (False, None)
+    print("✅ Failed login leaves hash untouched")
+
+
+def test_higher_cost_not_downgraded():
+    """Hashes stronger than the policy are kept as they are"""
+    strong_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=6))
+    assert not PasswordPolicy(cost=5).needs_rehash(strong_hash)
+    print("✅ Stronger hash not downgraded")
+
+
+def test_calibration_respects_bounds():
+    """Calibration stays inside the configured cost range"""
+    assert calibrate_cost(target_ms=0, min_cost=4, max_cost=6) == 4
+    assert calibrate_cost(target_ms=10_000, min_cost=4, max_cost=6) == 6
+    print("✅ Calibration bounded")
+
+
+if __name__ == "__main__":
+    test_hash_cost_parsing()
+    test_outdated_hash_upgraded_on_login()
+    test_wrong_password_not_upgraded()
+    test_higher_cost_not_downgraded()
+    test_calibration_respects_bounds()
+    print("\n🎉 Password policy tests passed")
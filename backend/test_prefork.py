@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Tests for shared SQLite storage and the pre-forked multi-worker mode
+"""
+
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import kem
+import prefork
+from session import SESSION_HEADER, aad_for, derive_keys, open_envelope, seal
+from storage import SQLiteStorage
+from testing import MINIMAL_CONFIG
+
+
+def test_sqlite_storage_is_shared():
+    """Two handles on one database file (as in two workers) see each other's writes"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guardbox.db")
+        first, second = SQLiteStorage(path), SQLiteStorage(path)
+
+        assert first.add_user("alice", {"password_hash": b"$2b$04$hash"})
+        assert not second.add_user("alice", {"password_hash": b"other"})
+        assert second.get_user("alice") == {"password_hash": b"$2b$04$hash"}
+        assert second.usernames_since(0) == (["alice"], 1)
+
+        ids = [first.allocate_email_id(), second.allocate_email_id()]
+        assert ids == [1, 2]
+        # Inserted out of id order: replay order is commit order
+        second.add_email({"id": 2, "from": "bob", "to": "alice", "is_read": False})
+        first.add_email({"id": 1, "from": "alice", "to": "bob", "is_read": False})
+        emails, version = first.emails_changed_since(0)
+        assert [e["id"] for e in emails] == [2, 1]
+
+        assert second.update_email(2, is_read=True)["is_read"]
+        emails, latest = first.emails_changed_since(version)
+        assert [e["id"] for e in emails] == [2] and latest > version
+        assert [e["id"] for e in first.mailbox("alice")] == [2, 1]
+        assert first.mailbox("carol") == []
+    print("✅ Shared SQLite storage")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(connection, method, path, body=None, token=None, headers=None):
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def request(port, method, path, body=None, token=None):
+    """One request on a fresh connection, so the kernel may hand it to any worker"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        return call(connection, method, path, body, token)
+    finally:
+        connection.close()
+
+
+def shared_config(directory, **overrides):
+    return {
+        **MINIMAL_CONFIG,
+        "storage": "sqlite",
+        "storage_path": os.path.join(directory, "guardbox.db"),
+        "keystore_path": os.path.join(directory, "guardbox.keystore"),
+        "jwt_secret": "test-shared-secret",
+        "shared_sync_seconds": 0.2,
+        **overrides,
+    }
+
+
+def start_master(config, port, workers=3):
+    master = multiprocessing.get_context("fork").Process(
+        target=prefork.serve, args=(config, workers, "127.0.0.1", port))
+    master.start()
+    for _ in range(200):
+        try:
+            request(port, "GET", "/healthz")
+            break
+        except OSError:
+            time.sleep(0.05)
+    return master
+
+
+def stop_master(master):
+    os.kill(master.pid, signal.SIGTERM)
+    master.join(30)
+    assert master.exitcode == 0
+
+
+def worker_connections(port, count):
+    """Keep-alive connections to `count` different workers"""
+    connections = {}
+    for _ in range(200):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        pid = call(connection, "GET", "/healthz")[1]["pid"]
+        if pid in connections:
+            connection.close()
+            continue
+        connections[pid] = connection
+        if len(connections) == count:
+            return list(connections.values())
+    raise AssertionError("could not reach enough distinct workers")
+
+
+def test_workers_share_state():
+    """Register, login and read mail across workers; every worker agrees on keys and mailbox roots"""
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        master = start_master(shared_config(directory), port)
+        try:
+            for username in ("alice@guardbox.com", "bob@guardbox.com"):
+                assert request(port, "POST", "/register", {"username": username, "password": "pw"})[0] == 200
+
+            pids, key_ids = set(), set()
+            for i in range(30):
+                pids.add(request(port, "GET", "/healthz")[1]["pid"])
+                key_ids.add(request(port, "GET", "/get_server_pk")[1]["key_id"])
+                status, login = request(port, "POST", "/login", {"email": "alice@guardbox.com", "password": "pw"})
+                assert status == 200
+                # Token from one worker, mail stored and read through others
+                status, _ = request(port, "POST", "/send_email",
+                                    {"to": "bob@guardbox.com", "subject": f"#{i}", "body": "x"}, login["token"])
+                assert status == 200
+            assert len(pids) > 1, "all requests landed on one worker"
+            assert len(key_ids) == 1
+
+            _, login = request(port, "POST", "/login", {"email": "bob@guardbox.com", "password": "pw"})
+            roots = set()
+            for _ in range(10):
+                status, inbox = request(port, "GET", "/get_emails", token=login["token"])
+                assert status == 200 and inbox["count"] == 30
+                digest = request(port, "GET", "/mailbox_digest", token=login["token"])[1]
+                assert digest["size"] == 30
+                roots.add(digest["root"])
+            assert len(roots) == 1
+        finally:
+            stop_master(master)
+    print(f"✅ {len(pids)} workers share users, mail, keys and mailbox roots")
+
+
+def test_workers_share_sessions_keys_limits_and_events():
+    """A session, a key fingerprint, a rate limit and a push event each span two workers"""
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        config = shared_config(directory, session_capacity=100, rate_limits=True,
+                               ip_rate=0.01, ip_burst=40, account_rate=0.01, account_burst=20)
+        master = start_master(config, port)
+        try:
+            first, second = worker_connections(port, 2)
+            tokens = {}
+            for name in ("alice", "bob"):
+                username = f"{name}@guardbox.com"
+                assert call(first, "POST", "/register", {"username": username, "password": "pw"})[0] == 200
+                status, login = call(second, "POST", "/login", {"email": username, "password": "pw"})
+                assert status == 200
+                tokens[name] = login["token"]
+
+            # Session opened on one worker, used on both: one send counter and
+            # one replay window for the session, wherever a request lands
+            server = call(first, "GET", "/get_server_pk")[1]
+            ciphertext, shared_secret = kem.encapsulate(bytes.fromhex(server["public_key"]))
+            status, opened = call(first, "POST", "/session",
+                                  {"ciphertext": ciphertext.hex(), "key_id": server["key_id"]})
+            assert status == 200
+            session_id = opened["session_id"]
+            c2s, s2c = (AESGCM(key) for key in derive_keys(shared_secret, session_id))
+            aad = aad_for(session_id, "/send_email")
+            sealed_requests, counters = [], []
+            for n, connection in enumerate((second, first, second), 1):
+                envelope = seal(c2s, n, {"to": "bob@guardbox.com", "subject": f"sealed #{n}", "body": "x"}, aad)
+                sealed_requests.append(envelope)
+                status, response = call(connection, "POST", "/send_email", envelope, tokens["alice"],
+                                        {SESSION_HEADER: session_id})
+                assert status == 200
+                counter, payload = open_envelope(s2c, response, aad)
+                assert payload["email_id"]
+                counters.append(counter)
+            assert counters == [1, 2, 3]
+            status, _ = call(first, "POST", "/send_email", sealed_requests[0], tokens["alice"],
+                             {SESSION_HEADER: session_id})
+            assert status == 400
+
+            # Fingerprint registered on one worker, used on the other
+            public_key, secret_key = kem.keygen()
+            status, registered = call(first, "POST", "/register_public_key",
+                                      {"client_public_key": public_key.hex()})
+            assert status == 200
+            status, encapsulated = call(second, "POST", "/encapsulate",
+                                        {"key_fingerprint": registered["fingerprint"]})
+            assert status == 200
+            assert (kem.decapsulate(secret_key, bytes.fromhex(encapsulated["ciphertext"])).hex()
+                    == encapsulated["shared_secret"])
+
+            # One IP budget for the whole port: drained on one worker, spent on the other
+            while call(first, "POST", "/register_public_key", {"client_public_key": public_key.hex()})[0] == 200:
+                pass
+            assert call(second, "POST", "/register_public_key", {"client_public_key": public_key.hex()})[0] == 429
+
+            # Mail sent through one worker reaches a stream held by the other
+            first.request("GET", f"/events?token={tokens['bob']}")
+            stream = first.getresponse()
+            assert stream.status == 200 and stream.readline().startswith(b": connected")
+            status, _ = call(second, "POST", "/send_email",
+                             {"to": "bob@guardbox.com", "subject": "pushed", "body": "x"}, tokens["alice"])
+            assert status == 200
+            line = stream.readline()
+            while not line.startswith(b"data: "):
+                line = stream.readline()
+            assert json.loads(line[len(b"data: "):])["subject"] == "pushed"
+        finally:
+            stop_master(master)
+    print("✅ Sessions, fingerprints, rate limits and events span workers")
+
+
+if __name__ == "__main__":
+    test_sqlite_storage_is_shared()
+    test_workers_share_state()
+    test_workers_share_sessions_keys_limits_and_events()
+    print("\n🎉 Multi-worker tests passed")
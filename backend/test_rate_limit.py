@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-bucket rate limiter
+"""
+
+import os
+import tempfile
+
+from flask import Flask, jsonify, request
+
+from rate_limit import SharedTokenBucketLimiter, TokenBucketLimiter, rate_limited
+from storage import SQLiteStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill():
+    """Burst is served immediately, then tokens come back at `rate`"""
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=4, clock=clock)
+
+    for _ in range(4):
+        assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") == 0.5
+
+    clock.now = 0.5
+    assert limiter.acquire("a") == 0.0
+    print("✅ Burst and refill")
+
+
+def test_cost_weight():
+    """Expensive endpoints drain the bucket faster"""
+    limiter = TokenBucketLimiter(rate=1, burst=10, clock=FakeClock())
+    assert limiter.acquire("a", cost=8) == 0.0
+    assert limiter.acquire("a", cost=5) == 3.0
+    assert limiter.acquire("b", cost=5) == 0.0
+    print("✅ Cost weights applied per key")
+
+
+def test_idle_keys_evicted():
+    """Buckets idle long enough to be full again are dropped"""
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1, burst=5, clock=clock)
+    for i in range(100):
+        limiter.acquire(f"ip-{i}")
+    assert len(limiter) == 100
+
+    clock.now = 10
+    limiter.acquire("fresh")
+    assert len(limiter) == 1
+    print("✅ Idle keys evicted")
+
+
+def test_flask_decorator_returns_429():
+    """Exhausted callers get 429 with Retry-After"""
+    app = Flask(__name__)
+    ip_limiter = TokenBucketLimiter(rate=1, burst=2)
+    account_limiter = TokenBucketLimiter(rate=1, burst=1)
+
+    @app.route("/login", methods=["POST"])
+    @rate_limited(ip_limiter, 1, account_limiter, lambda: "alice")
+    def login():
+        return jsonify({"ok": True})
+
+    client = app.test_client()
+    assert client.post("/login").status_code == 200
+
+    response = client.post("/login")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    print("✅ 429 with Retry-After")
+
+
+def test_account_rejection_refunds_ip_tokens():
+    """Retries against a locked account do not use up the IP's budget for other accounts"""
+    app = Flask(__name__)
+    ip_limiter = TokenBucketLimiter(rate=0.001, burst=3)
+    account_limiter = TokenBucketLimiter(rate=0.001, burst=1)
+
+    @app.route("/login", methods=["POST"])
+    @rate_limited(ip_limiter, 1, account_limiter, lambda: request.get_json()["account"])
+    def login():
+        return jsonify({"ok": True})
+
+    client = app.test_client()
+    assert client.post("/login", json={"account": "alice"}).status_code == 200
+    for _ in range(5):
+        assert client.post("/login", json={"account": "alice"}).status_code == 429
+    assert client.post("/login", json={"account": "bob"}).status_code == 200
+    assert client.post("/login", json={"account": "carol"}).status_code == 200
+    assert client.post("/login", json={"account": "dave"}).status_code == 429
+    print("✅ Account rejections refund IP tokens")
+
+
+def test_flask_decorator_computed_cost():
+    """A callable cost is evaluated per request, e.g. from the batch size"""
+    app = Flask(__name__)
+    ip_limiter = TokenBucketLimiter(rate=0.001, burst=10)
+
+    @app.route("/batch", methods=["POST"])
+    @rate_limited(ip_limiter, lambda: len(request.get_json()["items"]))
+    def batch():
+        return jsonify({"ok": True})
+
+    client = app.test_client()
+    assert client.post("/batch", json={"items": [1] * 8}).status_code == 200
+    assert client.post("/batch", json={"items": [1] * 3}).status_code == 429
+    assert client.post("/batch", json={"items": [1] * 2}).status_code == 200
+    print("✅ Computed cost per request")
+
+
+def test_shared_buckets_span_handles():
+    """Limiters on two storage handles (two workers) draw from one bucket per key"""
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guardbox.db")
+        first = SharedTokenBucketLimiter(SQLiteStorage(path), "ip", rate=2, burst=4, clock=clock)
+        second = SharedTokenBucketLimiter(SQLiteStorage(path), "ip", rate=2, burst=4, clock=clock)
+        assert first.acquire("a", 3) == 0.0
+        assert second.acquire("a") == 0.0
+        assert first.acquire("a") == 0.5
+        assert second.acquire("b", 4) == 0.0
+
+        clock.now = 0.5
+        assert second.acquire("a") == 0.0
+        second.refund("a")
+        assert first.acquire("a") == 0.0 and first.acquire("a") == 0.5
+        assert len(first) == 2
+        clock.now = 10
+        assert len(first) == 0
+    print("✅ Shared buckets")
+
+
+if __name__ == "__main__":
+    test_burst_then_refill()
+    test_cost_weight()
+    test_idle_keys_evicted()
+    test_flask_decorator_returns_429()
+    test_account_rejection_refunds_ip_tokens()
+    test_flask_decorator_computed_cost()
+    test_shared_buckets_span_handles()
+    print("\n🎉 Rate limiter tests passed")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-session secret key cache
+"""
+
+from secret_key_cache import SecretKeyCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_loads_once_per_session():
+    """The loader runs once per (session, user) until the entry expires"""
+    clock = FakeClock()
+    loads = []
+
+    def loader(username):
+        loads.append(username)
+        return (b"sk-" + username.encode(), "512") if username != "nokeys" else None
+
+    cache = SecretKeyCache(loader, ttl=60, clock=clock)
+    for _ in range(5):
+        assert cache.get("token-a", "alice") == (b"sk-alice", "512")
+    assert loads == ["alice"]
+
+    cache.get("token-b", "alice")
+    assert loads == ["alice", "alice"]
+    assert cache.get("token-a", "nokeys") is None
+
+    clock.now += 61
+    cache.get("token-a", "alice")
+    assert loads.count("alice") == 3
+    print("✅ Loaded once per session")
+
+
+def test_bounded_and_invalidated():
+    """LRU capacity holds and invalidate drops all of a user's sessions"""
+    cache = SecretKeyCache(lambda u: (u.encode(), "512"), capacity=2)
+    cache.get("t1", "alice")
+    cache.get("t2", "alice")
+    cache.get("t3", "bob")
+    assert len(cache) == 2
+
+    cache.invalidate("alice")
+    assert len(cache) == 1
+    print("✅ Capacity and invalidation")
+
+
+if __name__ == "__main__":
+    test_loads_once_per_session()
+    test_bounded_and_invalidated()
+    print("\n🎉 Secret key cache tests passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the background crypto self-test monitor
+"""
+
+import time
+
+from self_test import SelfTestMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_status_reflects_cached_result():
+    """Not ready before the first run; ready after a passing run"""
+    clock = FakeClock()
+    monitor = SelfTestMonitor({"kyber": lambda: True, "hmac": lambda: True}, interval=60, clock=clock)
+    assert monitor.status()["ready"] is False
+
+    monitor.run_once()
+    status = monitor.status()
+    assert status["ready"] and set(status["checks"]) == {"kyber", "hmac"}
+    print("✅ Ready after a passing self-test")
+
+
+def test_failures_and_stale_results_not_ready():
+    """A failing or raising check, or an old result, makes the service not ready"""
+    clock = FakeClock()
+
+    def broken():
+        raise RuntimeError("library not loaded")
+
+    monitor = SelfTestMonitor({"ok": lambda: True, "broken": broken}, interval=60, clock=clock)
+    monitor.run_once()
+    status = monitor.status()
+    assert not status["ready"] and status["checks"]["broken"]["error"] == "library not loaded"
+
+    monitor = SelfTestMonitor({"ok": lambda: True}, interval=60, clock=clock)
+    monitor.run_once()
+    clock.now += 181
+    assert monitor.status()["reason"] == "self-test result is stale"
+    print("✅ Failed and stale self-tests")
+
+
+def test_background_thread_runs_checks():
+    monitor = SelfTestMonitor({"ok": lambda: True}, interval=0.01).start()
+    try:
+        deadline = time.time() + 2
+        while not monitor.status()["ready"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert monitor.status()["ready"]
+    finally:
+        monitor.stop()
+    print("✅ Background self-test")
+
+
+if __name__ == "__main__":
+    test_status_reflects_cached_result()
+    test_failures_and_stale_results_not_ready()
+    test_background_thread_runs_checks()
+    print("\n🎉 Self-test monitor tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for KEM-established AEAD sessions
+"""
+
+import os
+import tempfile
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from session import SessionCache, SessionError, SharedSessionCache, aad_for, derive_keys, open_envelope, seal
+from storage import SQLiteStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def client_keys(shared_secret, session_id):
+    c2s, s2c = derive_keys(shared_secret, session_id)
+    return AESGCM(c2s), AESGCM(s2c)
+
+
+def test_request_response_round_trip():
+    """Client and server derive matching keys from the shared secret"""
+    shared_secret = os.urandom(32)
+    session = SessionCache().create(shared_secret)
+    c2s, s2c = client_keys(shared_secret, session.session_id)
+    aad = aad_for(session.session_id, "/send_email")
+
+    payload = session.open_request(seal(c2s, 1, {"body": "hello"}, aad), aad)
+    assert payload == {"body": "hello"}
+
+    counter, response = open_envelope(s2c, session.seal_response({"ok": True}, aad), aad)
+    assert counter == 1 and response == {"ok": True}
+    print("✅ Sealed round trip")
+
+
+def test_replay_and_tamper_rejected():
+    """Replays, other endpoints and modified ciphertexts all fail"""
+    shared_secret = os.urandom(32)
+    session = SessionCache().create(shared_secret)
+    c2s, _ = client_keys(shared_secret, session.session_id)
+    aad = aad_for(session.session_id, "/send_email")
+
+    first = seal(c2s, 5, {"n": 5}, aad)
+    session.open_request(first, aad)
+    # Out of order but inside the window is fine
+    session.open_request(seal(c2s, 3, {"n": 3}, aad), aad)
+
+    bad = [
+        (first, aad),
+        (seal(c2s, 6, {"n": 6}, aad), aad_for(session.session_id, "/get_emails")),
+        ({**seal(c2s, 7, {"n": 7}, aad), "counter": 8}, aad),
+    ]
+    for envelope, envelope_aad in bad:
+        try:
+            session.open_request(envelope, envelope_aad)
+            assert False, "expected SessionError"
+        except SessionError:
+            pass
+    print("✅ Replay and tampering rejected")
+
+
+def test_idle_sessions_expire_and_cache_is_bounded():
+    """Idle sessions disappear and the table never exceeds its capacity"""
+    clock = FakeClock()
+    cache = SessionCache(capacity=3, idle_timeout=60, max_age=3600, clock=clock)
+    session = cache.create(os.urandom(32))
+    assert cache.get(session.session_id) is session
+
+    clock.now += 61
+    assert cache.get(session.session_id) is None
+
+    for _ in range(5):
+        cache.create(os.urandom(32))
+    assert len(cache) == 3 and cache.metrics()["evicted"] == 2
+    print("✅ Expiry and capacity")
+
+
+def test_shared_sessions_span_handles():
+    """Counters and the replay window are shared by caches on one database (workers)"""
+    clock = FakeClock()
+    shared_secret = os.urandom(32)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guardbox.db")
+        first = SharedSessionCache(SQLiteStorage(path), idle_timeout=60, clock=clock)
+        second = SharedSessionCache(SQLiteStorage(path), idle_timeout=60, clock=clock)
+        session_id = first.create(shared_secret).session_id
+        c2s, s2c = client_keys(shared_secret, session_id)
+        aad = aad_for(session_id, "/send_email")
+
+        envelope = seal(c2s, 1, {"n": 1}, aad)
+        assert second.get(session_id).open_request(envelope, aad) == {"n": 1}
+        try:
+            first.get(session_id).open_request(envelope, aad)
+            assert False, "expected SessionError"
+        except SessionError:
+            pass
+
+        # One send counter: no nonce is used twice, whichever worker seals
+        counters = [open_envelope(s2c, cache.get(session_id).seal_response({}, aad), aad)[0]
+                    for cache in (first, second, first)]
+        assert counters == [1, 2, 3]
+
+        clock.now += 61
+        assert second.get(session_id) is None and len(first) == 0
+    print("✅ Shared sessions")
+
+
+if __name__ == "__main__":
+    test_request_response_round_trip()
+    test_replay_and_tamper_rejected()
+    test_idle_sessions_expire_and_cache_is_bounded()
+    test_shared_sessions_span_handles()
+    print("\n🎉 Session tests passed")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress tests for mailbox storage: many threads sending, flagging
+and listing at once
+"""
+
+import sys
+import threading
+
+from app_factory import create_app, mailbox_leaf
+from merkle import leaf_hash
+from storage import MemoryStorage
+from testing import MINIMAL_CONFIG
+
+USERS = [f"user{i}@guardbox.com" for i in range(6)]
+SENDERS = 8
+EMAILS_PER_SENDER = 150
+READERS = 4
+
+
+def new_email(email_id, sender, recipient):
+    return {"id": email_id, "from": sender, "to": recipient, "cc": "", "bcc": "",
+            "subject": f"#{email_id}", "body": "x", "timestamp": "", "signature": None,
+            "is_read": False, "is_starred": False, "is_important": False, "is_deleted": False}
+
+
+def run_threads(targets):
+    """Start every target at once with a tiny switch interval to force interleaving"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errors = []
+
+    def guarded(target):
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(target,)) for target in targets]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    if errors:
+        raise errors[0]
+
+
+def stress(store, update, mailbox):
+    """
+    SENDERS threads each send EMAILS_PER_SENDER emails and mark every one
+    read right after, while READERS threads list mailboxes the whole time.
+    Returns (ids stored per sender, the senders target, the reader target).
+    """
+    sent = {index: [] for index in range(SENDERS)}
+    done = threading.Event()
+
+    def sender(index, allocate):
+        me = USERS[index % len(USERS)]
+        for n in range(EMAILS_PER_SENDER):
+            recipient = USERS[(index + 1 + n % (len(USERS) - 1)) % len(USERS)]
+            email = new_email(allocate(), me, recipient)
+            store(email)
+            sent[index].append(email["id"])
+            update(email["id"], is_read=True)
+
+    def reader():
+        seen = {address: 0 for address in USERS}
+        while not done.is_set():
+            for address in USERS:
+                listing = mailbox(address)
+                ids = [email["id"] for email in listing]
+                # No torn reads: every record is whole and belongs here, no
+                # duplicates, and a mailbox never shrinks
+                assert len(ids) == len(set(ids))
+                assert all(address in (email["from"], email["to"]) for email in listing)
+                assert all(email["subject"] == f"#{email['id']}" for email in listing)
+                assert len(ids) >= seen[address]
+                seen[address] = len(ids)
+                if listing:
+                    # A send is in all its mailboxes or none
+                    other = listing[-1]["to"] if listing[-1]["from"] == address else listing[-1]["from"]
+                    assert listing[-1]["id"] in {email["id"] for email in mailbox(other)}
+
+    def senders(allocate):
+        run_threads([lambda index=index: sender(index, allocate) for index in range(SENDERS)])
+        done.set()
+
+    return sent, senders, reader
+
+
+def check_final_state(storage, sent):
+    total = SENDERS * EMAILS_PER_SENDER
+    stored = [email for address in USERS for email in storage.mailbox(address)]
+    # Each email is listed twice: in its sender's and its recipient's mailbox
+    assert len(stored) == 2 * total
+    assert len({email["id"] for email in stored}) == total
+    assert all(email["is_read"] for email in stored)
+    for address in USERS:
+        position = {email["id"]: i for i, email in enumerate(storage.mailbox(address))}
+        for ids in sent.values():
+            # One thread's sends keep their order in every mailbox
+            mine = [position[email_id] for email_id in ids if email_id in position]
+            assert mine == sorted(mine)
+
+
+def test_memory_storage_under_contention():
+    """Concurrent sends, flag updates and listings: nothing torn, lost or reordered"""
+    storage = MemoryStorage()
+    sent, senders, reader = stress(storage.add_email, storage.update_email, storage.mailbox)
+    run_threads([lambda: senders(storage.allocate_email_id)] + [reader] * READERS)
+    check_final_state(storage, sent)
+    print(f"✅ {SENDERS} senders and {READERS} readers on memory storage")
+
+
+def test_mailbox_trees_follow_storage():
+    """Racing stores and updates leave every Merkle leaf matching the stored record"""
+    app = create_app(MINIMAL_CONFIG)
+    svc = app.extensions["guardbox"]
+    try:
+        flags = ("is_read", "is_starred", "is_important", "is_deleted")
+        ids = [svc.storage.allocate_email_id() for _ in range(200)]
+
+        def flagger(flag):
+            for email_id in ids:
+                if svc.storage.get_email(email_id) is not None:
+                    svc.update_email(email_id, **{flag: True})
+
+        def storer():
+            for n, email_id in enumerate(ids):
+                svc.store_email(new_email(email_id, USERS[n % 2], USERS[2 + n % 3]))
+
+        run_threads([storer] + [lambda flag=flag: flagger(flag) for flag in flags])
+        for email_id in ids:
+            svc.update_email(email_id, is_read=True)
+
+        for address in USERS[:5]:
+            records = {email["id"]: email for email in svc.storage.mailbox(address)}
+            snapshot = svc.mailbox_snapshot(address, 0, None)
+            assert snapshot["size"] == len(records)
+            for proof in snapshot["proofs"]:
+                assert proof["leaf"] == leaf_hash(mailbox_leaf(records[proof["id"]])).hex()
+    finally:
+        svc.shutdown()
+    print("✅ Mailbox trees follow storage")
+
+
+if __name__ == "__main__":
+    test_memory_storage_under_contention()
+    test_mailbox_trees_follow_storage()
+    print("\n🎉 Storage concurrency tests passed")
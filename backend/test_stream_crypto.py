@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming chunked AEAD encryption
+"""
+
+import io
+import os
+
+from stream_crypto import (
+    CHACHA20_POLY1305, DecryptingReader, EncryptingWriter, StreamCryptoError,
+    decrypt_bytes, decrypt_stream, encrypt_bytes, encrypt_stream, HEADER, TAG_LEN
+)
+
+
+def test_round_trip_chunk_boundaries():
+    """Empty, partial and exact-multiple bodies decrypt back, for both ciphers"""
+    key = os.urandom(32)
+    for size in (0, 1, 100, 256, 257, 1000):
+        data = os.urandom(size)
+        for kwargs in ({}, {"algorithm": CHACHA20_POLY1305}):
+            ciphertext = encrypt_bytes(key, data, chunk_size=64, **kwargs)
+            chunks = max(1, -(-size // 64))
+            assert len(ciphertext) == HEADER.size + size + chunks * TAG_LEN
+            assert decrypt_bytes(key, ciphertext) == data
+    print("✅ Round trip across chunk boundaries")
+
+
+def test_generators_and_file_objects():
+    """Input split arbitrarily; file-like writer and reader interoperate"""
+    key = os.urandom(32)
+    data = os.urandom(10000)
+    pieces = [data[i:i + 333] for i in range(0, len(data), 333)]
+    ciphertext = b"".join(encrypt_stream(key, pieces, chunk_size=1024, aad=b"mail-1"))
+    split = [ciphertext[i:i + 77] for i in range(0, len(ciphertext), 77)]
+    assert b"".join(decrypt_stream(key, split, aad=b"mail-1")) == data
+
+    sink = io.BytesIO()
+    writer = EncryptingWriter(key, sink, chunk_size=1024)
+    for piece in pieces:
+        writer.write(piece)
+    writer.close()
+    reader = io.BufferedReader(DecryptingReader(key, io.BytesIO(sink.getvalue())))
+    assert reader.read() == data
+    print("✅ Generators and file objects")
+
+
+def test_tamper_truncate_reorder_rejected():
+    """Modified, truncated, reordered or re-labelled streams fail"""
+    key = os.urandom(32)
+    ciphertext = encrypt_bytes(key, os.urandom(300), chunk_size=64, aad=b"mail-1")
+    record = 64 + TAG_LEN
+    header, body = ciphertext[:HEADER.size], ciphertext[HEADER.size:]
+    flipped = bytearray(ciphertext)
+    flipped[-1] ^= 1
+
+    bad = [
+        (bytes(flipped), b"mail-1"),
+        (header + body[:2 * record], b"mail-1"),
+        (header + body[record:2 * record] + body[:record] + body[2 * record:], b"mail-1"),
+        (ciphertext, b"mail-2"),
+        (ciphertext, b"mail-1", os.urandom(32)),
+    ]
+    for case in bad:
+        try:
+            decrypt_bytes(case[2] if len(case) > 2 else key, case[0], case[1])
+            assert False, "expected StreamCryptoError"
+        except StreamCryptoError:
+            pass
+    print("✅ Tampering, truncation and reordering rejected")
+
+
+if __name__ == "__main__":
+    test_round_trip_chunk_boundaries()
+    test_generators_and_file_objects()
+    test_tamper_truncate_reorder_rejected()
+    print("\n🎉 Stream crypto tests passed")
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming signatures
+"""
+
+import hashlib
+import hmac
+import io
+import os
+
+from stream_signing import sign_stream, verify_stream
+
+
+def test_stream_signature_matches_one_shot():
+    """Chunked HMAC equals the one-shot HMAC, whatever the chunk size"""
+    message = os.urandom(300_000)
+    expected = hmac.new(b"key", message, hashlib.sha256).hexdigest()
+    for chunk_size in (7, 1000, 64 * 1024, 10**6):
+        signature, total = sign_stream(b"key", io.BytesIO(message), chunk_size=chunk_size)
+        assert signature == expected and total == len(message)
+    print("✅ Streaming signature matches one-shot HMAC")
+
+
+def test_verify_stream():
+    message = b"hello " * 10000
+    signature, _ = sign_stream(b"key", io.BytesIO(message))
+    assert verify_stream(b"key", io.BytesIO(message), signature)[0]
+    assert not verify_stream(b"key", io.BytesIO(message + b"!"), signature)[0]
+    assert not verify_stream(b"other", io.BytesIO(message), signature)[0]
+    assert not verify_stream(b"key", io.BytesIO(message), "é" * len(signature))[0]
+    try:
+        sign_stream(b"key", io.BytesIO(message), algorithm="Dilithium2")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Streaming verification")
+
+
+if __name__ == "__main__":
+    test_stream_signature_matches_one_shot()
+    test_verify_stream()
+    print("\n🎉 Stream signing tests passed")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the recipient autocomplete directory
+"""
+
+from user_directory import UserDirectory
+
+
+def test_prefix_search_case_insensitive():
+    """Matches are sorted and case-insensitive"""
+    directory = UserDirectory(["bob@guardbox.com", "Alice@guardbox.com", "alex@guardbox.com"])
+    users, next_cursor = directory.search("al")
+    assert users == ["alex@guardbox.com", "Alice@guardbox.com"]
+    assert next_cursor is None
+    print("✅ Prefix search")
+
+
+def test_pagination_with_cursor():
+    """Pages chain through the `next` cursor without gaps or repeats"""
+    directory = UserDirectory(f"user{i:03d}@guardbox.com" for i in range(25))
+    seen = []
+    users, cursor = directory.search("user", limit=10)
+    seen += users
+    while cursor:
+        users, cursor = directory.search("user", limit=10, after=cursor)
+        seen += users
+    assert seen == [f"user{i:03d}@guardbox.com" for i in range(25)]
+    print("✅ Cursor pagination")
+
+
+def test_cursor_below_prefix():
+    """A cursor that sorts before every match starts at the first match"""
+    directory = UserDirectory(["alice@guardbox.com", "bob@guardbox.com", "carol@guardbox.com"])
+    assert directory.search("b", after="a") == (["bob@guardbox.com"], None)
+    assert directory.search("b", after="bob@guardbox.com") == ([], None)
+    print("✅ Cursor below prefix")
+
+
+def test_register_keeps_index_current():
+    """Users added after construction show up in results"""
+    directory = UserDirectory(["testuser1@guardbox.com"])
+    directory.add("testuser2@guardbox.com")
+    directory.add("testuser2@guardbox.com")
+    assert directory.search("testuser")[0] == ["testuser1@guardbox.com", "testuser2@guardbox.com"]
+    print("✅ Index updated on add")
+
+
+class CountingList(list):
+    """List that counts the entries read through indexing and slicing"""
+
+    visited = 0
+
+    def __getitem__(self, index):
+        item = super().__getitem__(index)
+        self.visited += len(item) if isinstance(index, slice) else 1
+        return item
+
+
+def test_large_directory_lookups_are_logarithmic():
+    """A lookup reads O(log n + limit) entries, however many users there are"""
+    directory = UserDirectory(f"user{i}@guardbox.com" for i in range(200_000))
+    directory._entries = CountingList(directory._entries)
+    users, _ = directory.search("user1234", limit=10)
+    assert len(users) == 10
+    # Binary search: about log2(200k) = 18 probes, plus the 11-entry page
+    assert directory._entries.visited <= 18 + 11 + 2, directory._entries.visited
+    print(f"✅ {directory._entries.visited} entries read per lookup over 200k users")
+
+
+if __name__ == "__main__":
+    test_prefix_search_case_insensitive()
+    test_pagination_with_cursor()
+    test_cursor_below_prefix()
+    test_register_keeps_index_current()
+    test_large_directory_lookups_are_logarithmic()
+    print("\n🎉 User directory tests passed")
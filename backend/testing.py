@@ -0,0 +1,20 @@
+"""
+Shared fixtures for the backend test modules.
+"""
+
+# Only the core components: no keystore, pool, sessions, self-test or rotation
+# thread, one crypto thread, the cheapest bcrypt cost. Tests layer what they
+# exercise on top, e.g. {**MINIMAL_CONFIG, "session_capacity": 100}.
+MINIMAL_CONFIG = {
+    "crypto_executor": "thread",
+    "crypto_workers": 1,
+    "kyber_modes": ("512",),
+    "keystore_path": None,
+    "key_rotation_seconds": None,
+    "keypair_pool_size": 0,
+    "self_test_interval": None,
+    "session_capacity": 0,
+    "seed_test_users": False,
+    "rate_limits": False,
+    "password_cost": 4,
+}
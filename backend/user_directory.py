@@ -0,0 +1,70 @@
+"""
+Sorted user directory for recipient autocomplete.
+
+Usernames are kept in a sorted list of (lowercased, original) pairs, so a
+prefix lookup is a binary search followed by a short slice: O(log n + k)
+regardless of how many users are registered.
+"""
+
+import bisect
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class UserDirectory:
+    """Case-insensitive prefix index over usernames."""
+
+    def __init__(self, usernames: Iterable[str] = ()):
+        self._entries: List[Tuple[str, str]] = sorted((name.lower(), name) for name in usernames)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, username: str):
+        entry = (username.lower(), username)
+        with self._lock:
+            index = bisect.bisect_left(self._entries, entry)
+            if index == len(self._entries) or self._entries[index] != entry:
+                self._entries.insert(index, entry)
+
+    def remove(self, username: str):
+        entry = (username.lower(), username)
+        with self._lock:
+            index = bisect.bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def search(self, prefix: str, limit: int = DEFAULT_LIMIT,
+               after: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        Return up to `limit` usernames starting with `prefix` (case-insensitive),
+        plus a cursor for the next page (None when there are no more matches).
+        Pass the cursor back as `after` to continue; cursors stay valid while
+        users are being added.
+        """
+        prefix = prefix.lower()
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (prefix, ""))
+            if after:
+                # Continue strictly after the last entry of the previous page,
+                # but never before the first match (cursors may sort below it)
+                start = max(start, bisect.bisect_right(self._entries, (after.lower(), after)))
+
+            # Fetch one extra entry to know whether another page exists
+            page = self._entries[start:start + limit + 1]
+
+        matches = []
+        for key, name in page:
+            if not key.startswith(prefix):
+                break
+            matches.append(name)
+
+        if len(matches) > limit:
+            return matches[:limit], matches[limit - 1]
+        return matches, None
@@ -114,6 +114,27 @@ class EmailService {
       throw error;
     }
   }
+
+  async searchUsers(prefix, limit = 10, after = null) {
+    try {
+      const params = new URLSearchParams({ prefix, limit });
+      if (after) {
+        params.set('after', after);
+      }
+
+      const response = await fetch(`${SERVER_URL}/users/search?${params}`);
+      const data = await response.json();
+
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to search users');
+      }
+
+      return data;
+    } catch (error) {
+      console.error('Error searching users:', error);
+      throw error;
+    }
+  }
 }
 
 export default new EmailService();